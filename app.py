@@ -1,6 +1,13 @@
 import os, dash_auth
 from dash import Dash, html, page_container
 import dash_bootstrap_components as dbc
+from flask import jsonify
+from db import pool_stats
+import frames
+import metrics
+import output_cache
+import profiling
+import warmup
 
 app = Dash(
     __name__, 
@@ -18,6 +25,33 @@ dash_auth.BasicAuth(app, VALID_USERS)
 
 auth = dash_auth.BasicAuth(app, VALID_USERS)
 
+
+metrics.install(app, gauges=lambda: {
+    **{f"db_{k}": v for k, v in pool_stats().items()},
+    **{f"output_cache_{k}": v for k, v in output_cache.stats().items()},
+    **{f"frame_bytes_{name}": entry["bytes"] for name, entry in frames.memory_report().items()},
+})
+profiling.install(app)
+
+
+@server.route("/health/db")
+def db_health():
+    """Connection pool usage and query timeout / cancellation counters."""
+    return jsonify(pool_stats())
+
+
+@server.route("/health/frames")
+def frames_health():
+    """Rows and memory of this worker's cached page frames, before and after the compact schema."""
+    return jsonify(frames.memory_report())
+
+
+@server.route("/health/warmup")
+def warmup_health():
+    """When this worker last warmed the default page views, and how long each took."""
+    return jsonify(warmup.status())
+
+
 nav_items = [
     dbc.NavItem(dbc.NavLink("OVERVIEW", href="/", active="exact")),
     dbc.NavItem(dbc.NavLink("FLEET", href="/fleet_info", active="exact")),
@@ -0,0 +1,173 @@
+"""
+Dash background callbacks for the views that can run for tens of seconds: the telematics map
+for all fleets over a wide date range and the unfiltered analysis heatmap.
+
+Dash's DiskcacheManager runs the callback in a process forked from the gunicorn worker. The
+request returns at once and the browser polls for progress and the result, so the gunicorn
+and nginx timeouts no longer apply. A newer request for the same callback kills the running
+job (cancel=). Finished results stay in the disk cache, keyed by the callback's inputs and
+the data versions of the tables they read, so an identical request is answered from disk
+until the next ETL load bumps a version. A job that raised (or raised PreventUpdate) leaves
+nothing cached: the next identical request runs it again.
+
+A job's profiling (profiling.py) is decided in the worker when the job starts, so armed
+counts are spent there rather than in the job's copy of them.
+
+Jobs run their queries under the "background" statement timeout (db.QUERY_TIMEOUTS_MS) and
+report each query's backend pid to the disk cache; terminating a job cancels its query in
+Postgres before killing the process.
+
+    ZEV_BACKGROUND_CACHE_DIR     diskcache directory (default cache/background)
+    ZEV_BACKGROUND_TTL_SECONDS   a cached result is dropped after this long unread (default 1800)
+    ZEV_BACKGROUND_CACHE_MB      size limit of the cache directory (default 512)
+    ZEV_BACKGROUND_POLL_MS       browser polling interval (default 500)
+
+Requires dash[diskcache] (diskcache, multiprocess, psutil).
+"""
+
+import functools
+import os
+from pathlib import Path
+
+import diskcache
+from dash import DiskcacheManager, Output
+from dash._callback import NoUpdate
+
+import db
+import offload
+import profiling
+from db import get_data_version
+
+CACHE_DIR = Path(os.getenv("ZEV_BACKGROUND_CACHE_DIR", Path(__file__).resolve().parent / "cache" / "background"))
+TTL_SECONDS = int(os.getenv("ZEV_BACKGROUND_TTL_SECONDS", "1800"))
+CACHE_MB = int(os.getenv("ZEV_BACKGROUND_CACHE_MB", "512"))
+POLL_MS = int(os.getenv("ZEV_BACKGROUND_POLL_MS", "500"))
+
+# Tables read by background callbacks; a new version of any of them misses every cached result.
+VERSIONED_TABLES = ("veh_tel", "refuel_inf")
+
+
+def _data_versions() -> tuple:
+    return tuple(get_data_version(table) for table in VERSIONED_TABLES)
+
+
+def _backend_key(job) -> str:
+    return f"zev-backend-{int(job)}"
+
+
+PROFILE_CONTEXT_KEY = "zev_profile"
+
+
+class _Manager(DiskcacheManager):
+    def make_job_fn(self, fn, progress, key=None):
+        job_fn = super().make_job_fn(fn, progress, key)
+
+        def run(result_key, progress_key, args, context):
+            profiling.start_job(fn, context.pop(PROFILE_CONTEXT_KEY, False))
+            job_fn(result_key, progress_key, args, context)
+
+        run.callback = fn
+        return run
+
+    def call_job_fn(self, key, job_fn, args, context):
+        # Runs in the worker: the job process is forked from it and only sees a copy of its state.
+        callback = getattr(job_fn, "callback", None)
+        prepare = getattr(callback, "prepare", None)
+        if prepare is not None:
+            prepare()
+        context = {**context, PROFILE_CONTEXT_KEY: profiling.take_for_job(callback)}
+        return super().call_job_fn(key, job_fn, args, context)
+
+    def terminate_job(self, job):
+        if job is not None:
+            pid = self.handle.pop(_backend_key(job), None)
+            if pid is not None:
+                db.cancel_backend(pid)
+        super().terminate_job(job)
+
+    def get_result(self, key, job):
+        result = super().get_result(key, job)
+        # Dash stores a raised error / PreventUpdate under the result key like an output;
+        # drop it once delivered so it is not served to the next identical request.
+        if isinstance(result, dict) and ("background_callback_error" in result or NoUpdate.is_no_update(result)):
+            self.clear_cache_entry(key)
+        return result
+
+
+manager = _Manager(
+    diskcache.Cache(str(CACHE_DIR), size_limit=CACHE_MB * 1024 * 1024),
+    cache_by=[_data_versions],
+    expire=TTL_SECONDS,
+)
+
+
+def options(inputs, progress_bar: str) -> dict:
+    """
+    Keyword arguments that make a @callback a background callback.
+    inputs: the callback's Inputs; a change to them cancels the running job. Dash adds a cancel
+    callback writing each cancel component's "id", so one Input per component is used (a newer
+    request for the same callback also replaces the old job on its own).
+    progress_bar: id of a dbc.Progress shown while the job runs; the callback receives
+    set_progress as its first argument and reports (percent, label) through it.
+    """
+    cancel = {}
+    for dep in inputs:
+        cancel.setdefault(dep.component_id, dep)
+    return dict(
+        background=True,
+        manager=manager,
+        interval=POLL_MS,
+        cancel=list(cancel.values()),
+        progress=[Output(progress_bar, "value"), Output(progress_bar, "label")],
+        progress_default=[0, ""],
+        running=[(Output(progress_bar, "style"), {"visibility": "visible"}, {"visibility": "hidden"})],
+    )
+
+
+def job(fn=None, *, prepare=None):
+    """
+    Run a background callback body in its job process: @cpu_bound work runs inline (the job
+    is already off the request thread), and the backend pid of each query is kept under the
+    job's pid for terminate_job. The inherited database pool is replaced by db's fork hook.
+    prepare: called in the worker before each job is started, e.g. to load or refresh a
+    cached frame there; the job gets a copy of it, while a frame it loaded itself would be
+    discarded when the job exits.
+    """
+    if fn is None:
+        return functools.partial(job, prepare=prepare)
+
+    def report(pid):
+        key = _backend_key(os.getpid())
+        if pid is None:
+            manager.handle.delete(key)
+        else:
+            manager.handle.set(key, pid, expire=TTL_SECONDS)
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        offload.run_inline()
+        db.report_backends(report)
+        return fn(*args, **kwargs)
+
+    wrapper.prepare = prepare
+    return wrapper
+
+
+def no_progress(_value) -> None:
+    """set_progress stand-in for calling a background callback directly (benchmarks)."""
+
+
+def warm(fn, args: list) -> bool:
+    """
+    Compute a background callback's output for args (its Inputs, in order) in this process and
+    store it under the key Dash looks up, so the first request for it is answered from the
+    cache. False if it was already cached. Workers warming the same view take turns.
+    """
+    key = manager.build_cache_key(fn, list(args), [], None)
+    if manager.result_ready(key):
+        return False
+    with diskcache.Lock(manager.handle, f"warm-{key}", expire=TTL_SECONDS):
+        if manager.result_ready(key):
+            return False
+        manager.handle.set(key, fn.__wrapped__(no_progress, *args), expire=TTL_SECONDS)
+    return True
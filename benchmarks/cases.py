@@ -0,0 +1,131 @@
+"""
+Benchmark cases: the dashboard callbacks and ETL steps that dominate page and load times.
+
+Each case's setup(n) builds its input outside the timed region and returns the call to time.
+Sizes are input rows (sessions, daily rows, events or telematics points); for the telematics map
+they are days of data ending at the latest telematics date in the local database.
+"""
+
+import contextlib
+import datetime as dt
+import importlib
+import io
+from dataclasses import dataclass
+from typing import Callable
+
+from benchmarks import fixtures
+
+TABLE_HEADER_STYLE = {"padding": "0.3rem 0.45rem", "fontSize": "0.82rem", "whiteSpace": "nowrap"}
+TABLE_CELL_STYLE = {"padding": "0.22rem 0.45rem", "fontSize": "0.82rem", "lineHeight": "1.15"}
+
+
+@dataclass(frozen=True)
+class Case:
+    name: str
+    target: str                      # what is being measured, for the report
+    sizes: dict[str, int]            # size name -> rows (or days for the map)
+    setup: Callable[[int], tuple[Callable[[], object], int]]   # n -> (call, input rows)
+    needs_db: bool = False           # the module queries the database at import or call time
+    notes: str = ""
+
+
+_APP = None
+
+
+def page(module: str):
+    """Import a Dash page module; register_page needs a pages-enabled app to exist first."""
+    global _APP
+    if _APP is None:
+        from dash import Dash
+
+        # pages_folder="" keeps Dash from importing every page (and their import-time queries).
+        _APP = Dash(__name__, use_pages=True, pages_folder="", suppress_callback_exceptions=True)
+    return importlib.import_module(f"pages.{module}")
+
+
+# ---------- dashboard ----------
+def _weekday_hour_matrix(n: int):
+    from compute import weekday_hour_duration_matrix
+
+    df = fixtures.charging_sessions(n)
+    return (lambda: weekday_hour_duration_matrix(df)), len(df)
+
+
+def _fleet_summary_table(n: int):
+    usage = page("veh_daily_usage")
+    df = fixtures.daily_usage(n)
+    return (lambda: usage._build_fleet_summary_table(df, TABLE_HEADER_STYLE, TABLE_CELL_STYLE)), len(df)
+
+
+def _compute_fleet_table(n: int):
+    from compute import compute_fleet_table
+
+    df = fixtures.maintenance_events(n)
+    return (lambda: compute_fleet_table(df)), len(df)
+
+
+def _map_and_summary(days: int):
+    from background import no_progress
+    from db import read_sql
+
+    telematics = page("telematics")
+    if telematics.end_d is None:
+        raise RuntimeError("no telematics data in the local database")
+    end = dt.date.fromisoformat(telematics.end_d)
+    start = (end - dt.timedelta(days=days - 1)).isoformat()
+    where, params = telematics._filter_sql(None, None, start, end.isoformat(), "t.timestamp")
+    counted = read_sql(
+        f"""
+        SELECT count(*) AS n
+        FROM {telematics.TEL_SOURCE} t
+        JOIN vehicle v ON t.veh_id = v.id
+        JOIN fleet f ON v.fleet_id = f.id
+        WHERE {where}
+        """,
+        params=params, query_class="background",
+    )
+    rows = int(counted.iloc[0]["n"])
+    return (lambda: telematics.update_map_and_summary(no_progress, None, None, start, end.isoformat())), rows
+
+
+# ---------- ETL ----------
+def _aggregate_daily(n: int):
+    from data_update.compute_veh_daily import DEFAULT_IDLE_THRESHOLD_MINUTES, aggregate_daily
+
+    rows = fixtures.telemetry_rows(n)
+    return (lambda: aggregate_daily(rows, DEFAULT_IDLE_THRESHOLD_MINUTES)), len(rows)
+
+
+def _gps_filter(n: int):
+    from data_update.Watsontown_Trucking.common_wat import flag_gps_outliers
+
+    df = fixtures.gps_track(n)
+    return (lambda: flag_gps_outliers(df, max_jump_miles=5.0)), len(df)
+
+
+def _double_artifacts(n: int):
+    from data_update.Wilsbach.common_wil import correct_or_drop_double_artifacts
+
+    df = fixtures.double_artifact_readings(n)
+
+    def call():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return correct_or_drop_double_artifacts(df)
+
+    return call, len(df)
+
+
+TEL_SIZES = {"small": 10_000, "medium": 100_000, "large": 1_000_000}
+PAGE_SIZES = {"small": 1_000, "medium": 10_000, "large": 100_000}
+
+CASES = [
+    Case("map_and_summary", "pages/telematics.update_map_and_summary",
+         {"small": 1, "medium": 7, "large": 30}, _map_and_summary, needs_db=True,
+         notes="days of data; COPY read + polylines + rollup summary"),
+    Case("weekday_hour_matrix", "compute.weekday_hour_duration_matrix", PAGE_SIZES, _weekday_hour_matrix),
+    Case("fleet_summary_table", "pages/veh_daily_usage._build_fleet_summary_table", PAGE_SIZES, _fleet_summary_table),
+    Case("compute_fleet_table", "compute.compute_fleet_table", TEL_SIZES, _compute_fleet_table),
+    Case("aggregate_daily", "data_update/compute_veh_daily.aggregate_daily", TEL_SIZES, _aggregate_daily),
+    Case("gps_filter", "Watsontown flag_gps_outliers", TEL_SIZES, _gps_filter),
+    Case("double_artifacts", "Wilsbach correct_or_drop_double_artifacts", TEL_SIZES, _double_artifacts),
+]
@@ -0,0 +1,186 @@
+"""
+Deterministic benchmark inputs built with data_update/generate_synthetic_data.py (no database).
+
+A base dataset (BASE_FLEETS x BASE_VEHICLES vehicles over BASE_DAYS days) is simulated once per
+process. Larger sizes tile it: every copy gets its own vehicle and charger ids, so a frame of any
+size keeps the generator's per-vehicle shape. Copies spread over at most FLEET_COPIES x
+BASE_FLEETS fleets, so large frames look like a few big fleets rather than thousands of tiny ones.
+
+Page frames are read-only (frames.protect), like the pages' cached frames: a case whose
+function writes into its input fails with "assignment destination is read-only".
+"""
+
+import functools
+
+import numpy as np
+import pandas as pd
+
+from compute import resolve_efficiency_rows
+from data_update.generate_synthetic_data import (
+    DEFAULT_START,
+    make_chargers,
+    make_fleets,
+    make_vehicles,
+    simulate_vehicle,
+)
+from frames import compact, protect
+
+SEED = 42
+BASE_FLEETS = 3
+BASE_VEHICLES = 4
+BASE_CHARGERS = 2
+BASE_DAYS = 56
+INTERVAL_SECONDS = 60
+FLEET_COPIES = 8           # fleets stop multiplying after this many copies of the base
+MAINT_MILES_PER_COPY = 2_500
+MAINT_ERAS = 40            # ~6 years of service history per vehicle, then new vehicles
+
+GPS_JUMP_EVERY = 500        # one injected GPS jump cluster per this many points
+GPS_JUMP_DEGREES = 0.5      # ~35 mi north of the track
+DOUBLE_ARTIFACT_EVERY = 200 # one doubled odometer / SOC reading per this many points
+
+
+@functools.lru_cache(maxsize=1)
+def base_dataset() -> dict[str, pd.DataFrame]:
+    """The generator's tables for the base fleets, with ids assigned as the database would."""
+    rng = np.random.default_rng(SEED)
+    fleets = make_fleets(rng, BASE_FLEETS, BASE_VEHICLES, BASE_CHARGERS)
+    fleets["id"] = np.arange(1, len(fleets) + 1)
+
+    tables = {"veh_tel": [], "refuel_inf": [], "veh_daily": [], "maintenance": []}
+    vehicles_all, chargers_all = [], []
+    for fleet_no, fleet in fleets.iterrows():
+        frng = np.random.default_rng([SEED, fleet_no, 1_000_000])
+        vehicles = make_vehicles(frng, int(fleet["id"]), fleet_no, BASE_VEHICLES)
+        vehicles["id"] = np.arange(len(vehicles)) + fleet_no * BASE_VEHICLES + 1
+        chargers = make_chargers(frng, int(fleet["id"]), fleet_no, BASE_CHARGERS)
+        chargers["id"] = np.arange(len(chargers)) + fleet_no * BASE_CHARGERS + 1
+        for veh_no, vehicle in enumerate(vehicles.to_dict("records")):
+            data = simulate_vehicle(
+                SEED, fleet_no, veh_no, vehicle, (fleet["latitude"], fleet["longitude"]),
+                chargers.to_dict("records"), DEFAULT_START, BASE_DAYS, INTERVAL_SECONDS,
+            )
+            for table, df in data.items():
+                tables[table].append(df)
+        vehicles_all.append(vehicles)
+        chargers_all.append(chargers)
+
+    out = {table: pd.concat(frames, ignore_index=True) for table, frames in tables.items()}
+    out["fleet"] = fleets
+    out["vehicle"] = pd.concat(vehicles_all, ignore_index=True)
+    out["charger"] = pd.concat(chargers_all, ignore_index=True)
+    return out
+
+
+def _tiled(table: str, n_rows: int) -> pd.DataFrame:
+    """n_rows of a base table; copy c shifts vehicle / charger / fleet ids by c x the base counts."""
+    base = base_dataset()[table]
+    pos = np.arange(n_rows)
+    out = base.iloc[pos % len(base)].reset_index(drop=True)
+    copy_no = pos // len(base)
+    for col, stride in (("veh_id", BASE_FLEETS * BASE_VEHICLES), ("charger_id", BASE_FLEETS * BASE_CHARGERS)):
+        if col in out.columns:
+            out[col] = out[col] + copy_no * stride
+    if "fleet_id" in out.columns:
+        out["fleet_id"] = out["fleet_id"] + copy_no % FLEET_COPIES * BASE_FLEETS
+    return out
+
+
+def _vehicle_dims(veh_id: pd.Series) -> pd.DataFrame:
+    """fleet_id, fleet_name and the vehicle attributes for tiled vehicle ids."""
+    vehicles = base_dataset()["vehicle"].set_index("id")
+    fleets = base_dataset()["fleet"].set_index("id")
+    n_base = BASE_FLEETS * BASE_VEHICLES
+    base_id = (veh_id - 1) % n_base + 1
+    fleet_copy = ((veh_id - 1) // n_base % FLEET_COPIES).to_numpy()
+    dims = vehicles.loc[base_id.to_numpy(), ["fleet_id", "fleet_vehicle_id", "make", "model", "class"]]
+    dims = dims.reset_index(drop=True)
+    dims["fleet_name"] = (fleets.loc[dims["fleet_id"].to_numpy(), "fleet_name"].to_numpy()
+                          + np.where(fleet_copy > 0, " #" + fleet_copy.astype(str), ""))
+    dims["fleet_id"] = dims["fleet_id"].to_numpy() + fleet_copy * BASE_FLEETS
+    dims["fleet_vehicle_id"] = "SYN-" + veh_id.astype(int).astype(str).to_numpy()
+    return dims
+
+
+# ---------- page frames (shaped like the page loaders' output) ----------
+def charging_sessions(n_rows: int) -> pd.DataFrame:
+    """refuel_inf as pages/analysis.load_charging_analysis_frame holds it."""
+    df = _tiled("refuel_inf", n_rows)
+    df["charge_start_time"] = df["refuel_start"].fillna(df["connect_time"])
+    df["charge_end_time"] = df["refuel_end"].fillna(df["disconnect_time"])
+    return protect(compact(df, "analysis"))
+
+
+def daily_usage(n_rows: int) -> pd.DataFrame:
+    """veh_daily joined to vehicle / fleet as pages/veh_daily_usage.load_daily_usage_frame holds it."""
+    df = _tiled("veh_daily", n_rows)
+    dims = _vehicle_dims(df["veh_id"])
+    df.insert(0, "fleet", dims["fleet_name"])
+    for col in ("make", "model", "class", "fleet_vehicle_id"):
+        df[col] = dims[col].astype(str)
+    df["efficiency"] = np.nan
+    df["tot_soc_used"] = df["tot_soc_used"] * 100
+    return protect(compact(resolve_efficiency_rows(df), "daily_usage"))
+
+
+def maintenance_events(n_rows: int) -> pd.DataFrame:
+    """
+    maintenance as pages/maintenance.load_maintenance returns it; every 8th event is a charger's.
+    Copies beyond FLEET_COPIES reuse the vehicles later in time (dates + BASE_DAYS, odometer +
+    MAINT_MILES_PER_COPY), so vehicles accumulate service history instead of multiplying; after
+    MAINT_ERAS such eras the next copies start over with new vehicles.
+    """
+    df = _tiled("maintenance", n_rows)
+    n_base = BASE_FLEETS * BASE_VEHICLES
+    copy_no = np.arange(n_rows) // len(base_dataset()["maintenance"])
+    vehicle_set = copy_no % FLEET_COPIES + copy_no // (FLEET_COPIES * MAINT_ERAS) * FLEET_COPIES
+    df["veh_id"] = (df["veh_id"] - 1) % n_base + 1 + vehicle_set * n_base
+    era = copy_no // FLEET_COPIES % MAINT_ERAS
+    df["date"] = pd.to_datetime(df["date"]) + pd.to_timedelta(era * BASE_DAYS, unit="D")
+    df[["enter_odo", "exit_odo"]] = df[["enter_odo", "exit_odo"]].add(era * MAINT_MILES_PER_COPY, axis=0)
+    df["fleet_name"] = _vehicle_dims(df["veh_id"])["fleet_name"]
+    df["charger_id"] = np.nan
+    charger_rows = np.arange(len(df)) % 8 == 7
+    df.loc[charger_rows, "charger_id"] = df.loc[charger_rows, "veh_id"] % (BASE_FLEETS * BASE_CHARGERS) + 1
+    df.loc[charger_rows, ["veh_id", "enter_odo", "exit_odo"]] = np.nan
+    df.loc[charger_rows, "maint_ob"] = 2
+    df["total_cost"] = df["parts_cost"] + df["labor_cost"] + df["add_cost"]
+    return protect(compact(df, "maintenance"))
+
+
+# ---------- ETL inputs ----------
+def telemetry_rows(n_rows: int) -> list[tuple]:
+    """(vehicle_pk, fleet_veh_id, fleet_id, ts, mileage, soc, speed) as compute_veh_daily fetches them."""
+    df = _tiled("veh_tel", n_rows)
+    dims = _vehicle_dims(df["veh_id"])
+    ts = df["timestamp"].array.to_pydatetime()
+    return list(zip(df["veh_id"].tolist(), dims["fleet_vehicle_id"].tolist(), dims["fleet_id"].tolist(), ts,
+                    df["mileage"].astype(float).tolist(), df["soc"].tolist(), df["speed"].astype(float).tolist()))
+
+
+def gps_track(n_rows: int) -> pd.DataFrame:
+    """Watsontown-shaped points with a 1-3 point GPS jump cluster every GPS_JUMP_EVERY points."""
+    df = _tiled("veh_tel", n_rows)[["veh_id", "timestamp", "speed", "mileage", "latitude", "longitude"]]
+    rng = np.random.default_rng(SEED)
+    for start in range(GPS_JUMP_EVERY // 2, len(df), GPS_JUMP_EVERY):
+        span = slice(start, start + int(rng.integers(1, 4)))
+        df.iloc[span, df.columns.get_loc("latitude")] += GPS_JUMP_DEGREES
+    return df
+
+
+def double_artifact_readings(n_rows: int) -> pd.DataFrame:
+    """Wilsbach-shaped readings with a doubled odometer or SOC every DOUBLE_ARTIFACT_EVERY points."""
+    df = _tiled("veh_tel", n_rows)[["veh_id", "timestamp", "elevation", "speed", "mileage", "soc",
+                                     "key_on_time", "latitude", "longitude"]]
+    df["mileage"] = df["mileage"].astype(float)
+    idx = np.arange(DOUBLE_ARTIFACT_EVERY // 2, len(df), DOUBLE_ARTIFACT_EVERY)
+    df.loc[idx[::2], "mileage"] *= 2
+    df.loc[idx[1::2], "soc"] = (df.loc[idx[1::2], "soc"] * 2).where(lambda s: s <= 1.0, df.loc[idx[1::2], "soc"])
+    return df
+
+
+def fixture_summary() -> str:
+    data = base_dataset()
+    return (f"base: {BASE_FLEETS} fleets x {BASE_VEHICLES} vehicles, {BASE_DAYS} days from "
+            f"{DEFAULT_START:%Y-%m-%d} (seed {SEED}); "
+            + ", ".join(f"{t}={len(data[t]):,}" for t in ("veh_tel", "refuel_inf", "veh_daily", "maintenance")))
@@ -0,0 +1,489 @@
+"""
+Concurrent-user load test for the dashboard's Dash callbacks.
+
+Starts gunicorn on app:server with --workers / --threads (or targets an app already running at
+--url) and runs --users simulated analysts against it. Each one replays what the browser sends
+for a page visit:
+    load    the pages routing callback, then every callback whose inputs are on the returned
+            layout (what the Dash renderer fires on first paint)
+    fleet   pick another fleet from the fleet dropdown's options
+    dates   pick another date window
+with --think seconds between steps, until --duration is up. As in the browser, a callback whose
+inputs are outputs of another pending callback waits for it; independent ones go out together,
+and background callbacks are polled at their interval until the job's result is ready.
+
+Reports p50 / p95 / p99 per callback (labelled by output, as /metrics does) and per step, errors,
+throughput, and the resident memory of each gunicorn worker at start, peak and end (Linux /proc).
+
+The server it starts reads LOCAL_DATABASE_URL (or --dsn), a local database loaded with
+data_update/generate_synthetic_data.py, never the production DATABASE_URL.
+
+Usage:
+    python benchmarks/load_test.py --users 10 --workers 2 --threads 4 --duration 120
+    python benchmarks/load_test.py --pages /telematics --users 25 --think 2 --json results.json
+    python benchmarks/load_test.py --url http://127.0.0.1:8050 --users 5
+"""
+
+import argparse
+import datetime as dt
+import json
+import os
+import secrets
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import requests
+from dotenv import load_dotenv
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+from data_update.paths import ROOT_ENV_FILE  # noqa: E402
+
+ROUTING_OUTPUT = ".._pages_content.children..._pages_store.data.."
+BROWSER_CONNECTIONS = 6     # parallel requests a browser tab sends to one host
+VISIT_STEPS = 3             # interactions per page visit after the load
+
+# Per page: the fleet control and the date range picker the steps change.
+PAGE_CONTROLS = {
+    "/telematics": {"fleet": "fleet-dropdown-telematics", "dates": "date-picker-telematics"},
+    "/charging": {"fleet": "fleet-filter", "dates": "date-range-picker"},
+}
+
+
+def log(msg: str) -> None:
+    now = dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    print(f"[{now}] {msg}", flush=True)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=10, help="Concurrent simulated analysts.")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds of load after ramp-up starts.")
+    parser.add_argument("--ramp", type=float, default=10, help="Seconds over which users start.")
+    parser.add_argument("--think", type=float, default=3, help="Mean think time between steps (s).")
+    parser.add_argument("--pages", nargs="*", default=list(PAGE_CONTROLS), choices=list(PAGE_CONTROLS))
+    parser.add_argument("--workers", type=int, default=2, help="gunicorn workers.")
+    parser.add_argument("--threads", type=int, default=4, help="gunicorn threads per worker.")
+    parser.add_argument("--timeout", type=int, default=120, help="gunicorn worker timeout (s).")
+    parser.add_argument("--port", type=int, default=8077)
+    parser.add_argument("--url", default=None, help="Target a running app instead of starting gunicorn.")
+    parser.add_argument("--user", default=os.getenv("ZEV_USER1"), help="Basic-auth user for --url.")
+    parser.add_argument("--password", default=os.getenv("ZEV_PASS1"), help="Basic-auth password for --url.")
+    parser.add_argument("--end-date", default=None,
+                        help="Anchor for date windows when the page sets none (default: the page's end date or today).")
+    parser.add_argument("--dsn", default=None, help="Local Postgres DSN for the server (default: LOCAL_DATABASE_URL).")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", default=None, help="Also write the results to this file.")
+    return parser.parse_args()
+
+
+def resolve_dsn(arg_dsn: str | None) -> str:
+    load_dotenv(dotenv_path=ROOT_ENV_FILE)
+    dsn = arg_dsn or os.getenv("LOCAL_DATABASE_URL")
+    if not dsn:
+        raise SystemExit("Set LOCAL_DATABASE_URL or pass --dsn (a local database, not production).")
+    if dsn == os.getenv("DATABASE_URL"):
+        raise SystemExit("Refusing to load-test against DATABASE_URL; use a local database.")
+    return dsn
+
+
+# ---------- server ----------
+def start_server(args, dsn: str, user: str, password: str) -> subprocess.Popen:
+    env = os.environ.copy()
+    env.update(DATABASE_URL=dsn, GUNICORN_THREADS=str(args.threads), ZEV_USER1=user, ZEV_PASS1=password)
+    cmd = [
+        sys.executable, "-m", "gunicorn", "app:server",
+        "--workers", str(args.workers), "--threads", str(args.threads),
+        "--bind", f"127.0.0.1:{args.port}", "--timeout", str(args.timeout), "--log-level", "warning",
+    ]
+    log(f"Starting gunicorn: {args.workers} workers x {args.threads} threads on port {args.port}")
+    return subprocess.Popen(cmd, cwd=PROJECT_ROOT, env=env)
+
+
+def wait_ready(url: str, auth, proc: subprocess.Popen | None, timeout: float = 180) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc is not None and proc.poll() is not None:
+            raise SystemExit(f"gunicorn exited with code {proc.returncode}")
+        try:
+            if requests.get(f"{url}/_dash-dependencies", auth=auth, timeout=5).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(1)
+    raise SystemExit(f"{url} did not become ready within {timeout:.0f}s")
+
+
+def _rss_mb(pid: int) -> float | None:
+    try:
+        with open(f"/proc/{pid}/status", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+def _children(pid: int) -> list[int]:
+    pids = []
+    for task in Path(f"/proc/{pid}/task").glob("*"):
+        try:
+            pids += [int(p) for p in (task / "children").read_text().split()]
+        except (OSError, ValueError):
+            continue
+    return pids
+
+
+class MemorySampler(threading.Thread):
+    """Samples the RSS of the gunicorn master's workers every `interval` seconds."""
+
+    def __init__(self, master_pid: int, interval: float = 1.0):
+        super().__init__(daemon=True)
+        self.master_pid = master_pid
+        self.interval = interval
+        self.workers: dict[int, dict[str, float]] = {}
+        self._done = threading.Event()
+
+    def sample(self) -> None:
+        for pid in _children(self.master_pid):
+            rss = _rss_mb(pid)
+            if rss is None:
+                continue
+            w = self.workers.setdefault(pid, {"start": rss, "peak": rss, "end": rss})
+            w["peak"] = max(w["peak"], rss)
+            w["end"] = rss
+
+    def run(self) -> None:
+        while not self._done.is_set():
+            self.sample()
+            self._done.wait(self.interval)
+
+    def stop(self) -> None:
+        self._done.set()
+        self.join()
+        self.sample()
+
+
+# ---------- Dash protocol ----------
+def _split_output(output: str) -> list[tuple[str, str]]:
+    """'..a.children...b.figure..' -> [(a, children), (b, figure)]; 'a.children' -> [(a, children)]."""
+    parts = output[2:-2].split("...") if output.startswith("..") else [output]
+    return [tuple(p.rsplit(".", 1)) for p in parts]
+
+
+@dataclass(frozen=True)
+class Dep:
+    output: str
+    outputs: tuple[tuple[str, str], ...]
+    inputs: tuple[tuple[str, str], ...]
+    state: tuple[tuple[str, str], ...]
+    prevent_initial_call: bool
+    poll_seconds: float | None = None   # background callbacks: polling interval
+
+    @property
+    def label(self) -> str:
+        first = ".".join(self.outputs[0])
+        return first if len(self.outputs) == 1 else f"{first} (+{len(self.outputs) - 1})"
+
+    def payload(self, values: dict, changed: set) -> dict:
+        outs = [{"id": i, "property": p} for i, p in self.outputs]
+        return {
+            "output": self.output,
+            "outputs": outs if self.output.startswith("..") else outs[0],
+            "inputs": [{"id": i, "property": p, "value": values.get((i, p))} for i, p in self.inputs],
+            "changedPropIds": [f"{i}.{p}" for i, p in self.inputs if (i, p) in changed],
+            "state": [{"id": i, "property": p, "value": values.get((i, p))} for i, p in self.state],
+        }
+
+
+def load_dependencies(session: requests.Session, url: str) -> tuple[Dep, list[Dep]]:
+    """The routing callback and the server-side callbacks with plain string ids."""
+    routing, deps = None, []
+    for d in session.get(f"{url}/_dash-dependencies", timeout=30).json():
+        if d.get("clientside_function"):
+            continue
+        dep = Dep(
+            output=d["output"],
+            outputs=tuple(_split_output(d["output"])),
+            inputs=tuple((x["id"], x["property"]) for x in d["inputs"]),
+            state=tuple((x["id"], x["property"]) for x in d.get("state", [])),
+            prevent_initial_call=bool(d.get("prevent_initial_call")),
+            poll_seconds=d["background"]["interval"] / 1000 if d.get("background") else None,
+        )
+        if d["output"] == ROUTING_OUTPUT:
+            routing = dep
+        elif not any(i.startswith("{") for i, _ in dep.inputs + dep.outputs):   # skip pattern-matching ids
+            deps.append(dep)
+    if routing is None:
+        raise SystemExit("No pages routing callback found; is the app running with use_pages=True?")
+    return routing, deps
+
+
+def _walk_layout(node, values: dict, ids: set) -> None:
+    """Collect (id, prop) -> value for every component with an id in a serialized layout."""
+    if isinstance(node, list):
+        for child in node:
+            _walk_layout(child, values, ids)
+        return
+    if not isinstance(node, dict) or "props" not in node:
+        return
+    props = node["props"]
+    cid = props.get("id")
+    if isinstance(cid, str):
+        ids.add(cid)
+    for prop, value in props.items():
+        if isinstance(cid, str):
+            values[(cid, prop)] = value
+        if isinstance(value, (dict, list)):
+            _walk_layout(value, values, ids)
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.callbacks = defaultdict(list)   # label -> seconds
+        self.steps = defaultdict(list)       # "page step" -> seconds
+        self.errors = defaultdict(int)       # label -> count
+
+    def callback(self, label: str, seconds: float, ok: bool) -> None:
+        with self.lock:
+            self.callbacks[label].append(seconds)
+            if not ok:
+                self.errors[label] += 1
+
+    def step(self, label: str, seconds: float) -> None:
+        with self.lock:
+            self.steps[label].append(seconds)
+
+
+class User:
+    """One analyst: a browser tab with its own session, layout state and request pool."""
+
+    def __init__(self, url, auth, routing: Dep, deps: list[Dep], stats: Stats, rng, args):
+        self.url, self.routing, self.deps, self.stats, self.rng, self.args = url, routing, deps, stats, rng, args
+        self.session = requests.Session()
+        self.session.auth = auth
+        self.pool = ThreadPoolExecutor(max_workers=BROWSER_CONNECTIONS)
+        self.values: dict = {}
+        self.ids: set = set()
+
+    def _post(self, dep: Dep, changed: set) -> dict:
+        """One callback round trip; for a background callback, until its job has finished."""
+        started = time.perf_counter()
+        ok = False
+        endpoint, payload = f"{self.url}/_dash-update-component", dep.payload(self.values, changed)
+        try:
+            r = self.session.post(endpoint, json=payload, timeout=self.args.timeout + 30)
+            job = None
+            while r.status_code == 200:
+                data = r.json()
+                if dep.poll_seconds is None or "response" in data:
+                    ok = True
+                    return data.get("response", {})
+                job = job or {"cacheKey": data["cacheKey"], "job": data["job"]}
+                if time.perf_counter() - started > self.args.timeout + 30:
+                    return {}
+                time.sleep(dep.poll_seconds)
+                r = self.session.post(endpoint, params=job, json=payload, timeout=self.args.timeout + 30)
+            ok = r.status_code == 204
+            return {}
+        except (requests.RequestException, ValueError, KeyError):
+            return {}
+        finally:
+            self.stats.callback(dep.label, time.perf_counter() - started, ok)
+
+    def _apply(self, response: dict) -> set:
+        changed = set()
+        for cid, props in response.items():
+            for prop, value in props.items():
+                self.values[(cid, prop)] = value
+                changed.add((cid, prop))
+        return changed
+
+    def _on_page(self, dep: Dep) -> bool:
+        return all(i in self.ids for i, _ in dep.inputs + dep.outputs)
+
+    def _fire(self, pending: list[Dep], changed: set) -> None:
+        """Run callbacks like the renderer: upstream first, independent ones concurrently."""
+        for _ in range(10):
+            if not pending:
+                return
+            outputs = {o for d in pending for o in d.outputs}
+            ready = [d for d in pending if not any(
+                i in outputs and i not in d.outputs for i in d.inputs)] or pending
+            responses = list(self.pool.map(lambda d: self._post(d, changed), ready))
+            changed = set()
+            for response in responses:
+                changed |= self._apply(response)
+            waiting = [d for d in pending if d not in ready]
+            triggered = [d for d in self.deps if self._on_page(d) and changed & set(d.inputs) and d not in waiting]
+            pending = waiting + triggered
+
+    def load(self, page: str) -> None:
+        self.values = {("_pages_location", "pathname"): page, ("_pages_location", "search"): ""}
+        response = self._post(self.routing, {("_pages_location", "pathname")})
+        layout = response.get("_pages_content", {}).get("children")
+        self.ids = set()
+        _walk_layout(layout, self.values, self.ids)
+        self._fire([d for d in self.deps if self._on_page(d) and not d.prevent_initial_call], set())
+
+    def change_fleet(self, page: str) -> None:
+        cid = PAGE_CONTROLS[page]["fleet"]
+        options = self.values.get((cid, "options")) or []
+        choices = [None] + [o["value"] if isinstance(o, dict) else o for o in options]
+        self.values[(cid, "value")] = choices[int(self.rng.integers(len(choices)))]
+        self._fire([d for d in self.deps if self._on_page(d) and (cid, "value") in d.inputs], {(cid, "value")})
+
+    def change_dates(self, page: str) -> None:
+        cid = PAGE_CONTROLS[page]["dates"]
+        anchor = (self.values.get((cid, "end_date")) or self.values.get((cid, "max_date_allowed"))
+                  or self.args.end_date or dt.date.today().isoformat())
+        end = dt.date.fromisoformat(str(anchor)[:10]) - dt.timedelta(days=int(self.rng.integers(0, 60)))
+        start = end - dt.timedelta(days=int(self.rng.choice([7, 14, 30, 90])))
+        self.values[(cid, "start_date")] = start.isoformat()
+        self.values[(cid, "end_date")] = end.isoformat()
+        changed = {(cid, "start_date"), (cid, "end_date")}
+        self._fire([d for d in self.deps if self._on_page(d) and changed & set(d.inputs)], changed)
+
+    def _step(self, label: str, fn, page: str) -> None:
+        started = time.perf_counter()
+        fn(page)
+        self.stats.step(f"{page} {label}", time.perf_counter() - started)
+
+    def _think(self, deadline: float) -> None:
+        pause = self.rng.uniform(0.5, 1.5) * self.args.think
+        time.sleep(max(0.0, min(pause, deadline - time.monotonic())))
+
+    def run(self, deadline: float) -> None:
+        try:
+            while time.monotonic() < deadline:
+                page = self.args.pages[int(self.rng.integers(len(self.args.pages)))]
+                self._step("load", self.load, page)
+                for _ in range(VISIT_STEPS):
+                    self._think(deadline)
+                    if time.monotonic() >= deadline:
+                        break
+                    if self.rng.random() < 0.5:
+                        self._step("fleet", self.change_fleet, page)
+                    else:
+                        self._step("dates", self.change_dates, page)
+                self._think(deadline)
+        finally:
+            self.pool.shutdown(wait=True)
+
+
+# ---------- report ----------
+def _percentiles(samples: list[float]) -> dict:
+    ms = np.asarray(samples) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {"n": len(ms), "p50_ms": round(p50, 1), "p95_ms": round(p95, 1), "p99_ms": round(p99, 1),
+            "max_ms": round(float(ms.max()), 1)}
+
+
+def _print_table(title: str, series: dict, errors: dict | None = None) -> dict:
+    print(f"\n{title:<52}{'n':>7}{'err':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    out = {}
+    for label, samples in sorted(series.items()):
+        p = _percentiles(samples)
+        p["errors"] = (errors or {}).get(label, 0)
+        out[label] = p
+        print(f"{label:<52}{p['n']:>7}{p['errors']:>6}{p['p50_ms']:>10.1f}{p['p95_ms']:>10.1f}"
+              f"{p['p99_ms']:>10.1f}{p['max_ms']:>10.1f}")
+    return out
+
+
+def report(args, stats: Stats, elapsed: float, sampler: MemorySampler | None, pool: dict | None) -> dict:
+    total = sum(len(v) for v in stats.callbacks.values())
+    errors = sum(stats.errors.values())
+    target = args.url or f"{args.workers} workers x {args.threads} threads"
+    print(f"\n{args.users} users, {target}, {elapsed:.0f}s: "
+          f"{total:,} callback requests ({total / elapsed:.1f}/s), {errors} errors")
+    results = {
+        "config": {k: getattr(args, k) for k in ("users", "workers", "threads", "url", "duration", "think", "pages")},
+        "requests": total, "errors": errors, "requests_per_second": round(total / elapsed, 2),
+        "callbacks": _print_table("callback (output)", stats.callbacks, stats.errors),
+        "steps": _print_table("step (user-visible)", stats.steps),
+    }
+    if sampler is not None and sampler.workers:
+        print(f"\n{'worker pid':<14}{'start MB':>10}{'peak MB':>10}{'end MB':>10}{'growth MB':>11}")
+        for pid, w in sorted(sampler.workers.items()):
+            print(f"{pid:<14}{w['start']:>10.1f}{w['peak']:>10.1f}{w['end']:>10.1f}{w['end'] - w['start']:>11.1f}")
+        if len(sampler.workers) > args.workers:
+            print(f"{len(sampler.workers) - args.workers} worker(s) were restarted (timeouts or crashes)")
+        results["workers"] = {str(pid): {k: round(v, 1) for k, v in w.items()} for pid, w in sampler.workers.items()}
+    if pool:
+        print(f"\nDB pool (one worker's view, /health/db): {json.dumps(pool)}")
+        results["db_pool"] = pool
+    return results
+
+
+def main():
+    args = parse_args()
+    proc = None
+    if args.url:
+        url = args.url.rstrip("/")
+        auth = (args.user, args.password) if args.user else None
+    else:
+        dsn = resolve_dsn(args.dsn)
+        user, password = "loadtest", secrets.token_urlsafe(12)
+        auth = (user, password)
+        url = f"http://127.0.0.1:{args.port}"
+        proc = start_server(args, dsn, user, password)
+
+    sampler = None
+    try:
+        wait_ready(url, auth, proc)
+        session = requests.Session()
+        session.auth = auth
+        routing, deps = load_dependencies(session, url)
+        if proc is not None and Path("/proc").exists():
+            sampler = MemorySampler(proc.pid)
+            sampler.start()
+
+        stats = Stats()
+        deadline = time.monotonic() + args.duration
+        users = [User(url, auth, routing, deps, stats, np.random.default_rng([args.seed, n]), args)
+                 for n in range(args.users)]
+        log(f"{args.users} users on {', '.join(args.pages)} for {args.duration:.0f}s (ramp {args.ramp:.0f}s)")
+        started = time.monotonic()
+        threads = []
+        for n, user in enumerate(users):
+            t = threading.Thread(target=user.run, args=(deadline,), daemon=True)
+            t.start()
+            threads.append(t)
+            if n < len(users) - 1:
+                time.sleep(args.ramp / len(users))
+        for t in threads:
+            t.join()
+        elapsed = time.monotonic() - started
+
+        if sampler is not None:
+            sampler.stop()
+        try:
+            pool = session.get(f"{url}/health/db", timeout=10).json()
+        except (requests.RequestException, ValueError):
+            pool = None
+        results = report(args, stats, elapsed, sampler, pool)
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+            log(f"Wrote {args.json}")
+    finally:
+        if proc is not None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+if __name__ == "__main__":
+    main()
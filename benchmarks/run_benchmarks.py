@@ -0,0 +1,179 @@
+"""
+Run the benchmark cases (benchmarks/cases.py) and compare them with the pinned baselines.
+
+Inputs come from the synthetic generator in-process (benchmarks/fixtures.py), so no database is
+needed except for the cases marked needs_db: those run only with LOCAL_DATABASE_URL (or --dsn)
+pointing at a local database loaded with data_update/generate_synthetic_data.py, and are skipped
+otherwise. Page modules build their engine from DATABASE_URL at import; this script points it at
+the local database (or at nothing), so a benchmark can never query production. @cpu_bound
+functions run inline (ZEV_OFFLOAD_PROCESSES=0) unless the variable is set, so the numbers measure
+the computation rather than the process pool round trip.
+
+For every case and size it prints the best wall time of --repeat runs, throughput (input rows/s)
+and peak traced memory, against baselines.json. A case regresses when its time or peak memory
+exceeds the baseline by more than --threshold (default 1.5x); the script then exits 1.
+Baselines are only changed by --update-baselines, which rewrites the entries that were run.
+
+Usage:
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --sizes small medium large --cases gps_filter aggregate_daily
+    python benchmarks/run_benchmarks.py --update-baselines
+"""
+
+import argparse
+import datetime as dt
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.append(str(PROJECT_ROOT))
+from data_update.paths import ROOT_ENV_FILE  # noqa: E402
+
+BASELINES_FILE = Path(__file__).resolve().parent / "baselines.json"
+DEFAULT_THRESHOLD = 1.5
+NO_DATABASE_URL = "postgresql://benchmark@127.0.0.1:9/benchmark"   # discard port: fails fast
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cases", nargs="*", default=None, help="Case names (default: all).")
+    parser.add_argument("--sizes", nargs="*", default=["small", "medium"], choices=["small", "medium", "large"])
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case; the best is kept.")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Slowdown / memory growth vs baseline that counts as a regression.")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the traced-memory run.")
+    parser.add_argument("--update-baselines", action="store_true", help="Pin this run's results as the baselines.")
+    parser.add_argument("--dsn", default=None, help="Local Postgres DSN for needs_db cases (default: LOCAL_DATABASE_URL).")
+    return parser.parse_args()
+
+
+def resolve_dsn(arg_dsn: str | None) -> str | None:
+    load_dotenv(dotenv_path=ROOT_ENV_FILE)
+    dsn = arg_dsn or os.getenv("LOCAL_DATABASE_URL")
+    if dsn and dsn == os.getenv("DATABASE_URL"):
+        raise SystemExit("Refusing to benchmark against DATABASE_URL; use a local database.")
+    return dsn
+
+
+def measure(call, repeat: int, memory: bool) -> tuple[float, float | None]:
+    """Best wall time of `repeat` calls, and peak traced MB of one more call."""
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        call()
+        best = min(best, time.perf_counter() - started)
+    peak_mb = None
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            call()
+            peak_mb = tracemalloc.get_traced_memory()[1] / 1e6
+        finally:
+            tracemalloc.stop()
+    return best, peak_mb
+
+
+def load_baselines() -> dict:
+    if not BASELINES_FILE.exists():
+        return {"environment": {}, "cases": {}}
+    with open(BASELINES_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baselines(baselines: dict, results: dict) -> None:
+    import numpy
+    import pandas
+
+    baselines["cases"].update(results)
+    baselines["cases"] = dict(sorted(baselines["cases"].items()))
+    baselines["environment"] = {
+        "recorded": dt.date.today().isoformat(),
+        "python": platform.python_version(),
+        "pandas": pandas.__version__,
+        "numpy": numpy.__version__,
+        "machine": f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPUs",
+    }
+    with open(BASELINES_FILE, "w", encoding="utf-8") as f:
+        json.dump(baselines, f, indent=2)
+        f.write("\n")
+
+
+def _verdict(seconds: float, peak_mb: float | None, base: dict | None, threshold: float) -> tuple[str, bool]:
+    if not base:
+        return "no baseline", False
+    ratio = seconds / base["seconds"]
+    text = f"{ratio:.2f}x time"
+    regressed = ratio > threshold
+    if peak_mb is not None and base.get("peak_mb"):
+        mem_ratio = peak_mb / base["peak_mb"]
+        text += f", {mem_ratio:.2f}x mem"
+        regressed = regressed or mem_ratio > threshold
+    return ("REGRESSION " if regressed else "") + text, regressed
+
+
+def main():
+    args = parse_args()
+    dsn = resolve_dsn(args.dsn)
+    os.environ["DATABASE_URL"] = dsn or NO_DATABASE_URL
+    os.environ.setdefault("ZEV_OFFLOAD_PROCESSES", "0")
+    os.chdir(PROJECT_ROOT)   # pages open assets/ with relative paths
+
+    from benchmarks.cases import CASES
+    from benchmarks.fixtures import fixture_summary
+
+    cases = [c for c in CASES if args.cases is None or c.name in args.cases]
+    unknown = set(args.cases or []) - {c.name for c in CASES}
+    if unknown:
+        raise SystemExit(f"Unknown cases: {', '.join(sorted(unknown))}. Known: {', '.join(c.name for c in CASES)}")
+
+    baselines = load_baselines()
+    env = baselines.get("environment") or {}
+    print(fixture_summary())
+    if env:
+        print(f"baselines: {env.get('recorded')} on {env.get('machine')}, python {env.get('python')}, "
+              f"pandas {env.get('pandas')}")
+    print(f"best of {args.repeat}, regression threshold {args.threshold:.2f}x\n")
+    print(f"{'case':<22}{'size':<8}{'rows':>11}{'seconds':>10}{'rows/s':>13}{'peak MB':>10}  vs baseline")
+
+    results, regressions = {}, []
+    for case in cases:
+        if case.needs_db and not dsn:
+            print(f"{case.name:<22}skipped: {case.target} needs LOCAL_DATABASE_URL or --dsn ({case.notes})")
+            continue
+        for size in args.sizes:
+            key = f"{case.name}/{size}"
+            try:
+                call, rows = case.setup(case.sizes[size])
+            except Exception as exc:
+                print(f"{case.name:<22}{size:<8}setup failed: {exc}")
+                continue
+            seconds, peak_mb = measure(call, args.repeat, not args.no_memory)
+            verdict, regressed = _verdict(seconds, peak_mb, baselines["cases"].get(key), args.threshold)
+            mem_text = f"{peak_mb:>10.1f}" if peak_mb is not None else f"{'-':>10}"
+            print(f"{case.name:<22}{size:<8}{rows:>11,}{seconds:>10.3f}{rows / seconds:>13,.0f}{mem_text}  {verdict}")
+            results[key] = {"rows": rows, "seconds": round(seconds, 4)}
+            if peak_mb is not None:
+                results[key]["peak_mb"] = round(peak_mb, 1)
+            if regressed:
+                regressions.append(key)
+
+    if args.update_baselines:
+        save_baselines(baselines, results)
+        print(f"\nPinned {len(results)} baselines in {BASELINES_FILE}")
+    elif regressions:
+        print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
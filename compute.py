@@ -0,0 +1,229 @@
+"""
+CPU-heavy, side-effect-free parts of the page callbacks.
+
+Page modules register Dash pages and query the database at import, so the bodies that
+offload.py may run in its process pool live here, where importing is cheap. Functions marked
+@cpu_bound go to the pool for large inputs and run inline otherwise.
+"""
+
+import numpy as np
+import pandas as pd
+
+from offload import cpu_bound
+
+LOCAL_TZ = "America/New_York"
+WEEKDAY_ORDER = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+# ---------- Charging analysis ----------
+def to_local_time(series: pd.Series) -> pd.Series:
+    dt = pd.to_datetime(series, errors="coerce")
+    if getattr(dt.dt, "tz", None) is None:
+        dt = dt.dt.tz_localize("UTC", ambiguous="NaT", nonexistent="NaT")
+    return dt.dt.tz_convert(LOCAL_TZ)
+
+
+@cpu_bound
+def weekday_hour_duration_matrix(df: pd.DataFrame):
+    if df.empty:
+        return None
+
+    d = df[["charge_start_time", "charge_end_time"]].copy()
+    d["start_local"] = to_local_time(d["charge_start_time"])
+    d["end_local"] = to_local_time(d["charge_end_time"])
+    d = d.dropna(subset=["start_local", "end_local"])
+    d = d[d["end_local"] > d["start_local"]]
+    if d.empty:
+        return None
+
+    minutes = pd.DataFrame(0.0, index=WEEKDAY_ORDER, columns=range(24))
+    for start_ts, end_ts in d[["start_local", "end_local"]].itertuples(index=False):
+        cursor = start_ts.floor("h")
+        while cursor < end_ts:
+            next_hour = cursor + pd.Timedelta(hours=1)
+            overlap_start = max(start_ts, cursor)
+            overlap_end = min(end_ts, next_hour)
+            overlap_min = (overlap_end - overlap_start).total_seconds() / 60.0
+            minutes.iat[cursor.weekday(), cursor.hour] += overlap_min
+            cursor = next_hour
+
+    return minutes
+
+
+# ---------- Telematics map ----------
+@cpu_bound
+def trajectory_coords(df: pd.DataFrame) -> list:
+    """[(fleet, vehicle, [(lat, lon), ...])] in time order, for every vehicle with at least two points."""
+    out = []
+    for (fleet, vehicle), group_df in df.groupby(["fleet_name", "fleet_vehicle_id"], sort=False):
+        group_df = group_df.sort_values("timestamp")
+        if len(group_df) < 2:
+            continue
+        out.append((fleet, vehicle, list(zip(group_df["latitude"], group_df["longitude"]))))
+    return out
+
+
+# ---------- Vehicle daily usage ----------
+def resolve_efficiency_rows(df):
+    out = df.copy()
+    dist = pd.to_numeric(out.get("tot_dist"), errors="coerce")
+    energy = pd.to_numeric(out.get("tot_energy"), errors="coerce")
+    reported = (
+        pd.to_numeric(out["efficiency"], errors="coerce")
+        if "efficiency" in out.columns
+        else pd.Series(index=out.index, dtype="float64")
+    )
+    # Reference rule: apply distance filter first for all efficiency paths.
+    # Only rows with tot_dist >= 10 are eligible for efficiency.
+    dist_ok = dist >= 10
+    computed = pd.Series(index=out.index, dtype="float64")
+    # Fallback rule: compute efficiency only when not reported and inputs are valid.
+    # efficiency = tot_energy / tot_dist, requiring positive energy and valid distance.
+    compute_mask = dist_ok & (energy > 0) & pd.notna(energy) & pd.notna(dist)
+    computed.loc[compute_mask] = energy.loc[compute_mask] / dist.loc[compute_mask]
+    # Preferred source rule: use reported efficiency when present; else use computed.
+    out["efficiency_resolved"] = reported.where(dist_ok & pd.notna(reported), computed)
+    out["tot_dist_num"] = dist
+    # Shared validity flag used by daily chart and fleet summary table.
+    out["efficiency_valid"] = dist_ok & pd.notna(out["efficiency_resolved"])
+    return out
+
+
+@cpu_bound
+def fleet_usage_summary(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Per-fleet figures behind the Daily Usage Summary table (numbers, not yet formatted), in one
+    grouped aggregation. "Daily" figures are means over the rows with a positive value; efficiency
+    is distance-weighted over the rows resolve_efficiency_rows marks valid (the page resolves them
+    once at load).
+    """
+    if "efficiency_resolved" not in df.columns:
+        df = resolve_efficiency_rows(df)
+    valid = df["efficiency_valid"].astype(bool)
+    dist = df["tot_dist_num"]
+
+    def positive(col):
+        return df[col].where(df[col] > 0)
+
+    parts = pd.DataFrame({
+        "fleet": df["fleet"],
+        "tot_dist": df["tot_dist"],
+        "dist_pos": positive("tot_dist"),
+        "energy_pos": positive("tot_energy"),
+        "soc_pos": positive("tot_soc_used"),
+        "dura_pos": positive("tot_dura"),
+        "idle_time": df["idle_time"],
+        # Same aggregation rule as daily efficiency chart (distance-weighted).
+        "eff_num": (df["efficiency_resolved"] * dist).where(valid),
+        "eff_den": dist.where(valid),
+    })
+    g = parts.groupby("fleet", observed=True).agg(
+        tot_dist=("tot_dist", "sum"),
+        dist_pos=("dist_pos", "mean"),
+        energy_pos=("energy_pos", "mean"),
+        soc_pos=("soc_pos", "mean"),
+        dura_pos=("dura_pos", "mean"),
+        idle_time=("idle_time", "mean"),
+        eff_num=("eff_num", "sum"),
+        eff_den=("eff_den", "sum"),
+    )
+    return pd.DataFrame({
+        "Fleet": np.asarray(g.index, dtype=object),
+        "Total Distance (mi)": g["tot_dist"].round(2).to_numpy(),
+        "Daily Distance (mi)": g["dist_pos"].to_numpy(),
+        "Daily Energy (kWh)": g["energy_pos"].to_numpy(),
+        "Energy Efficiency (kWh/mi)": (g["eff_num"] / g["eff_den"]).where(g["eff_den"] > 0).to_numpy(),
+        "Daily SOC Used (%)": g["soc_pos"].to_numpy(),
+        "Daily Driving Time (hr)": g["dura_pos"].to_numpy(),
+        "Daily Idle Time (hr)": g["idle_time"].to_numpy(),
+    })
+
+
+# ---------- Maintenance ----------
+COST_COLS = ["parts_cost", "labor_cost", "add_cost"]
+FLEET_TABLE_COLUMNS = [
+    "Fleet", "Asset type", "Events",
+    "Total cost", "Avg total cost", "Avg parts cost", "Avg labor cost", "Avg added cost",
+    "Avg miles between services",
+]
+
+
+def _miles_between_services(df_scope: pd.DataFrame, group) -> pd.Series:
+    """
+    Mean positive enter_odo step of each vehicle within each group (array of group codes aligned
+    with df_scope), indexed by (group, veh_id): one sort by (group, veh_id, date) and a grouped diff.
+    Vehicles without a positive step are left out.
+    """
+    d = pd.DataFrame({
+        "group": group,
+        "veh_id": df_scope["veh_id"].to_numpy(),
+        "date": df_scope["date"].to_numpy(),
+        "enter_odo": df_scope["enter_odo"].to_numpy(),
+    }).dropna(subset=["veh_id", "enter_odo", "date"])
+    d = d.sort_values(["group", "veh_id", "date"], kind="stable")
+    deltas = d.groupby(["group", "veh_id"], sort=False)["enter_odo"].diff()
+    deltas = deltas.where(deltas > 0)
+    return deltas.groupby([d["group"], d["veh_id"]]).mean().dropna()
+
+
+def avg_miles_between_services(df_scope: pd.DataFrame) -> float:
+    """
+    Per-vehicle: sort by date, diff positive enter_odo; mean per vehicle; then global mean of those means.
+    """
+    per_veh = _miles_between_services(df_scope, np.zeros(len(df_scope), dtype=np.int8))
+    return float(per_veh.mean()) if len(per_veh) else float("nan")
+
+
+@cpu_bound
+def compute_fleet_table(df_scope: pd.DataFrame) -> pd.DataFrame:
+    """
+    A Vehicle and a Charger row per fleet: event counts, costs over the events with all three
+    costs present, and (vehicles) the average miles between services. One grouped aggregation
+    over fleet x asset type; a row can count as both a vehicle and a charger event.
+    """
+    if df_scope.empty:
+        return pd.DataFrame(columns=FLEET_TABLE_COLUMNS)
+
+    fleet, fleets = pd.factorize(df_scope["fleet_name"], use_na_sentinel=False)   # NaN fleet is a group too
+    # Cost-valid subset: all three costs present
+    cost_ok = df_scope[COST_COLS].notna().all(axis=1).to_numpy()
+    costs = pd.DataFrame({"fleet": fleet}, index=np.arange(len(df_scope)))
+    for col in COST_COLS:
+        costs[col] = np.where(cost_ok, df_scope[col].to_numpy(dtype="float64"), np.nan)
+    costs["total_cost"] = costs["parts_cost"] + costs["labor_cost"] + costs["add_cost"]
+
+    is_vehicle = df_scope["veh_id"].notna().to_numpy()
+    # Charger rows include station-level charger rows tagged by maint_ob == 2
+    is_charger = (df_scope["charger_id"].notna() | (df_scope["maint_ob"] == 2)).to_numpy()
+    rows = pd.concat([costs[is_vehicle].assign(asset=0), costs[is_charger].assign(asset=1)], ignore_index=True)
+    agg = rows.groupby(["fleet", "asset"]).agg(
+        events=("fleet", "size"),
+        cost_events=("total_cost", "count"),
+        total_cost=("total_cost", "sum"),
+        avg_total_cost=("total_cost", "mean"),
+        avg_parts_cost=("parts_cost", "mean"),
+        avg_labor_cost=("labor_cost", "mean"),
+        avg_add_cost=("add_cost", "mean"),
+    )
+    agg = agg.reindex(pd.MultiIndex.from_product([range(len(fleets)), [0, 1]], names=["fleet", "asset"]))
+
+    vehicle_miles = (
+        _miles_between_services(df_scope[is_vehicle], fleet[is_vehicle])
+        .groupby(level="group").mean()
+        .reindex(range(len(fleets)))
+    )
+    asset = agg.index.get_level_values("asset").to_numpy()
+    out = pd.DataFrame({
+        "Fleet": np.repeat([f if pd.notna(f) else "Unspecified" for f in fleets], 2),
+        "Asset type": np.where(asset == 0, "Vehicle", "Charger"),
+        "Events": agg["events"].fillna(0).astype(int).to_numpy(),
+        "Total cost": agg["total_cost"].where(agg["cost_events"] > 0).to_numpy(),
+        "Avg total cost": agg["avg_total_cost"].to_numpy(),
+        "Avg parts cost": agg["avg_parts_cost"].to_numpy(),
+        "Avg labor cost": agg["avg_labor_cost"].to_numpy(),
+        "Avg added cost": agg["avg_add_cost"].to_numpy(),
+        "Avg miles between services": np.where(asset == 0, np.repeat(vehicle_miles.to_numpy(), 2), np.nan),
+        "asset_order": asset,
+    })
+    out = out.sort_values(["Fleet", "asset_order"], na_position="last").drop(columns=["asset_order"])
+    return out
@@ -1,14 +1,15 @@
 ﻿from pathlib import Path
 import pandas as pd
-import psycopg2.extras as extras
 import sys, os
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
 
 from data_update.common_data_update import get_conn
+from data_update.ingestion_ledger import IngestionLedger, md5_file, upsert_in_chunks
 from data_update.paths import INCOMING_DATA_DIR
 from data_update.Freight_Equipment_Leasing.common import (
     FLEET_NAME,
+    LOG_FILE,
     get_fleet_id_and_vehicle_maps,
     get_charger_map,
     normalize_soc,
@@ -19,6 +20,9 @@ EXCEL_FILE = INCOMING_DATA_DIR / "Freight Equipment Leasing" / "Charging log" /
 SESSIONS_SHEET = "Sessions list"
 LOCAL_TZ = "America/New_York"
 
+# Same ledger file as the telematics loader, keyed relative to the fleet folder.
+LEDGER = IngestionLedger(LOG_FILE, INCOMING_DATA_DIR / FLEET_NAME)
+
 # Reference SQL for manual cleanup step (run before this script):
 # DELETE FROM public.refuel_inf r
 # WHERE r.charger_id IN (
@@ -93,6 +97,11 @@ def main() -> None:
     if not EXCEL_FILE.exists():
         raise FileNotFoundError(f"Charging file not found: {EXCEL_FILE}")
 
+    file_hash = md5_file(EXCEL_FILE)
+    if LEDGER.is_complete(EXCEL_FILE, file_hash):
+        print(f"[SKIP] {EXCEL_FILE.name} already ingested (set ZEV_FORCE_RELOAD=1 to reload).")
+        return
+
     sessions = load_inputs(EXCEL_FILE)
 
     with get_conn() as conn:
@@ -181,11 +190,9 @@ def main() -> None:
         return
 
     with get_conn() as conn:
-        with conn.cursor() as cur:
-            extras.execute_values(cur, INSERT_SQL, rows, page_size=1000)
-        conn.commit()
+        _, resumed = upsert_in_chunks(conn, INSERT_SQL, rows, LEDGER, EXCEL_FILE, file_hash)
 
-    print(f"[OK] Upserted {len(rows)} rows into refuel_inf")
+    print(f"[OK] Upserted {len(rows) - resumed} rows into refuel_inf (skipped {resumed} from checkpoint)")
 
 
 if __name__ == "__main__":
@@ -1,13 +1,13 @@
-﻿import os, hashlib, shutil, re
+﻿import os, shutil, re
 from datetime import datetime
 from pathlib import Path
-import json
 
 import pandas as pd
 from dotenv import load_dotenv
 import psycopg2
 import psycopg2.extras as _extras
 from data_update.paths import INCOMING_DATA_DIR
+from data_update.ingestion_ledger import IngestionLedger, md5_file
 
 # ---- CONFIG ----
 FREIGHT_VEH_IDS = {"DSE175","DSE176","DSE177","SSE26116","SE28500","SE28501"}
@@ -17,55 +17,19 @@ ARCHIVE_SUB = "_archive"
 LOG_FILE = Path(__file__).parent / "_ingestion_log.json"
 DATEFOLDER_RE = re.compile(r"^\d{8}$")  # YYYYMMDD
 
-def md5_file(p: Path) -> str:
-    h = hashlib.md5()
-    with p.open("rb") as f:
-        for chunk in iter(lambda: f.read(1024 * 1024), b""):
-            h.update(chunk)
-    return h.hexdigest()
-
-def _log_key(file_path: Path) -> str:
-    raw = str(file_path).replace("\\", "/")
-    p = Path(file_path)
-    if not p.is_absolute():
-        return raw
-    for root in (Path(ROOT_DIR),):
-        try:
-            return p.resolve().relative_to(root.resolve()).as_posix()
-        except ValueError:
-            continue
-    return raw
-
-def _normalize_log_data(data: dict) -> dict:
-    return {_log_key(Path(k)): v for k, v in data.items()}
-
-def _load_local_log():
-    if LOG_FILE.exists():
-        try:
-            with open(LOG_FILE, "r", encoding="utf-8") as f:
-                return _normalize_log_data(json.load(f))
-        except Exception:
-            return {}
-    return {}
-
-def _save_local_log(data):
-    with open(LOG_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
+LEDGER = IngestionLedger(LOG_FILE, ROOT_DIR)
 
 def already_ingested(conn, file_path: Path, file_hash: str) -> bool:
     """
     Check if a file with this hash has already been ingested.
     """
-    log_data = _load_local_log()
-    return log_data.get(_log_key(file_path)) == file_hash
+    return LEDGER.is_complete(file_path, file_hash)
 
 def record_ingestion(conn, file_path: Path, file_hash: str, rows_loaded: int):
     """
     Record the file's ingestion into the local log.
     """
-    log_data = _load_local_log()
-    log_data[_log_key(file_path)] = file_hash
-    _save_local_log(log_data)
+    LEDGER.mark_complete(file_path, file_hash)
 
 def get_fleet_id_and_vehicle_maps(conn):
     """
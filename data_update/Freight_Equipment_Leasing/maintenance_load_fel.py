@@ -1,8 +1,6 @@
 ﻿from pathlib import Path
 import re
-from datetime import date, datetime
-from decimal import Decimal, InvalidOperation
-from numbers import Number
+import hashlib
 import pandas as pd
 import psycopg2.extras as extras
 import sys, os
@@ -10,6 +8,7 @@ import sys, os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
 
 from data_update.common_data_update import get_conn
+from data_update.ingestion_ledger import record_source
 from data_update.paths import INCOMING_DATA_DIR
 from data_update.utils import to_boolean
 from common import FLEET_NAME, get_fleet_id_and_vehicle_maps, get_charger_map
@@ -60,6 +59,16 @@ INSERT_COLS = [
     "add_cost_desc",
 ]
 
+# Row-hash normalization (see sql/add_maintenance_row_hash.sql).
+ROW_HASH_SEP = "\x1f"
+NULL_KEY = "__NULL__"
+DATE_KEY_COLS = {"date"}
+TIMESTAMP_KEY_COLS = {"enter_shop", "exit_shop"}
+NUMERIC_KEY_COLS = {
+    "maint_ob", "enter_odo", "exit_odo", "parts_cost", "labor_cost", "add_cost", "charger_id", "veh_id",
+}
+BOOL_KEY_COLS = {"warranty"}
+
 
 def _parse_money(value):
     if pd.isna(value):
@@ -215,68 +224,95 @@ def _load_workbook(path: Path, asset_type: str) -> pd.DataFrame:
     return pd.concat(all_rows, ignore_index=True)
 
 
-def _compare_value(value) -> str:
-    if pd.isna(value):
-        return "__NULL__"
-    if isinstance(value, pd.Timestamp):
-        return value.strftime("%Y-%m-%d %H:%M:%S")
-    if isinstance(value, datetime):
-        return value.strftime("%Y-%m-%d %H:%M:%S")
-    if isinstance(value, date):
-        return value.isoformat()
-    if isinstance(value, bool):
-        return str(value)
-    if isinstance(value, (Decimal, Number)):
-        try:
-            return format(Decimal(str(value)).normalize(), "f")
-        except (InvalidOperation, ValueError):
-            return str(value).strip()
-    return str(value).strip()
-
-
-def _to_compare_frame(df: pd.DataFrame) -> pd.DataFrame:
-    c = df.copy()
-    for col in INSERT_COLS:
-        if col not in c.columns:
-            c[col] = None
-        c[col] = c[col].map(_compare_value)
-
-    return c[INSERT_COLS]
-
+def _key_series(series: pd.Series, col: str) -> pd.Series:
+    """Normalize one column to the string form used in the row hash."""
+    if col in DATE_KEY_COLS:
+        key = pd.to_datetime(series, errors="coerce").dt.strftime("%Y-%m-%d")
+    elif col in TIMESTAMP_KEY_COLS:
+        key = pd.to_datetime(series, errors="coerce").dt.strftime("%Y-%m-%d %H:%M:%S")
+    elif col in NUMERIC_KEY_COLS:
+        num = pd.to_numeric(series, errors="coerce").astype("float64")
+        key = num.astype(str)
+        # Integral values hash without a trailing ".0" so 12 == 12.0 == Decimal("12").
+        integral = num.notna() & (num % 1 == 0)
+        key[integral] = num[integral].astype("int64").astype(str)
+        key[num.isna()] = None
+    elif col in BOOL_KEY_COLS:
+        key = series.map({True: "True", False: "False"})
+    else:
+        key = series.astype("string").str.strip()
+    return key.astype(object).where(key.notna(), NULL_KEY)
+
+
+def _row_hashes(df: pd.DataFrame) -> pd.Series:
+    """md5 of the normalized INSERT_COLS values, one per row."""
+    if df.empty:
+        return pd.Series([], index=df.index, dtype=object)
+    keys = [
+        _key_series(df[col] if col in df.columns else pd.Series(None, index=df.index, dtype=object), col)
+        for col in INSERT_COLS
+    ]
+    joined = keys[0].str.cat(keys[1:], sep=ROW_HASH_SEP)
+    return pd.Series(
+        [hashlib.md5(v.encode("utf-8")).hexdigest() for v in joined],
+        index=df.index,
+        dtype=object,
+    )
 
-def _filter_new_rows(conn, incoming: pd.DataFrame) -> pd.DataFrame:
-    if incoming.empty:
-        return incoming
 
+def _backfill_row_hashes(conn) -> int:
+    """
+    Hash rows that predate the row_hash column (or were loaded by other fleets' scripts).
+    Only touches rows WHERE row_hash IS NULL, so after the first run this is a no-op.
+    """
     with conn.cursor() as cur:
         cur.execute(
             """
             SELECT
-                date, maint_ob, maint_categ, maint_loc, enter_shop, exit_shop,
+                id, date, maint_ob, maint_categ, maint_loc, enter_shop, exit_shop,
                 enter_odo, exit_odo, parts_cost, labor_cost, add_cost, warranty,
                 problem, work_perf, charger_id, veh_id, add_cost_desc
             FROM public.maintenance
+            WHERE row_hash IS NULL
             """
         )
-        existing_rows = cur.fetchall()
+        rows = cur.fetchall()
+        if not rows:
+            return 0
+
+        unhashed = pd.DataFrame(rows, columns=["id"] + INSERT_COLS)
+        pairs = list(zip(unhashed["id"].tolist(), _row_hashes(unhashed).tolist()))
+        extras.execute_values(
+            cur,
+            """
+            UPDATE public.maintenance AS m
+            SET row_hash = v.row_hash
+            FROM (VALUES %s) AS v(id, row_hash)
+            WHERE m.id = v.id
+            """,
+            pairs,
+            page_size=1000,
+        )
+    return len(pairs)
 
-    existing = pd.DataFrame(existing_rows, columns=INSERT_COLS)
-    incoming_cmp = _to_compare_frame(incoming)
-    existing_cmp = _to_compare_frame(existing)
+
+def _filter_new_rows(conn, incoming: pd.DataFrame) -> pd.DataFrame:
+    if incoming.empty:
+        return incoming.assign(row_hash=pd.Series(dtype=object))
 
     # De-dup inside incoming batch first.
-    incoming_cmp["_row_idx"] = range(len(incoming_cmp))
-    incoming_cmp = incoming_cmp.drop_duplicates(subset=INSERT_COLS, keep="first")
-
-    merged = incoming_cmp.merge(
-        existing_cmp.drop_duplicates(subset=INSERT_COLS),
-        on=INSERT_COLS,
-        how="left",
-        indicator=True,
-    )
+    incoming = incoming.assign(row_hash=_row_hashes(incoming))
+    incoming = incoming.drop_duplicates(subset=["row_hash"], keep="first")
 
-    keep_idx = merged.loc[merged["_merge"] == "left_only", "_row_idx"].tolist()
-    return incoming.iloc[keep_idx].copy()
+    # Indexed lookup for just this batch's hashes instead of pulling the whole table.
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT DISTINCT row_hash FROM public.maintenance WHERE row_hash = ANY(%s)",
+            (incoming["row_hash"].tolist(),),
+        )
+        existing = {r[0] for r in cur.fetchall()}
+
+    return incoming.loc[~incoming["row_hash"].isin(existing)].copy()
 
 
 def _concat_maintenance_frames(frames: list[pd.DataFrame]) -> pd.DataFrame:
@@ -300,6 +336,8 @@ def _concat_maintenance_frames(frames: list[pd.DataFrame]) -> pd.DataFrame:
 def main():
     veh_df = _load_workbook(VEH_FILE, asset_type="vehicle")
     chg_df = _load_workbook(CHARGER_FILE, asset_type="charger")
+    record_source(VEH_FILE)
+    record_source(CHARGER_FILE)
 
     with get_conn() as conn:
         fleet_id, veh_map = get_fleet_id_and_vehicle_maps(conn)
@@ -333,8 +371,9 @@ def main():
         combined = combined[cols_needed].copy()
         combined = combined.astype(object).where(pd.notna(combined), None)
 
+        backfilled = _backfill_row_hashes(conn)
         to_insert = _filter_new_rows(conn, combined)
-        rows = [tuple(x) for x in to_insert[INSERT_COLS].to_numpy()]
+        rows = [tuple(x) for x in to_insert[INSERT_COLS + ["row_hash"]].to_numpy()]
 
         inserted = 0
         if rows:
@@ -342,7 +381,7 @@ def main():
             INSERT INTO public.maintenance (
                 date, maint_ob, maint_categ, maint_loc, enter_shop, exit_shop,
                 enter_odo, exit_odo, parts_cost, labor_cost, add_cost, warranty,
-                problem, work_perf, charger_id, veh_id, add_cost_desc
+                problem, work_perf, charger_id, veh_id, add_cost_desc, row_hash
             )
             VALUES %s
             ON CONFLICT DO NOTHING
@@ -351,13 +390,14 @@ def main():
             with conn.cursor() as cur:
                 ret = extras.execute_values(cur, sql, rows, page_size=1000, fetch=True)
                 inserted = len(ret) if ret is not None else 0
-            conn.commit()
+        conn.commit()
 
     print("=== FEL Maintenance Upload Summary ===")
     print(f"Vehicle rows read:                {len(veh_df)}")
     print(f"Charger rows read:                {len(chg_df)}")
     print(f"Dropped unmapped vehicle rows:    {dropped_unmapped_vehicle}")
     print(f"Dropped unknown charger rows:     {dropped_unknown_charger}")
+    print(f"Existing rows hashed (backfill):  {backfilled}")
     print(f"Rows after in-batch/existing dedup: {len(to_insert)}")
     print(f"Inserted new rows:                {inserted}")
 
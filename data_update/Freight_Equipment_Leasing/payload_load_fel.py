@@ -6,6 +6,7 @@ import sys, os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
 
 from data_update.common_data_update import get_conn
+from data_update.ingestion_ledger import record_source
 from data_update.paths import INCOMING_DATA_DIR
 from common import FREIGHT_VEH_IDS, get_fleet_id_and_vehicle_maps
 
@@ -80,6 +81,7 @@ def main() -> None:
             df_sheet = xl.parse(sheet_name=sheet)
             parsed = parse_payload_sheet(df_sheet, sheet)
             parsed_frames.append(parsed)
+    record_source(EXCEL_FILE)
 
     if not parsed_frames:
         print("[INFO] No vehicle payload sheets found.")
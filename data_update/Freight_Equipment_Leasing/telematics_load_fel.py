@@ -4,6 +4,8 @@ import psycopg2.extras as _extras
 import sys, os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
 from data_update.common_data_update import get_conn
+from data_update.ingestion_ledger import record_vehicle_days
+from data_update.telematics_common import ensure_partitions, overlap_report, refresh_hourly
 from common import (
     ROOT_DIR, FREIGHT_VEH_IDS, md5_file, already_ingested,
     record_ingestion, list_date_subfolders, is_weekly_folder,
@@ -11,6 +13,10 @@ from common import (
     DATEFOLDER_RE
 )
 
+TEL_COLUMNS = [
+    "veh_id", "timestamp", "elevation", "speed", "mileage", "soc", "key_on_time", "latitude", "longitude",
+]
+
 def resolve_vehicle_id(file_name: str) -> str | None:
     stem = Path(file_name).stem
     return stem if stem in FREIGHT_VEH_IDS else None
@@ -21,8 +27,10 @@ def upsert_tel(conn, veh_id_int: int, df: pd.DataFrame, veh_label: str) -> tuple
     for _, r in df.iterrows():
         ts = pd.to_datetime(r.get("timeStamp"), errors="coerce", utc=True)  # consistent datetime parsing
         if pd.isna(ts):
+            # veh_tel is partitioned on timestamp, so rows without one cannot be stored.
             warns += 1
-            
+            continue
+
         # Numeric conversions — only if needed
         speed = pd.to_numeric(r.get("speed"), errors="coerce")
         odometer = pd.to_numeric(r.get("odometer"), errors="coerce")
@@ -42,9 +50,17 @@ def upsert_tel(conn, veh_id_int: int, df: pd.DataFrame, veh_label: str) -> tuple
         ))
         
     if warns:
-        print(f"[WARN] {veh_label}: {warns} rows missing timestamp; inserted with NULL timestamp.")
+        print(f"[WARN] {veh_label}: {warns} rows missing timestamp; skipped.")
 
     with conn.cursor() as cur:
+        tel_df = pd.DataFrame(rows, columns=TEL_COLUMNS)
+        ensure_partitions(cur, tel_df)
+        overlap = overlap_report(cur, tel_df, TEL_COLUMNS[2:])
+        print(
+            f"[INFO] {veh_label}: {overlap['new_rows']} new, {overlap['overlap_existing']} overlapping "
+            f"({overlap['changed_overlap']} differ; existing rows are kept)."
+        )
+
         # Insert core columns first
         _extras.execute_values(cur, """
             INSERT INTO public.veh_tel
@@ -64,6 +80,8 @@ def upsert_tel(conn, veh_id_int: int, df: pd.DataFrame, veh_label: str) -> tuple
             WHERE veh_id = %s
               AND location IS NULL
         """, (veh_id_int,))
+        refresh_hourly(cur, tel_df)
+    record_vehicle_days(rows)
     return len(rows), warns
 
 def load_csv_file(conn, p: Path, str2int: dict) -> tuple[int, int]:
@@ -109,6 +127,8 @@ def main():
                     print(f"[SKIP] {folder.name}\\{csvf.name} already ingested.")
                     continue
                 rows, warns = load_csv_file(conn, csvf, str2int)
+                # Commit per file so the ledger never records work that could still roll back.
+                conn.commit()
                 record_ingestion(conn, csvf, file_hash, rows)
                 # move_to_archive(csvf, arc)
                 grand_rows += rows
@@ -1,7 +1,14 @@
+from pathlib import Path
+
 import pandas as pd
 
+from data_update.ingestion_ledger import IngestionLedger
+from data_update.paths import INCOMING_DATA_DIR
+
 
 FLEET_NAME = "SQ Trucking"
+FOLDER_PATH = INCOMING_DATA_DIR / FLEET_NAME
+LEDGER = IngestionLedger(Path(__file__).parent / "_ingestion_log.json", FOLDER_PATH)
 
 VIN_TO_FLEET_VEHICLE_ID = {
     "4T9BACAA8RB208684": "530043",
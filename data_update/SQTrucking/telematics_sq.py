@@ -4,12 +4,14 @@ from pathlib import Path
 
 import numpy as np
 import pandas as pd
-import psycopg2.extras as extras
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
 from data_update.common_data_update import get_conn  # noqa: E402
-from data_update.paths import INCOMING_DATA_DIR  # noqa: E402
+from data_update.ingestion_ledger import md5_file, tel_checkpoint, tel_vehicle_day, upsert_in_chunks  # noqa: E402
+from data_update.telematics_common import ensure_partitions, overlap_report, print_overlap_report, refresh_hourly  # noqa: E402
 from data_update.SQTrucking.common_sq import (  # noqa: E402
+    FOLDER_PATH,
+    LEDGER,
     VIN_TO_FLEET_VEHICLE_ID,
     ensure_sq_vehicles,
     load_sq_vehicle_map,
@@ -20,14 +22,14 @@ from data_update.SQTrucking.common_sq import (  # noqa: E402
 
 
 FILE_PATH = (
-    INCOMING_DATA_DIR
-    / "SQ Trucking"
+    FOLDER_PATH
     / "telematics"
     / "Custom Vehicle Dataset Report V2_20260303_100321.xlsx"
 )
 REPORT_SHEET = "Report"
 REPORT_HEADER_ROW = 12
 LOCAL_TIMEZONE = "America/New_York"
+TEL_COLUMNS = ["elevation", "speed", "mileage", "soc", "key_on_time", "latitude", "longitude"]
 
 
 def parse_telematics_file(path: Path) -> pd.DataFrame:
@@ -118,7 +120,7 @@ def clean_telematics(df: pd.DataFrame) -> tuple[pd.DataFrame, dict[str, int]]:
     return work, counts
 
 
-def upload_telematics(conn, df: pd.DataFrame) -> int:
+def upload_telematics(conn, df: pd.DataFrame, file_hash: str) -> tuple[int, int]:
     rows = []
     for r in df.itertuples(index=False):
         rows.append(
@@ -173,15 +175,22 @@ def upload_telematics(conn, df: pd.DataFrame) -> int:
             ELSE NULL
          END)
     """
-    with conn.cursor() as cur:
-        returned = extras.execute_values(cur, sql, rows, template=template, page_size=5000, fetch=True)
-    return len(returned) if returned is not None else 0
+    return upsert_in_chunks(
+        conn, sql, rows, LEDGER, FILE_PATH, file_hash,
+        template=template, fetch=True, checkpoint=tel_checkpoint,
+        vehicle_day=tel_vehicle_day,
+    )
 
 
 def main():
     if not FILE_PATH.exists():
         raise FileNotFoundError(FILE_PATH)
 
+    file_hash = md5_file(FILE_PATH)
+    if LEDGER.is_complete(FILE_PATH, file_hash):
+        print(f"[SKIP] {FILE_PATH.name} already ingested (set ZEV_FORCE_RELOAD=1 to reload).")
+        return
+
     parsed = parse_telematics_file(FILE_PATH)
     unmapped_vins = sorted(parsed.loc[parsed["fleet_vehicle_id"].isna(), "vin"].dropna().unique())
     if unmapped_vins:
@@ -190,6 +199,7 @@ def main():
     cleaned, counts = clean_telematics(parsed)
     if cleaned.empty:
         print(f"[INFO] No usable telematics rows found in {FILE_PATH.name}")
+        LEDGER.mark_complete(FILE_PATH, file_hash)
         return
 
     with get_conn() as conn:
@@ -201,7 +211,13 @@ def main():
         if missing_db_ids:
             raise RuntimeError(f"Fleet vehicle IDs missing from database: {missing_db_ids}")
 
-        uploaded = upload_telematics(conn, cleaned)
+        with conn.cursor() as cur:
+            ensure_partitions(cur, cleaned)
+            overlap = overlap_report(cur, cleaned, TEL_COLUMNS)
+        conn.commit()
+        uploaded, resumed = upload_telematics(conn, cleaned, file_hash)
+        with conn.cursor() as cur:
+            hourly_rows = refresh_hourly(cur, cleaned)
         conn.commit()
 
     print("=== SQ Trucking Telematics Upload Summary ===")
@@ -217,7 +233,10 @@ def main():
     print(f"Rows attempted:               {len(cleaned)}")
     print(f"Timestamp range UTC:          {cleaned['timestamp'].min()} to {cleaned['timestamp'].max()}")
     print(f"Vehicles in file:             {', '.join(sorted(cleaned['fleet_vehicle_id'].unique()))}")
+    print_overlap_report(overlap, width=30)
+    print(f"Rows skipped (checkpoint):    {resumed}")
     print(f"Rows inserted/updated:        {uploaded}")
+    print(f"Hourly rollup rows:           {hourly_rows}")
 
 
 if __name__ == "__main__":
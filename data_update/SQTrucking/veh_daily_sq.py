@@ -7,6 +7,7 @@ import psycopg2.extras as extras
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
 from data_update.common_data_update import get_conn  # noqa: E402
+from data_update.ingestion_ledger import record_source  # noqa: E402
 from data_update.paths import INCOMING_DATA_DIR  # noqa: E402
 from data_update.SQTrucking.common_sq import (  # noqa: E402
     VIN_TO_FLEET_VEHICLE_ID,
@@ -184,6 +185,7 @@ def main():
         raise FileNotFoundError(FILE_PATH)
 
     daily = parse_daily_file(FILE_PATH)
+    record_source(FILE_PATH)
     if daily.empty:
         print(f"[INFO] No usable rows found in {FILE_PATH.name}")
         return
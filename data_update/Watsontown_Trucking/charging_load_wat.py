@@ -1,21 +1,25 @@
 ﻿import pandas as pd
-import psycopg2.extras as extras
 import sys, os
 from datetime import time as dt_time
 from pathlib import Path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
 from data_update.common_data_update import engine
-from data_update.paths import INCOMING_DATA_DIR
+from data_update.ingestion_ledger import md5_file, upsert_in_chunks
+from data_update.Watsontown_Trucking.common_wat import FOLDER_PATH, LEDGER
 
 def parse_utc_to_naive(series: pd.Series) -> pd.Series:
     dt = pd.to_datetime(series, errors="coerce", utc=True)
     return dt.dt.tz_localize(None)
 
 # --- Config ---
-FOLDER_PATH = INCOMING_DATA_DIR / "Watsontown Trucking"
 FILE_PATH = Path("2025 - Qtr 4") / "Charging & Telematics" / "WATW DEP EV Grant - Wattson - Q4 2025.xlsx"
 CSV_PATH = FOLDER_PATH / FILE_PATH
 
+FILE_HASH = md5_file(CSV_PATH)
+if LEDGER.is_complete(CSV_PATH, FILE_HASH):
+    print(f"[SKIP] {CSV_PATH.name} already ingested (set ZEV_FORCE_RELOAD=1 to reload).")
+    sys.exit(0)
+
 # ---------- LOAD FILE ----------
 _ext = os.path.splitext(CSV_PATH)[1].lower()
 if _ext in (".xlsx", ".xls"):
@@ -138,13 +142,11 @@ DO UPDATE SET
 rows = [tuple(x) for x in df_db.to_numpy()]
 conn = engine.raw_connection()
 try:
-    with conn.cursor() as cur:
-        extras.execute_values(cur, insert_sql, rows, template=None, page_size=1000)
-    conn.commit()
+    _, resumed = upsert_in_chunks(conn, insert_sql, rows, LEDGER, CSV_PATH, FILE_HASH)
 finally:
     conn.close()
 
-print(f"[INFO] Upserted {len(rows)} Wattson charging sessions into refuel_inf.")
+print(f"[INFO] Upserted {len(rows) - resumed} Wattson charging sessions into refuel_inf (skipped {resumed} from checkpoint).")
 
 
 
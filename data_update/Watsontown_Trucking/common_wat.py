@@ -0,0 +1,121 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data_update.ingestion_ledger import IngestionLedger
+from data_update.paths import INCOMING_DATA_DIR
+
+FOLDER_PATH = INCOMING_DATA_DIR / "Watsontown Trucking"
+LEDGER = IngestionLedger(Path(__file__).parent / "_ingestion_log.json", FOLDER_PATH)
+
+
+def _haversine_miles(lat1, lon1, lat2, lon2):
+    r = 3958.7613  # Earth radius in miles
+    dlat = np.radians(lat2 - lat1)
+    dlon = np.radians(lon2 - lon1)
+    a = (
+        np.sin(dlat / 2.0) ** 2
+        + np.cos(np.radians(lat1)) * np.cos(np.radians(lat2)) * np.sin(dlon / 2.0) ** 2
+    )
+    return 2 * r * np.arcsin(np.sqrt(a))
+
+
+def flag_gps_outliers(df: pd.DataFrame, max_jump_miles: float) -> pd.Series:
+    """
+    Boolean mask (aligned to df.index) of GPS points that jump more than max_jump_miles from the
+    previous point, plus the points that follow them while they stay nearer the jump than the
+    last good position. Needs veh_id, timestamp, latitude and longitude.
+    """
+    gps_outlier_mask = pd.Series(False, index=df.index)
+    for _, g in df.groupby("veh_id", sort=False):
+        g2 = g.sort_values("timestamp").reset_index()  # keep original df index in column 'index'
+        n = len(g2)
+        if n < 2:
+            continue
+
+        lat = g2["latitude"].to_numpy()
+        lon = g2["longitude"].to_numpy()
+        ts = g2["timestamp"].to_numpy()
+        has_coord = (~pd.isna(lat)) & (~pd.isna(lon))
+        flags = np.zeros(n, dtype=bool)
+
+        def transition_stats(i_from: int, i_to: int):
+            if i_from < 0 or i_to <= i_from:
+                return None
+            if not has_coord[i_from] or not has_coord[i_to]:
+                return None
+            dt_sec = (pd.Timestamp(ts[i_to]) - pd.Timestamp(ts[i_from])).total_seconds()
+            if dt_sec <= 0:
+                return None
+            jump = _haversine_miles(lat[i_from], lon[i_from], lat[i_to], lon[i_to])
+            implied = jump / (dt_sec / 3600.0)
+            return dt_sec, jump, implied
+
+        def is_jump_transition(i_from: int, i_to: int):
+            stats = transition_stats(i_from, i_to)
+            if stats is None:
+                return False
+            _dt_sec, jump, _implied = stats
+            # User rule: compare consecutive points spatially, independent of time gap.
+            return jump > max_jump_miles
+
+        prev_normal = None
+        for i in range(n):
+            if not has_coord[i]:
+                continue
+            prev_normal = i
+            break
+
+        if prev_normal is None:
+            continue
+
+        i = prev_normal + 1
+        while i < n:
+            if not has_coord[i]:
+                i += 1
+                continue
+
+            # First detect if this point is a jumper based on the immediate transition.
+            if not is_jump_transition(i - 1, i):
+                prev_normal = i
+                i += 1
+                continue
+
+            # Start jumper cluster at i.
+            flags[i] = True
+            jumper_ref = i
+            anchor = prev_normal
+            k = i + 1
+            returned_to_normal = False
+
+            while k < n:
+                if not has_coord[k]:
+                    break
+
+                adj_stats = transition_stats(k - 1, k)
+                if adj_stats is None:
+                    break
+
+                # Compare current point to previous normal anchor vs jumper cluster reference.
+                d_anchor = _haversine_miles(lat[anchor], lon[anchor], lat[k], lon[k]) if anchor is not None else np.inf
+                d_jumper = _haversine_miles(lat[jumper_ref], lon[jumper_ref], lat[k], lon[k])
+
+                if d_anchor <= d_jumper:
+                    # Returned near normal track: retain this point and exit cluster.
+                    prev_normal = k
+                    returned_to_normal = True
+                    break
+
+                # Still near jumper cluster: mark as outlier and continue cluster.
+                flags[k] = True
+                jumper_ref = k
+                k += 1
+
+            # If row k is accepted as the return-to-normal point, skip re-evaluating it
+            # as a potential new jumper in the outer loop.
+            i = k + 1 if returned_to_normal else k
+
+        gps_outlier_mask.loc[g2["index"].to_numpy()] = flags
+
+    return gps_outlier_mask
@@ -1,19 +1,24 @@
 ﻿import pandas as pd
 import numpy as np
-import psycopg2.extras as extras
 import sys, os
 from pathlib import Path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
 from data_update.common_data_update import engine
-from data_update.paths import INCOMING_DATA_DIR
+from data_update.ingestion_ledger import md5_file, tel_checkpoint, tel_vehicle_day, upsert_in_chunks
+from data_update.telematics_common import ensure_partitions, overlap_report, print_overlap_report, refresh_hourly
+from data_update.Watsontown_Trucking.common_wat import FOLDER_PATH, LEDGER, flag_gps_outliers
 
 # --- Config ---
-FOLDER_PATH = INCOMING_DATA_DIR / "Watsontown Trucking"
 FILE_PATH = Path("2025 - Qtr 4") / "Charging & Telematics" / "EVJ2 Q4 2025 fuel path.csv"
 CSV_PATH = FOLDER_PATH / FILE_PATH
 GPS_MAX_CONSEC_JUMP_MILES = 5.0
 # print(CSV_PATH)
 
+FILE_HASH = md5_file(CSV_PATH)
+if LEDGER.is_complete(CSV_PATH, FILE_HASH):
+    print(f"[SKIP] {CSV_PATH.name} already ingested (set ZEV_FORCE_RELOAD=1 to reload).")
+    sys.exit(0)
+
 # ---------- LOAD CSV ----------
 df = pd.read_csv(CSV_PATH)
 # print(df)
@@ -73,108 +78,7 @@ n_dedup = before - len(df)
 # print(df.dtypes)
 
 # ---------- GPS outlier filter (null out bad coordinates) ----------
-def _haversine_miles(lat1, lon1, lat2, lon2):
-    r = 3958.7613  # Earth radius in miles
-    dlat = np.radians(lat2 - lat1)
-    dlon = np.radians(lon2 - lon1)
-    a = (
-        np.sin(dlat / 2.0) ** 2
-        + np.cos(np.radians(lat1)) * np.cos(np.radians(lat2)) * np.sin(dlon / 2.0) ** 2
-    )
-    return 2 * r * np.arcsin(np.sqrt(a))
-
-
-gps_outlier_mask = pd.Series(False, index=df.index)
-for _, g in df.groupby("veh_id", sort=False):
-    g2 = g.sort_values("timestamp").reset_index()  # keep original df index in column 'index'
-    n = len(g2)
-    if n < 2:
-        continue
-
-    lat = g2["latitude"].to_numpy()
-    lon = g2["longitude"].to_numpy()
-    ts = g2["timestamp"].to_numpy()
-    has_coord = (~pd.isna(lat)) & (~pd.isna(lon))
-    flags = np.zeros(n, dtype=bool)
-
-    def transition_stats(i_from: int, i_to: int):
-        if i_from < 0 or i_to <= i_from:
-            return None
-        if not has_coord[i_from] or not has_coord[i_to]:
-            return None
-        dt_sec = (pd.Timestamp(ts[i_to]) - pd.Timestamp(ts[i_from])).total_seconds()
-        if dt_sec <= 0:
-            return None
-        jump = _haversine_miles(lat[i_from], lon[i_from], lat[i_to], lon[i_to])
-        implied = jump / (dt_sec / 3600.0)
-        return dt_sec, jump, implied
-
-    def is_jump_transition(i_from: int, i_to: int):
-        stats = transition_stats(i_from, i_to)
-        if stats is None:
-            return False
-        _dt_sec, jump, _implied = stats
-        # User rule: compare consecutive points spatially, independent of time gap.
-        return jump > GPS_MAX_CONSEC_JUMP_MILES
-
-    prev_normal = None
-    for i in range(n):
-        if not has_coord[i]:
-            continue
-        prev_normal = i
-        break
-
-    if prev_normal is None:
-        continue
-
-    i = prev_normal + 1
-    while i < n:
-        if not has_coord[i]:
-            i += 1
-            continue
-
-        # First detect if this point is a jumper based on the immediate transition.
-        if not is_jump_transition(i - 1, i):
-            prev_normal = i
-            i += 1
-            continue
-
-        # Start jumper cluster at i.
-        flags[i] = True
-        jumper_ref = i
-        anchor = prev_normal
-        k = i + 1
-        returned_to_normal = False
-
-        while k < n:
-            if not has_coord[k]:
-                break
-
-            adj_stats = transition_stats(k - 1, k)
-            if adj_stats is None:
-                break
-
-            # Compare current point to previous normal anchor vs jumper cluster reference.
-            d_anchor = _haversine_miles(lat[anchor], lon[anchor], lat[k], lon[k]) if anchor is not None else np.inf
-            d_jumper = _haversine_miles(lat[jumper_ref], lon[jumper_ref], lat[k], lon[k])
-
-            if d_anchor <= d_jumper:
-                # Returned near normal track: retain this point and exit cluster.
-                prev_normal = k
-                returned_to_normal = True
-                break
-
-            # Still near jumper cluster: mark as outlier and continue cluster.
-            flags[k] = True
-            jumper_ref = k
-            k += 1
-
-        # If row k is accepted as the return-to-normal point, skip re-evaluating it
-        # as a potential new jumper in the outer loop.
-        i = k + 1 if returned_to_normal else k
-
-    gps_outlier_mask.loc[g2["index"].to_numpy()] = flags
-
+gps_outlier_mask = flag_gps_outliers(df, GPS_MAX_CONSEC_JUMP_MILES)
 n_gps_outlier = int(gps_outlier_mask.sum())
 if n_gps_outlier:
     df.loc[gps_outlier_mask, ["latitude", "longitude"]] = np.nan
@@ -225,50 +129,15 @@ with engine.begin() as conn:
         df.loc[g.index, "mileage"] = rebuilt.values
 
 # ---------- Pre-upsert overlap diagnostics ----------
-incoming_cmp = df[["veh_id", "timestamp", "speed", "mileage", "latitude", "longitude"]].copy()
-overlap_existing = new_rows = changed_overlap = unchanged_overlap = 0
-
-if not incoming_cmp.empty:
-    veh_ids = [int(x) for x in sorted(incoming_cmp["veh_id"].dropna().astype(int).unique())]
-    min_ts = incoming_cmp["timestamp"].min().to_pydatetime()
-    max_ts = incoming_cmp["timestamp"].max().to_pydatetime()
-
-    with engine.connect() as conn:
-        existing_cmp = pd.read_sql(
-            """
-            SELECT veh_id, "timestamp", speed, mileage, latitude, longitude
-            FROM veh_tel
-            WHERE veh_id = ANY(%s)
-              AND "timestamp" BETWEEN %s AND %s
-            """,
-            conn,
-            params=(veh_ids, min_ts, max_ts),
-        )
-
-    merged = incoming_cmp.merge(
-        existing_cmp,
-        on=["veh_id", "timestamp"],
-        how="left",
-        suffixes=("_new", "_old"),
-        indicator=True,
-    )
-    overlap_mask = merged["_merge"].eq("both")
-    new_mask = merged["_merge"].eq("left_only")
-
-    def _eq(a, b, nd):
-        return (a.round(nd) == b.round(nd)) | (a.isna() & b.isna())
-
-    same_mask = (
-        _eq(merged["speed_new"], merged["speed_old"], 6)
-        & _eq(merged["mileage_new"], merged["mileage_old"], 6)
-        & _eq(merged["latitude_new"], merged["latitude_old"], 8)
-        & _eq(merged["longitude_new"], merged["longitude_old"], 8)
-    )
-
-    overlap_existing = int(overlap_mask.sum())
-    new_rows = int(new_mask.sum())
-    unchanged_overlap = int((overlap_mask & same_mask).sum())
-    changed_overlap = int((overlap_mask & ~same_mask).sum())
+# Computed server-side against a COPY-loaded staging table; only the counts come back.
+conn = engine.raw_connection()
+try:
+    with conn.cursor() as cur:
+        ensure_partitions(cur, df)
+        overlap = overlap_report(cur, df, ["speed", "mileage", "latitude", "longitude"])
+    conn.commit()
+finally:
+    conn.close()
 
 # ---------- Insert (ON CONFLICT UPDATE) ----------
 def _py(v):
@@ -285,7 +154,7 @@ for vid, ts, sp, mi, la, lo in df[["veh_id","timestamp","speed","mileage","latit
         _py(lo), _py(la), _py(lo), _py(la)      # for conditional ST_MakePoint(lon, lat)
     ))
     
-upserted = 0
+upserted = resumed = hourly_rows = 0
 if records:
     sql = """
     INSERT INTO veh_tel (veh_id, "timestamp", speed, mileage, latitude, longitude, location)
@@ -306,14 +175,21 @@ if records:
     """
     template = "(%s,%s,%s,%s,%s,%s, CASE WHEN %s IS NOT NULL AND %s IS NOT NULL THEN ST_SetSRID(ST_MakePoint(%s,%s),4326)::geography ELSE NULL END)"
 
+    # Commit in bounded chunks; a rerun after a failure resumes from the ledger checkpoint.
     conn = engine.raw_connection()
     try:
+        upserted, resumed = upsert_in_chunks(
+            conn, sql, records, LEDGER, CSV_PATH, FILE_HASH,
+            template=template, fetch=True, checkpoint=tel_checkpoint,
+            vehicle_day=tel_vehicle_day,
+        )
         with conn.cursor() as cur:
-            ret = extras.execute_values(cur, sql, records, template=template, page_size=5000, fetch=True)
-            upserted = len(ret) if ret is not None else 0
+            hourly_rows = refresh_hourly(cur, df)
         conn.commit()
     finally:
         conn.close()
+else:
+    LEDGER.mark_complete(CSV_PATH, FILE_HASH)
 
 # ---------- Report ----------
 attempted = len(df)
@@ -327,12 +203,11 @@ print(f"Dropped: no vehicle match   {n_drop_veh}")
 print(f"Removed duplicates in CSV:  {n_dedup}")
 print(f"GPS outlier coords nulled:  {n_gps_outlier}")
 print(f"Rows attempted to insert:   {attempted}")
-print(f"Overlap with existing:      {overlap_existing}")
-print(f"New rows (no overlap):      {new_rows}")
-print(f"Changed overlap rows:       {changed_overlap}")
-print(f"Unchanged overlap rows:     {unchanged_overlap}")
+print_overlap_report(overlap)
+print(f"Rows skipped (checkpoint):  {resumed}")
 print(f"Rows inserted/updated:      {upserted}")
-print(f"Rows unchanged in DB:       {unchanged_existing}")
+print(f"Hourly rollup rows:         {hourly_rows}")
+print(f"Rows unchanged in DB:       {unchanged_existing - resumed}")
 print(f"Total dropped/removed:      {total_dropped}")
 
 
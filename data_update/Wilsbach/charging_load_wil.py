@@ -1,9 +1,9 @@
 ﻿import pandas as pd
-import psycopg2.extras as extras
 import sys, os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
 from data_update.common_data_update import engine
-from data_update.paths import INCOMING_DATA_DIR
+from data_update.ingestion_ledger import md5_file, upsert_in_chunks
+from data_update.Wilsbach.common_wil import FOLDER_PATH as FLEET_DIR, LEDGER
 
 LOCAL_TZ = "America/New_York"
 
@@ -13,9 +13,13 @@ def to_utc_naive(series: pd.Series) -> pd.Series:
     return dt.dt.tz_convert("UTC").dt.tz_localize(None)
 
 # 1) Load Excel
-FOLDER_PATH = INCOMING_DATA_DIR / "Wilsbach Distributors" / "Charging event"
+FOLDER_PATH = FLEET_DIR / "Charging event"
 FILE_PATH = "Wilsbach EV Data Collection - Charging Event Data - 03-2026.xlsx"
 XLSX_PATH = FOLDER_PATH / FILE_PATH
+FILE_HASH = md5_file(XLSX_PATH)
+if LEDGER.is_complete(XLSX_PATH, FILE_HASH):
+    print(f"[SKIP] {XLSX_PATH.name} already ingested (set ZEV_FORCE_RELOAD=1 to reload).")
+    sys.exit(0)
 df = pd.read_excel(XLSX_PATH)
 
 # 2) Basic normalization
@@ -137,12 +141,10 @@ df_db = df_db.map(lambda x: None if pd.isna(x) else x)
 rows = [tuple(x) for x in df_db.to_numpy()]
 conn = engine.raw_connection()
 try:
-    with conn.cursor() as cur:
-        extras.execute_values(cur, insert_sql, rows, template=None, page_size=1000)
-    conn.commit()
+    _, resumed = upsert_in_chunks(conn, insert_sql, rows, LEDGER, XLSX_PATH, FILE_HASH)
 finally:
     conn.close()
 
-print(f"[INFO] Upserted {len(rows)} Wilsbach charging events.")
+print(f"[INFO] Upserted {len(rows) - resumed} Wilsbach charging events (skipped {resumed} from checkpoint).")
 
 
@@ -0,0 +1,86 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data_update.ingestion_ledger import IngestionLedger
+from data_update.paths import INCOMING_DATA_DIR
+
+FOLDER_PATH = INCOMING_DATA_DIR / "Wilsbach Distributors"
+LEDGER = IngestionLedger(Path(__file__).parent / "_ingestion_log.json", FOLDER_PATH)
+
+DOUBLE_EPSILON = 0.05  # 5% tolerance for doubled-value artifact checks
+
+
+def _approx(a, b, eps=DOUBLE_EPSILON):
+    if pd.isna(a) or pd.isna(b):
+        return False
+    scale = max(abs(float(b)), 1e-9)
+    return abs(float(a) - float(b)) <= eps * scale
+
+
+def correct_or_drop_double_artifacts(df):
+    """
+    Correction-first rule:
+    - If mileage shows doubled artifact (curr ~= 2*prev), correct by dividing by 2.
+    - If SOC shows doubled artifact (curr_soc ~= 2*prev_soc), correct by dividing by 2.
+    - If corrected values are still invalid, drop the row.
+
+    Note: monthly odometer discontinuities and reported elevation are kept as-is.
+    """
+    df = df.sort_values(["veh_id", "timestamp"]).reset_index(drop=True).copy()
+    df["mileage"] = pd.to_numeric(df["mileage"], errors="coerce")
+    df["soc"] = pd.to_numeric(df["soc"], errors="coerce")
+    veh = df["veh_id"].to_numpy()
+    mileage = df["mileage"].to_numpy(float)
+    soc = df["soc"].to_numpy(float)
+
+    keep = np.ones(len(df), dtype=bool)
+    last_mileage = {}  # veh_id -> previous kept mileage
+    last_soc = {}      # veh_id -> previous kept soc
+    mileage_corrected = 0
+    soc_corrected = 0
+
+    for i in range(len(df)):
+        v = veh[i]
+        cur_mileage = mileage[i]
+        cur_soc = soc[i]
+
+        if np.isnan(cur_mileage):
+            keep[i] = False
+            continue
+
+        prev_mileage = last_mileage.get(v, np.nan)
+        prev_soc = last_soc.get(v, np.nan)
+
+        if not np.isnan(prev_mileage):
+            mileage_double = _approx(cur_mileage - prev_mileage, prev_mileage)
+            if mileage_double:
+                cur_mileage = cur_mileage / 2.0
+                mileage_corrected += 1
+
+        if (not np.isnan(prev_soc)) and (not np.isnan(cur_soc)):
+            soc_double = _approx(cur_soc, 2.0 * prev_soc)
+            if soc_double:
+                cur_soc = cur_soc / 2.0
+                soc_corrected += 1
+
+        # If correction still yields invalid values, drop.
+        if cur_mileage < 0:
+            keep[i] = False
+            continue
+        if (not np.isnan(prev_mileage)) and (cur_mileage < prev_mileage * (1.0 - DOUBLE_EPSILON)):
+            keep[i] = False
+            continue
+        if (not np.isnan(cur_soc)) and (cur_soc < 0 or cur_soc > 1):
+                keep[i] = False
+                continue
+
+        df.at[i, "mileage"] = cur_mileage
+        df.at[i, "soc"] = cur_soc
+        last_mileage[v] = cur_mileage
+        last_soc[v] = cur_soc
+
+    dropped = int((~keep).sum())
+    print(f"[Double-artifact correction] Mileage corrected: {mileage_corrected}, SOC corrected: {soc_corrected}, Dropped: {dropped}")
+    return df.loc[keep].reset_index(drop=True), dropped, mileage_corrected, soc_corrected
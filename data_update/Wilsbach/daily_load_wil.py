@@ -7,6 +7,7 @@ import psycopg2.extras as extras
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
 from data_update.common_data_update import get_conn  # noqa: E402
+from data_update.ingestion_ledger import record_source  # noqa: E402
 from data_update.paths import INCOMING_DATA_DIR  # noqa: E402
 
 
@@ -145,6 +146,7 @@ def main():
 
         path = file_path
         daily = parse_daily_file(path)
+        record_source(path)
         if daily.empty:
             print(f"[INFO] {path.name}: no usable rows")
             return
@@ -5,6 +5,7 @@ import psycopg2.extras as extras
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
 from data_update.utils import to_boolean
 from data_update.common_data_update import engine   # SQLAlchemy engine
+from data_update.ingestion_ledger import record_source
 from data_update.paths import INCOMING_DATA_DIR
 
 # ==================== Config ====================
@@ -14,6 +15,7 @@ XLSX_PATH = FOLDER_PATH / FILE_PATH
 
 # ==================== Load ====================
 df = pd.read_excel(XLSX_PATH)
+record_source(XLSX_PATH)
 # print(df)
 
 # Basic conversions
@@ -1,20 +1,23 @@
 ﻿import os, sys
 import pandas as pd
 import numpy as np
-import psycopg2.extras as extras
 from pytz.exceptions import AmbiguousTimeError
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
 from data_update.common_data_update import engine   # SQLAlchemy engine
-from data_update.paths import INCOMING_DATA_DIR
+from data_update.ingestion_ledger import md5_file, tel_checkpoint, tel_vehicle_day, upsert_in_chunks
+from data_update.telematics_common import ensure_partitions, overlap_report, print_overlap_report, refresh_hourly
+from data_update.Wilsbach.common_wil import FOLDER_PATH as FLEET_DIR, LEDGER, correct_or_drop_double_artifacts
 
 # ==================== Config ====================
-FOLDER_PATH = INCOMING_DATA_DIR / "Wilsbach Distributors" / "Telematics"
+FOLDER_PATH = FLEET_DIR / "Telematics"
 FILE_PATH = "Wilsbach EV Data Collection - Telematics Data - 03-2026.xlsx"
 XLSX_PATH = FOLDER_PATH / FILE_PATH
 
-DOUBLE_EPSILON = 0.05  # 5% tolerance for doubled-value artifact checks
-
+FILE_HASH = md5_file(XLSX_PATH)
+if LEDGER.is_complete(XLSX_PATH, FILE_HASH):
+    print(f"[SKIP] {XLSX_PATH.name} already ingested (set ZEV_FORCE_RELOAD=1 to reload).")
+    sys.exit(0)
 
 def normalize_soc(x):
     if pd.isna(x):
@@ -27,13 +30,6 @@ def normalize_soc(x):
     return round(v, 4)
 
 
-def _approx(a, b, eps=DOUBLE_EPSILON):
-    if pd.isna(a) or pd.isna(b):
-        return False
-    scale = max(abs(float(b)), 1e-9)
-    return abs(float(a) - float(b)) <= eps * scale
-
-
 # ==================== Load ====================
 df = pd.read_excel(XLSX_PATH)
 
@@ -75,73 +71,6 @@ df["veh_id"] = df["Vehicle ID"].astype(str).map(veh_map).astype("Int64")
 df = df[["veh_id", "timestamp", "elevation", "speed", "mileage", "soc", "key_on_time", "latitude", "longitude"]]
 
 
-def correct_or_drop_double_artifacts(df):
-    """
-    Correction-first rule:
-    - If mileage shows doubled artifact (curr ~= 2*prev), correct by dividing by 2.
-    - If SOC shows doubled artifact (curr_soc ~= 2*prev_soc), correct by dividing by 2.
-    - If corrected values are still invalid, drop the row.
-
-    Note: monthly odometer discontinuities and reported elevation are kept as-is.
-    """
-    df = df.sort_values(["veh_id", "timestamp"]).reset_index(drop=True).copy()
-    df["mileage"] = pd.to_numeric(df["mileage"], errors="coerce")
-    df["soc"] = pd.to_numeric(df["soc"], errors="coerce")
-    veh = df["veh_id"].to_numpy()
-    mileage = df["mileage"].to_numpy(float)
-    soc = df["soc"].to_numpy(float)
-
-    keep = np.ones(len(df), dtype=bool)
-    last_mileage = {}  # veh_id -> previous kept mileage
-    last_soc = {}      # veh_id -> previous kept soc
-    mileage_corrected = 0
-    soc_corrected = 0
-
-    for i in range(len(df)):
-        v = veh[i]
-        cur_mileage = mileage[i]
-        cur_soc = soc[i]
-
-        if np.isnan(cur_mileage):
-            keep[i] = False
-            continue
-
-        prev_mileage = last_mileage.get(v, np.nan)
-        prev_soc = last_soc.get(v, np.nan)
-
-        if not np.isnan(prev_mileage):
-            mileage_double = _approx(cur_mileage - prev_mileage, prev_mileage)
-            if mileage_double:
-                cur_mileage = cur_mileage / 2.0
-                mileage_corrected += 1
-
-        if (not np.isnan(prev_soc)) and (not np.isnan(cur_soc)):
-            soc_double = _approx(cur_soc, 2.0 * prev_soc)
-            if soc_double:
-                cur_soc = cur_soc / 2.0
-                soc_corrected += 1
-
-        # If correction still yields invalid values, drop.
-        if cur_mileage < 0:
-            keep[i] = False
-            continue
-        if (not np.isnan(prev_mileage)) and (cur_mileage < prev_mileage * (1.0 - DOUBLE_EPSILON)):
-            keep[i] = False
-            continue
-        if (not np.isnan(cur_soc)) and (cur_soc < 0 or cur_soc > 1):
-                keep[i] = False
-                continue
-
-        df.at[i, "mileage"] = cur_mileage
-        df.at[i, "soc"] = cur_soc
-        last_mileage[v] = cur_mileage
-        last_soc[v] = cur_soc
-
-    dropped = int((~keep).sum())
-    print(f"[Double-artifact correction] Mileage corrected: {mileage_corrected}, SOC corrected: {soc_corrected}, Dropped: {dropped}")
-    return df.loc[keep].reset_index(drop=True), dropped, mileage_corrected, soc_corrected
-
-
 # Apply correction-first artifact handling before basic validity filters
 df, dropped, mileage_corrected, soc_corrected = correct_or_drop_double_artifacts(df)
 
@@ -192,8 +121,20 @@ for vid, ts, elev, sp, mil, soc, key, la, lo in df.itertuples(index=False, name=
         _py(lo), _py(la)  # used only inside ST_MakePoint(lon, lat)
     ))
 
+# ==================== Overlap diagnostics ====================
+conn = engine.raw_connection()
+try:
+    with conn.cursor() as cur:
+        ensure_partitions(cur, df)
+        overlap = overlap_report(
+            cur, df, ["elevation", "speed", "mileage", "soc", "key_on_time", "latitude", "longitude"]
+        )
+    conn.commit()
+finally:
+    conn.close()
+
 # ==================== Insert ====================
-inserted = 0
+inserted = resumed = hourly_rows = 0
 if records:
     sql = """
     INSERT INTO veh_tel
@@ -204,18 +145,25 @@ if records:
     """
     template = "(%s,%s,%s,%s,%s,%s,%s,%s,%s, ST_SetSRID(ST_MakePoint(%s,%s),4326)::geography)"
 
+    # Commit in bounded chunks; a rerun after a failure resumes from the ledger checkpoint.
     conn = engine.raw_connection()
     try:
+        inserted, resumed = upsert_in_chunks(
+            conn, sql, records, LEDGER, XLSX_PATH, FILE_HASH,
+            template=template, fetch=True, checkpoint=tel_checkpoint,
+            vehicle_day=tel_vehicle_day,
+        )
         with conn.cursor() as cur:
-            ret = extras.execute_values(cur, sql, records, template=template, page_size=5000, fetch=True)
-            inserted = len(ret)
+            hourly_rows = refresh_hourly(cur, df)
         conn.commit()
     finally:
         conn.close()
+else:
+    LEDGER.mark_complete(XLSX_PATH, FILE_HASH)
 
 # ==================== Report ====================
 attempted = len(df)
-skipped_existing = attempted - inserted
+skipped_existing = attempted - resumed - inserted
 total_dropped = sum(drop_reasons.values()) + dropped
 
 print("=== Telemetry Upload Summary ===")
@@ -226,7 +174,10 @@ print(f"Corrected mileage doubles:    {mileage_corrected}")
 print(f"Corrected SOC doubles:        {soc_corrected}")
 print(f"Total dropped/removed:        {total_dropped}")
 print(f"Rows attempted to insert:     {attempted}")
+print_overlap_report(overlap, width=30)
+print(f"Skipped (checkpoint):         {resumed}")
 print(f"Inserted (new):               {inserted}")
+print(f"Hourly rollup rows:           {hourly_rows}")
 print(f"Skipped (already existed):    {skipped_existing}")
 
 
@@ -0,0 +1,210 @@
+"""
+Move telematics older than the retention window from veh_tel into the downsampled cold tier.
+
+For every month before the cutoff:
+    1. pick a shape-preserving subset of each vehicle's points
+       (first/last point of each day, stop/start transitions, turn points,
+       one sample per fixed interval)
+    2. copy that subset into veh_tel_archive (sql/setup_veh_tel_archive.sql)
+    3. optionally write the month's full-resolution rows to a compressed Parquet file
+    4. drop the month's veh_tel partition (or delete its rows if veh_tel is not partitioned)
+
+Dashboard queries read public.veh_tel_all, which spans both tiers.
+
+Usage:
+    python data_update/archive_veh_tel.py --dry-run
+    python data_update/archive_veh_tel.py --keep-months 6 --parquet-dir "D:/zev_archive"
+"""
+
+import argparse
+import datetime as dt
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from data_update.common_data_update import get_conn  # noqa: E402
+from data_update.telematics_common import copy_to_staging  # noqa: E402
+
+KEEP_MONTHS = int(os.getenv("ZEV_TEL_KEEP_MONTHS", "6"))
+SAMPLE_SECONDS = 300          # one point per vehicle per 5 minutes
+TURN_DEGREES = 30.0           # heading change that marks a turn point
+KEEP_TABLE = "tmp_veh_tel_keep"
+
+TEL_COLS = ["veh_id", "timestamp", "elevation", "speed", "mileage", "soc", "key_on_time", "latitude", "longitude"]
+
+
+def log(msg: str) -> None:
+    now = dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    print(f"[{now}] {msg}", flush=True)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keep-months", type=int, default=KEEP_MONTHS,
+                        help="Full-resolution months to keep in veh_tel (default: ZEV_TEL_KEEP_MONTHS or 6).")
+    parser.add_argument("--sample-seconds", type=int, default=SAMPLE_SECONDS,
+                        help="Fixed sampling interval for archived points.")
+    parser.add_argument("--turn-degrees", type=float, default=TURN_DEGREES,
+                        help="Heading change (degrees) kept as a turn point.")
+    parser.add_argument("--parquet-dir", type=Path, default=None,
+                        help="Also write each month's raw rows to <dir>/veh_tel_YYYY_MM.parquet (needs pyarrow).")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Report how many points each month would keep, without changing anything.")
+    return parser.parse_args()
+
+
+def month_start(day: dt.date) -> dt.date:
+    return day.replace(day=1)
+
+
+def add_months(day: dt.date, n: int) -> dt.date:
+    y, m = divmod(day.year * 12 + day.month - 1 + n, 12)
+    return dt.date(y, m + 1, 1)
+
+
+def utc(day: dt.date) -> dt.datetime:
+    return dt.datetime.combine(day, dt.time(), tzinfo=dt.timezone.utc)
+
+
+def _bearing(lat1, lon1, lat2, lon2) -> np.ndarray:
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    x = np.sin(lon2 - lon1) * np.cos(lat2)
+    y = np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(lon2 - lon1)
+    return np.degrees(np.arctan2(x, y))
+
+
+def downsample(df: pd.DataFrame, sample_seconds: int, turn_degrees: float) -> pd.Series:
+    """
+    Boolean mask of the points to keep. df must be sorted by (veh_id, timestamp) with a
+    tz-aware timestamp column.
+    """
+    if df.empty:
+        return pd.Series(False, index=df.index)
+    veh = df["veh_id"]
+    ts = df["timestamp"]
+    same_veh = veh.eq(veh.shift())
+
+    # First / last point of every vehicle-day
+    vehicle_day = pd.DataFrame({"v": veh, "d": ts.dt.floor("D")})
+    keep = ~vehicle_day.duplicated(keep="first") | ~vehicle_day.duplicated(keep="last")
+
+    # Stop / start transitions: keep both sides of each change
+    moving = df["speed"].fillna(0).gt(0)
+    changed = moving.ne(moving.shift()) & same_veh
+    keep |= changed | changed.shift(-1, fill_value=False)
+
+    # Fixed-interval samples
+    bucket = ts.dt.floor(f"{int(sample_seconds)}s")
+    keep |= ~pd.DataFrame({"v": veh, "b": bucket}).duplicated(keep="first")
+
+    # Turn points: heading change between consecutive segments above the threshold
+    lat, lon = df["latitude"].to_numpy(float), df["longitude"].to_numpy(float)
+    heading = pd.Series(np.nan, index=df.index)
+    heading.iloc[1:] = _bearing(lat[:-1], lon[:-1], lat[1:], lon[1:])
+    heading[~same_veh] = np.nan
+    # Bearing is undefined for a stationary pair; carry the last real heading forward.
+    still = np.r_[False, (lat[1:] == lat[:-1]) & (lon[1:] == lon[:-1])]
+    heading[still] = np.nan
+    heading = heading.groupby(veh).ffill()
+    delta = (heading - heading.groupby(veh).shift()).abs()
+    delta = np.minimum(delta, 360 - delta)
+    turn = delta.gt(turn_degrees)
+    keep |= turn | turn.shift(-1, fill_value=False)
+
+    return keep
+
+
+def write_parquet(raw: pd.DataFrame, parquet_dir: Path, month: dt.date) -> Path:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError as exc:
+        raise RuntimeError("--parquet-dir needs pyarrow (pip install pyarrow).") from exc
+    parquet_dir.mkdir(parents=True, exist_ok=True)
+    path = parquet_dir / f"veh_tel_{month:%Y_%m}.parquet"
+    raw.to_parquet(path, index=False, compression="zstd")
+    return path
+
+
+def archive_month(conn, month: dt.date, args) -> tuple[int, int]:
+    """Archive one month; returns (raw points, points kept)."""
+    start, end = utc(month), utc(add_months(month, 1))
+    with conn.cursor() as cur:
+        cur.execute(
+            f"""
+            SELECT {", ".join(f'"{c}"' for c in TEL_COLS)}
+            FROM veh_tel
+            WHERE "timestamp" >= %s AND "timestamp" < %s
+            ORDER BY veh_id, "timestamp"
+            """,
+            (start, end),
+        )
+        raw = pd.DataFrame(cur.fetchall(), columns=TEL_COLS)
+    if raw.empty:
+        return 0, 0
+    raw["timestamp"] = pd.to_datetime(raw["timestamp"], utc=True)
+    for col in TEL_COLS[2:]:
+        raw[col] = pd.to_numeric(raw[col], errors="coerce")
+    keep = downsample(raw, args.sample_seconds, args.turn_degrees)
+    if args.dry_run:
+        return len(raw), int(keep.sum())
+
+    with conn.cursor() as cur:
+        copy_to_staging(cur, raw.loc[keep, ["veh_id", "timestamp"]], ["veh_id", "timestamp"], table=KEEP_TABLE)
+        cur.execute(f"""
+            INSERT INTO veh_tel_archive
+                (veh_id, "timestamp", elevation, speed, mileage, soc, key_on_time, latitude, longitude, location)
+            SELECT t.veh_id, t."timestamp", t.elevation, t.speed, t.mileage, t.soc, t.key_on_time,
+                   t.latitude, t.longitude, t.location
+            FROM veh_tel t
+            JOIN {KEEP_TABLE} k ON k.veh_id = t.veh_id AND k."timestamp" = t."timestamp"
+            WHERE t."timestamp" >= %s AND t."timestamp" < %s
+            ON CONFLICT (veh_id, "timestamp") DO NOTHING
+        """, (start, end))
+
+        if args.parquet_dir is not None:
+            path = write_parquet(raw, args.parquet_dir, month)
+            log(f"  wrote {path}")
+
+        partition = f"veh_tel_{month:%Y_%m}"
+        cur.execute("SELECT to_regclass(%s) IS NOT NULL", (f"public.{partition}",))
+        if cur.fetchone()[0]:
+            cur.execute(f"DROP TABLE public.{partition}")
+        else:
+            cur.execute('DELETE FROM veh_tel WHERE "timestamp" >= %s AND "timestamp" < %s', (start, end))
+    conn.commit()
+    return len(raw), int(keep.sum())
+
+
+def main():
+    args = parse_args()
+    cutoff = add_months(month_start(dt.date.today()), -args.keep_months)
+    log(f"Archiving veh_tel before {cutoff} | sample={args.sample_seconds}s | turn>{args.turn_degrees} deg"
+        f"{' | DRY RUN' if args.dry_run else ''}")
+
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute('SELECT min("timestamp") FROM veh_tel WHERE "timestamp" < %s', (utc(cutoff),))
+            oldest = cur.fetchone()[0]
+        if oldest is None:
+            log("Nothing older than the retention window.")
+            return
+
+        month = month_start(oldest.astimezone(dt.timezone.utc).date())
+        total_raw = total_kept = 0
+        while month < cutoff:
+            n_raw, n_kept = archive_month(conn, month, args)
+            if n_raw:
+                log(f"{month:%Y-%m}: {n_raw} points -> {n_kept} kept ({n_kept / n_raw:.1%})")
+            total_raw += n_raw
+            total_kept += n_kept
+            month = add_months(month, 1)
+
+    log(f"Done. {total_raw} raw points -> {total_kept} archived.")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,7 +9,7 @@ Defaults:
 import argparse
 import datetime as dt
 import sys
-from typing import List, Tuple, Dict, Any
+from typing import List, Optional, Tuple, Dict, Any
 
 import os
 # Allow running the script directly without installing the package
@@ -17,6 +17,9 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from psycopg2.extras import execute_batch
 from data_update.common_data_update import get_conn
 
+DEFAULT_FLEET_IDS = [2]
+DEFAULT_IDLE_THRESHOLD_MINUTES = 15.0
+
 
 def log(msg: str) -> None:
     now = dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -29,23 +32,59 @@ def parse_args() -> argparse.Namespace:
         "--fleet-ids",
         type=int,
         nargs="+",
-        default=[2],
+        default=DEFAULT_FLEET_IDS,
         help="Fleet IDs to process (default: 2).",
     )
     parser.add_argument(
         "--idle-threshold-minutes",
         type=float,
-        default=15.0,
+        default=DEFAULT_IDLE_THRESHOLD_MINUTES,
         help=(
             "Idle-time threshold (minutes) between moving periods used to "
             "split trips. Stops shorter than this stay in the same trip."
         ),
     )
+    parser.add_argument(
+        "--start-date",
+        type=dt.date.fromisoformat,
+        default=None,
+        help="Only rebuild days on or after this date (YYYY-MM-DD). Default: all history.",
+    )
+    parser.add_argument(
+        "--end-date",
+        type=dt.date.fromisoformat,
+        default=None,
+        help="Only rebuild days on or before this date (YYYY-MM-DD). Default: all history.",
+    )
     return parser.parse_args()
 
 
-def fetch_telematics(cur, fleet_ids: List[int]):
-    sql = """
+def _utc_midnight(day: dt.date) -> dt.datetime:
+    # Timezone-aware bound -> timestamptz literal, so the planner can prune veh_tel partitions.
+    return dt.datetime.combine(day, dt.time(), tzinfo=dt.timezone.utc)
+
+
+def fetch_telematics(
+    cur,
+    fleet_ids: List[int],
+    start: Optional[dt.date] = None,
+    end: Optional[dt.date] = None,
+    veh_ids: Optional[List[int]] = None,
+):
+    """Telematics for the fleets, optionally limited to vehicles and a [start, end) UTC date range."""
+    conditions = ["v.fleet_id = ANY(%s)"]
+    params: List[Any] = [fleet_ids]
+    if veh_ids is not None:
+        conditions.append("vt.veh_id = ANY(%s)")
+        params.append(veh_ids)
+    if start is not None:
+        conditions.append('vt."timestamp" >= %s')
+        params.append(_utc_midnight(start))
+    if end is not None:
+        conditions.append('vt."timestamp" < %s')
+        params.append(_utc_midnight(end))
+
+    sql = f"""
         SELECT
             v.id AS vehicle_pk,
             v.fleet_vehicle_id,
@@ -56,10 +95,10 @@ def fetch_telematics(cur, fleet_ids: List[int]):
             vt.speed
         FROM veh_tel vt
         JOIN vehicle v ON vt.veh_id = v.id
-        WHERE v.fleet_id = ANY(%s)
+        WHERE {" AND ".join(conditions)}
         ORDER BY v.id, vt."timestamp";
     """
-    cur.execute(sql, (fleet_ids,))
+    cur.execute(sql, params)
     return cur.fetchall()
 
 
@@ -231,6 +270,40 @@ def insert_daily(cur, daily_records: List[Dict[str, Any]]):
     log(f"Upserted {len(daily_records)} veh_daily rows.")
 
 
+def recompute_vehicle_days(
+    conn,
+    vehicle_days,
+    fleet_ids: List[int] = DEFAULT_FLEET_IDS,
+    idle_threshold_minutes: float = DEFAULT_IDLE_THRESHOLD_MINUTES,
+) -> int:
+    """
+    Rebuild veh_daily only for the given (veh_id, date) pairs, e.g. the days an ETL run touched.
+
+    Dates are widened by one day on each side because loaders record UTC dates while
+    aggregate_daily() buckets by the session's local date; telematics are fetched with one more
+    day of margin so no upserted day is built from a partial window. Vehicles outside fleet_ids
+    are ignored.
+    Returns the number of veh_daily rows upserted; the caller commits.
+    """
+    wanted = set()
+    for veh_id, day in vehicle_days:
+        for offset in (-1, 0, 1):
+            wanted.add((int(veh_id), day + dt.timedelta(days=offset)))
+    if not wanted:
+        return 0
+
+    veh_ids = sorted({v for v, _ in wanted})
+    start = min(d for _, d in wanted) - dt.timedelta(days=1)
+    end = max(d for _, d in wanted) + dt.timedelta(days=2)
+
+    with conn.cursor() as cur:
+        rows = fetch_telematics(cur, fleet_ids, start=start, end=end, veh_ids=veh_ids)
+        aggregates = aggregate_daily(rows, idle_threshold_minutes)
+        records = build_daily_records({k: v for k, v in aggregates.items() if k in wanted})
+        insert_daily(cur, records)
+    return len(records)
+
+
 def main():
     args = parse_args()
 
@@ -238,7 +311,10 @@ def main():
 
     with get_conn() as conn:
         with conn.cursor() as cur:
-            rows = fetch_telematics(cur, args.fleet_ids)
+            # One day of margin so local-date buckets at the edges are complete; trimmed below.
+            start = args.start_date - dt.timedelta(days=1) if args.start_date else None
+            end = args.end_date + dt.timedelta(days=2) if args.end_date else None
+            rows = fetch_telematics(cur, args.fleet_ids, start=start, end=end)
             if not rows:
                 log("No telematics found for given fleets. Exit.")
                 return
@@ -246,6 +322,11 @@ def main():
             log(f"Fetched {len(rows)} telematics records.")
 
             aggregates = aggregate_daily(rows, args.idle_threshold_minutes)
+            aggregates = {
+                (veh, day): agg for (veh, day), agg in aggregates.items()
+                if (args.start_date is None or day >= args.start_date)
+                and (args.end_date is None or day <= args.end_date)
+            }
             log(f"Aggregated into {len(aggregates)} vehicle-day entries.")
 
             dates = [d for (_, d) in aggregates.keys()]
@@ -0,0 +1,296 @@
+"""
+Export the dashboard's core tables to a local Parquet snapshot (read by local_store.py).
+
+Layout under ZEV_SNAPSHOT_DIR (or --out):
+    fleet.parquet, vehicle.parquet, charger.parquet
+    veh_tel/fleet_id=<id>/month=<YYYY-MM>/part-<n>.parquet      (and veh_daily, refuel_inf, maintenance)
+    _snapshot.json                                               (per-table etl_data_version and columns)
+
+Fact tables are written with the dimension columns the pages join for (fleet_name,
+fleet_vehicle_id, charger, charger_type) so the snapshot can be queried without joins;
+local_store.py still exposes each table under its own name with its original columns.
+Geography columns are skipped (latitude / longitude are exported).
+
+run_etl.py calls export_snapshot() after each run when ZEV_SNAPSHOT_DIR is set; veh_tel is
+only rewritten for the months that run touched.
+
+Usage:
+    python data_update/export_snapshot.py --out "D:/zev_snapshot"
+    python data_update/export_snapshot.py --table veh_tel --month 2025-03
+"""
+
+import argparse
+import datetime as dt
+import json
+import os
+import shutil
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from data_update.common_data_update import get_conn  # noqa: E402
+
+SNAPSHOT_DIR = os.getenv("ZEV_SNAPSHOT_DIR")
+MANIFEST_NAME = "_snapshot.json"
+FETCH_ROWS = 200_000   # rows per server-side fetch / Parquet part
+
+
+@dataclass(frozen=True)
+class Fact:
+    table: str
+    alias: str
+    joins: str             # dimension joins
+    extra: tuple           # (expression, column name) added from the dimensions
+    fleet_expr: str        # partition key: fleet id
+    month_expr: str        # partition key: UTC month of this time expression
+
+
+DIMENSIONS = ("fleet", "vehicle", "charger")
+
+FACTS = {
+    "veh_tel": Fact(
+        "veh_tel", "t",
+        "JOIN vehicle v ON v.id = t.veh_id JOIN fleet f ON f.id = v.fleet_id",
+        (("f.fleet_name", "fleet_name"), ("v.fleet_vehicle_id", "fleet_vehicle_id")),
+        "v.fleet_id", 't."timestamp"',
+    ),
+    "veh_daily": Fact(
+        "veh_daily", "vd",
+        "LEFT JOIN vehicle v ON v.id = vd.veh_id LEFT JOIN fleet f ON f.id = v.fleet_id",
+        (("f.fleet_name", "fleet_name"), ("v.fleet_vehicle_id", "fleet_vehicle_id")),
+        "v.fleet_id", "vd.date",
+    ),
+    "refuel_inf": Fact(
+        "refuel_inf", "r",
+        "JOIN charger c ON c.id = r.charger_id JOIN fleet f ON f.id = c.fleet_id",
+        (("f.fleet_name", "fleet_name"), ("c.charger", "charger"), ("c.charger_type", "charger_type_name")),
+        "c.fleet_id", "COALESCE(r.refuel_start, r.connect_time)",
+    ),
+    "maintenance": Fact(
+        "maintenance", "m",
+        # The loaders leave m.fleet_id empty; the fleet comes from the vehicle or the charger,
+        # as in pages/maintenance.py. The fleet_id column read back is that resolved fleet.
+        "LEFT JOIN vehicle v ON v.id = m.veh_id LEFT JOIN charger c ON c.id = m.charger_id "
+        "LEFT JOIN fleet f ON f.id = COALESCE(v.fleet_id, c.fleet_id)",
+        (("f.fleet_name", "fleet_name"), ("v.fleet_vehicle_id", "fleet_vehicle_id"), ("c.charger", "charger")),
+        "COALESCE(v.fleet_id, c.fleet_id)", "m.date",
+    ),
+}
+
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"   # read back as NULL by DuckDB / pyarrow
+
+
+def log(msg: str) -> None:
+    now = dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    print(f"[{now}] {msg}", flush=True)
+
+
+def require_pyarrow() -> None:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError as exc:
+        raise RuntimeError("The Parquet snapshot needs pyarrow (pip install pyarrow).") from exc
+
+
+def table_columns(cur, table: str) -> list[tuple[str, str]]:
+    """(column, select expression) for a table, skipping PostGIS columns and casting numerics to float."""
+    cur.execute("""
+        SELECT column_name, data_type
+        FROM information_schema.columns
+        WHERE table_schema = 'public' AND table_name = %s
+        ORDER BY ordinal_position
+    """, (table,))
+    cols = []
+    for name, data_type in cur.fetchall():
+        if data_type == "USER-DEFINED":
+            continue
+        expr = f'"{name}"'
+        if data_type == "numeric":
+            expr = f'"{name}"::double precision'
+        cols.append((name, expr))
+    return cols
+
+
+def data_versions(cur) -> dict[str, int]:
+    cur.execute("SELECT to_regclass('public.etl_data_version') IS NOT NULL")
+    if not cur.fetchone()[0]:
+        return {}
+    cur.execute("SELECT table_name, version FROM etl_data_version")
+    return {name: int(version) for name, version in cur.fetchall()}
+
+
+def read_manifest(out: Path) -> dict:
+    path = out / MANIFEST_NAME
+    if not path.exists():
+        return {"tables": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_manifest(out: Path, manifest: dict) -> None:
+    tmp = out / (MANIFEST_NAME + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, out / MANIFEST_NAME)
+
+
+def export_dimension(conn, table: str, out: Path) -> dict:
+    with conn.cursor() as cur:
+        cols = table_columns(cur, table)
+        cur.execute(f"SELECT {', '.join(e for _, e in cols)} FROM {table}")
+        df = pd.DataFrame(cur.fetchall(), columns=[c for c, _ in cols])
+    tmp = out / f"{table}.parquet.tmp"
+    df.to_parquet(tmp, index=False, compression="zstd")
+    os.replace(tmp, out / f"{table}.parquet")
+    return {"rows": len(df), "columns": list(df.columns), "added": []}
+
+
+def _write_parts(conn, fact: Fact, cols, where: str, params: tuple, dest: Path) -> int:
+    """Stream the rows matching `where` into dest/fleet_id=<id>/month=<m>/part-<n>.parquet."""
+    a = fact.alias
+    select = [f"{a}.{e}" for _, e in cols] + [e for e, _ in fact.extra] + [
+        f"{fact.fleet_expr} AS _fleet_id",
+        f"COALESCE(to_char({fact.month_expr} AT TIME ZONE 'UTC', 'YYYY-MM'), '{NULL_PARTITION}') AS _month"
+        if fact.table == "veh_tel"
+        else f"COALESCE(to_char({fact.month_expr}, 'YYYY-MM'), '{NULL_PARTITION}') AS _month",
+    ]
+    names = [c for c, _ in cols] + [n for _, n in fact.extra] + ["_fleet_id", "_month"]
+    sql = f"SELECT {', '.join(select)} FROM {fact.table} {a} {fact.joins} WHERE {where}"
+
+    rows = 0
+    part = 0
+    with conn.cursor(name=f"snapshot_{fact.table}") as cur:
+        cur.itersize = FETCH_ROWS
+        cur.execute(sql, params)
+        while True:
+            batch = cur.fetchmany(FETCH_ROWS)
+            if not batch:
+                break
+            df = pd.DataFrame(batch, columns=names)
+            for (fleet_id, month), g in df.groupby(["_fleet_id", "_month"], dropna=False, sort=False):
+                fleet_dir = NULL_PARTITION if pd.isna(fleet_id) else int(fleet_id)
+                part_dir = dest / f"fleet_id={fleet_dir}" / f"month={month}"
+                part_dir.mkdir(parents=True, exist_ok=True)
+                g.drop(columns=["_fleet_id", "_month"]).to_parquet(
+                    part_dir / f"part-{part}.parquet", index=False, compression="zstd"
+                )
+            part += 1
+            rows += len(df)
+    return rows
+
+
+def export_fact(conn, table: str, out: Path, months: set[str] | None = None) -> dict:
+    """
+    Rewrite a fact table's snapshot. With `months` (YYYY-MM), only those month partitions are
+    replaced; otherwise the whole table is rebuilt in a staging directory and swapped in.
+    """
+    fact = FACTS[table]
+    with conn.cursor() as cur:
+        cols = table_columns(cur, table)
+    # Partition keys come back from the directory names; keep them out of the files.
+    cols = [(c, e) for c, e in cols if c not in ("fleet_id", "month")]
+    final = out / table
+
+    if months and final.exists():
+        rows = 0
+        for month in sorted(months):
+            start = dt.datetime.strptime(month, "%Y-%m").replace(tzinfo=dt.timezone.utc)
+            end = (start + dt.timedelta(days=32)).replace(day=1)
+            staging = out / f".{table}_{month}.new"
+            shutil.rmtree(staging, ignore_errors=True)
+            where = f"{fact.month_expr} >= %s AND {fact.month_expr} < %s"
+            bounds = (start, end) if table == "veh_tel" else (start.date(), end.date())
+            rows += _write_parts(conn, fact, cols, where, bounds, staging)
+            for old in final.glob(f"fleet_id=*/month={month}"):
+                shutil.rmtree(old)
+            for new in staging.glob(f"fleet_id=*/month={month}"):
+                target = final / new.parent.name / new.name
+                target.parent.mkdir(parents=True, exist_ok=True)
+                new.rename(target)
+            shutil.rmtree(staging, ignore_errors=True)
+    else:
+        staging = out / f".{table}.new"
+        shutil.rmtree(staging, ignore_errors=True)
+        staging.mkdir(parents=True)
+        rows = _write_parts(conn, fact, cols, "TRUE", (), staging)
+        old = out / f".{table}.old"
+        shutil.rmtree(old, ignore_errors=True)
+        if final.exists():
+            final.rename(old)
+        staging.rename(final)
+        shutil.rmtree(old, ignore_errors=True)
+
+    return {
+        "rows_written": rows,
+        "columns": [c for c, _ in cols] + [n for _, n in fact.extra] + ["fleet_id", "month"],
+        "added": [n for _, n in fact.extra] + (["fleet_id"] if table != "maintenance" else []) + ["month"],
+    }
+
+
+def export_snapshot(out: Path, tables=None, tel_months: set[str] | None = None) -> dict:
+    """
+    Export `tables` (default: all) to `out` and update the manifest. Returns the manifest.
+    tel_months limits the veh_tel rewrite to those months (YYYY-MM).
+    """
+    require_pyarrow()
+    out = Path(out)
+    out.mkdir(parents=True, exist_ok=True)
+    tables = list(tables or (*DIMENSIONS, *FACTS))
+    manifest = read_manifest(out)
+
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            versions = data_versions(cur)
+        for table in tables:
+            started = dt.datetime.now()
+            if table in DIMENSIONS:
+                info = export_dimension(conn, table, out)
+            else:
+                info = export_fact(conn, table, out, tel_months if table == "veh_tel" else None)
+            info["version"] = versions.get(table, 0)
+            info["exported_at"] = dt.datetime.now().isoformat(timespec="seconds")
+            info["partitioned"] = table in FACTS
+            manifest["tables"][table] = info
+            log(f"{table}: {info.get('rows', info.get('rows_written'))} rows in "
+                f"{(dt.datetime.now() - started).total_seconds():.1f}s")
+        conn.rollback()
+
+    manifest["exported_at"] = dt.datetime.now().isoformat(timespec="seconds")
+    write_manifest(out, manifest)
+    return manifest
+
+
+def months_of(vehicle_days) -> set[str]:
+    """UTC months that may hold the telematics of these (veh_id, local date) pairs."""
+    months = set()
+    for _, day in vehicle_days:
+        for d in (day - dt.timedelta(days=1), day, day + dt.timedelta(days=1)):
+            months.add(f"{d:%Y-%m}")
+    return months
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--out", type=Path, default=Path(SNAPSHOT_DIR) if SNAPSHOT_DIR else None,
+                        help="Snapshot directory (default: ZEV_SNAPSHOT_DIR).")
+    parser.add_argument("--table", action="append", choices=[*DIMENSIONS, *FACTS],
+                        help="Only export these tables (repeatable). Default: all.")
+    parser.add_argument("--month", action="append",
+                        help="Only rewrite these veh_tel months, YYYY-MM (repeatable). Default: all months.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.out is None:
+        raise SystemExit("Set ZEV_SNAPSHOT_DIR or pass --out.")
+    log(f"Exporting snapshot to {args.out}")
+    export_snapshot(args.out, args.table, set(args.month) if args.month else None)
+    log("Snapshot export completed.")
+
+
+if __name__ == "__main__":
+    main()
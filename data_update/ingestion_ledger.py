@@ -0,0 +1,166 @@
+"""
+Per-file ingestion ledger shared by the fleet loaders.
+
+Each fleet keeps a JSON ledger (``_ingestion_log.json`` next to its loaders) keyed by
+the source file path relative to the fleet's incoming-data folder:
+
+    "<md5>"                                   -> file fully ingested
+    {"hash": "<md5>", "rows_committed": n,    -> partial load; a rerun of the same
+     "last_veh_id": ..., "last_timestamp": ...}  file resumes after row n
+
+Set ZEV_FORCE_RELOAD=1 to ignore the ledger and reload a file from the start.
+
+When run from data_update/run_etl.py, ZEV_ETL_MANIFEST names a JSON-lines file the
+loaders append the (veh_id, date) pairs they wrote to, so only those days are recomputed,
+and the source files they consumed (record_source), so only those are marked ingested.
+"""
+
+import hashlib
+import json
+import os
+from datetime import timezone
+from pathlib import Path
+
+import psycopg2.extras as extras
+
+CHUNK_ROWS = 50_000
+FORCE_RELOAD = os.getenv("ZEV_FORCE_RELOAD") == "1"
+ETL_MANIFEST = os.getenv("ZEV_ETL_MANIFEST")
+
+
+def md5_file(p: Path) -> str:
+    h = hashlib.md5()
+    with Path(p).open("rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class IngestionLedger:
+    def __init__(self, log_file: Path, root_dir: Path | None = None):
+        self.log_file = Path(log_file)
+        self.root_dir = Path(root_dir) if root_dir is not None else None
+
+    # ---------- storage ----------
+    def key(self, file_path: Path) -> str:
+        raw = str(file_path).replace("\\", "/")
+        p = Path(file_path)
+        if not p.is_absolute() or self.root_dir is None:
+            return raw
+        try:
+            return p.resolve().relative_to(self.root_dir.resolve()).as_posix()
+        except ValueError:
+            return raw
+
+    def load(self) -> dict:
+        if self.log_file.exists():
+            try:
+                with open(self.log_file, "r", encoding="utf-8") as f:
+                    return {self.key(Path(k)): v for k, v in json.load(f).items()}
+            except Exception:
+                return {}
+        return {}
+
+    def save(self, data: dict) -> None:
+        tmp = self.log_file.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp, self.log_file)
+
+    # ---------- queries ----------
+    def entry(self, file_path: Path):
+        return self.load().get(self.key(file_path))
+
+    def is_complete(self, file_path: Path, file_hash: str) -> bool:
+        """True if this exact file content was fully ingested (it is then reported as consumed)."""
+        done = not FORCE_RELOAD and self.entry(file_path) == file_hash
+        if done:
+            record_source(file_path)
+        return done
+
+    def resume_offset(self, file_path: Path, file_hash: str) -> int:
+        """Rows already committed for this exact file content (0 if none or content changed)."""
+        e = self.entry(file_path)
+        if FORCE_RELOAD or not isinstance(e, dict) or e.get("hash") != file_hash:
+            return 0
+        return int(e.get("rows_committed", 0))
+
+    # ---------- updates ----------
+    def save_checkpoint(self, file_path: Path, file_hash: str, rows_committed: int, **extra) -> None:
+        data = self.load()
+        data[self.key(file_path)] = {"hash": file_hash, "rows_committed": int(rows_committed), **extra}
+        self.save(data)
+
+    def mark_complete(self, file_path: Path, file_hash: str) -> None:
+        data = self.load()
+        data[self.key(file_path)] = file_hash
+        self.save(data)
+        record_source(file_path)
+
+
+def tel_checkpoint(record) -> dict:
+    """Checkpoint fields for veh_tel records shaped (veh_id, timestamp, ...)."""
+    ts = record[1]
+    return {"last_veh_id": record[0], "last_timestamp": ts.isoformat() if ts is not None else None}
+
+
+def tel_vehicle_day(record):
+    """(veh_id, UTC date) for veh_tel records shaped (veh_id, timestamp, ...); None if no timestamp."""
+    ts = record[1]
+    if ts is None or ts != ts:  # None / NaT
+        return None
+    if getattr(ts, "tzinfo", None) is not None:
+        ts = ts.astimezone(timezone.utc)
+    return int(record[0]), ts.date()
+
+
+def record_source(file_path: Path) -> None:
+    """Report a source file the loader has fully consumed to the orchestrator manifest, if one is set."""
+    if not ETL_MANIFEST:
+        return
+    with open(ETL_MANIFEST, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"source": str(Path(file_path).resolve())}) + "\n")
+
+
+def record_vehicle_days(records, vehicle_day=tel_vehicle_day) -> None:
+    """Append the distinct vehicle-days in records to the orchestrator manifest, if one is set."""
+    if not ETL_MANIFEST:
+        return
+    days = {vehicle_day(r) for r in records} - {None}
+    if not days:
+        return
+    with open(ETL_MANIFEST, "a", encoding="utf-8") as f:
+        for veh_id, day in sorted(days):
+            f.write(json.dumps({"table": "veh_tel", "veh_id": veh_id, "date": day.isoformat()}) + "\n")
+
+
+def upsert_in_chunks(conn, sql: str, records: list, ledger: IngestionLedger, file_path: Path,
+                     file_hash: str, template: str | None = None, fetch: bool = False,
+                     chunk_size: int = CHUNK_ROWS, checkpoint=None,
+                     vehicle_day=None) -> tuple[int, int]:
+    """
+    execute_values() in bounded chunks, committing and checkpointing after each one.
+
+    records must be in a deterministic order for the file (e.g. sorted by veh_id, timestamp)
+    so a rerun can skip the rows a previous attempt already committed.
+    vehicle_day (e.g. tel_vehicle_day) reports each committed chunk's vehicle-days to the ETL manifest.
+    Returns (rows returned by RETURNING or rows sent, rows skipped from the checkpoint).
+    """
+    start = min(ledger.resume_offset(file_path, file_hash), len(records))
+    if start:
+        print(f"[INFO] Resuming {Path(file_path).name} after {start} committed rows.")
+
+    affected = 0
+    for lo in range(start, len(records), chunk_size):
+        chunk = records[lo:lo + chunk_size]
+        with conn.cursor() as cur:
+            ret = extras.execute_values(cur, sql, chunk, template=template, page_size=5000, fetch=fetch)
+        conn.commit()
+        if vehicle_day is not None:
+            record_vehicle_days(chunk, vehicle_day)
+        affected += len(ret) if fetch and ret is not None else (0 if fetch else len(chunk))
+        extra = checkpoint(chunk[-1]) if checkpoint else {}
+        ledger.save_checkpoint(file_path, file_hash, lo + len(chunk), **extra)
+
+    ledger.mark_complete(file_path, file_hash)
+    return affected, start
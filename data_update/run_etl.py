@@ -0,0 +1,393 @@
+"""
+Run the fleet loaders that have new source files, then only the downstream steps they affect.
+
+Stages (each one is timed and appended to data_update/_etl_runs.jsonl):
+    1. discover   - hash the files under INCOMING_DATA_DIR each loader reads and keep the
+                    loaders with new or changed files (state in data_update/_etl_state.json);
+                    a file is recorded there once its loader reports having read it, and a
+                    matched file the loader ran without reading is recorded as unread, so
+                    it is not pending again until its content changes (or with --all)
+    2. load       - create upcoming veh_tel partitions, then run those loaders as scripts, fleets in parallel, loaders within a fleet in order
+    3. veh_daily  - recompute veh_daily only for the vehicle-days the telematics loaders wrote
+    4. rollups    - refresh materialized views that depend on the tables that changed
+    5. invalidate - bump etl_data_version for those tables so dashboard caches reload; each
+                    gunicorn worker re-warms its default page views when it sees the bump
+    6. snapshot   - when ZEV_SNAPSHOT_DIR is set, re-export the changed tables to the local
+                    Parquet snapshot (data_update/export_snapshot.py); veh_tel only for the touched months
+    7. report     - optional: sql/check_latest_data.py and sql/count_data_points.py
+
+Usage:
+    python data_update/run_etl.py                 # run what changed
+    python data_update/run_etl.py --dry-run       # only list what would run
+    python data_update/run_etl.py --fleet "Wilsbach Distributors" --all
+"""
+
+import argparse
+import datetime as dt
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from data_update.ingestion_ledger import IngestionLedger, md5_file  # noqa: E402
+from data_update.paths import INCOMING_DATA_DIR, PROJECT_ROOT  # noqa: E402
+
+STATE_FILE = Path(__file__).parent / "_etl_state.json"
+RUNS_FILE = Path(__file__).parent / "_etl_runs.jsonl"
+STATE = IngestionLedger(STATE_FILE, INCOMING_DATA_DIR)
+_STATE_LOCK = threading.Lock()  # fleets finish in parallel; the state file is read-modify-write
+
+
+@dataclass(frozen=True)
+class Loader:
+    fleet: str
+    script: str            # relative to data_update/
+    sources: tuple         # glob patterns relative to INCOMING_DATA_DIR
+    tables: tuple          # tables the loader writes
+
+    @property
+    def name(self) -> str:
+        return Path(self.script).stem
+
+
+# Order within a fleet matters (e.g. telematics before anything derived from it).
+LOADERS = [
+    Loader("Freight Equipment Leasing", "Freight_Equipment_Leasing/telematics_load_fel.py",
+           ("Freight Equipment Leasing/aws_download/*/*.csv",), ("veh_tel",)),
+    Loader("Freight Equipment Leasing", "Freight_Equipment_Leasing/daily_load_fel.py",
+           ("Freight Equipment Leasing/aws_download/*/AO_Daily_Summary.xlsx",), ("veh_daily",)),
+    Loader("Freight Equipment Leasing", "Freight_Equipment_Leasing/payload_load_fel.py",
+           ("Freight Equipment Leasing/Daily payload/*.xlsx",), ("veh_daily",)),
+    Loader("Freight Equipment Leasing", "Freight_Equipment_Leasing/charging_load_fel.py",
+           ("Freight Equipment Leasing/Charging log/*.xlsx",), ("refuel_inf",)),
+    Loader("Freight Equipment Leasing", "Freight_Equipment_Leasing/maintenance_load_fel.py",
+           ("Freight Equipment Leasing/maintenance data/*.xlsx",), ("maintenance",)),
+    Loader("Watsontown Trucking", "Watsontown_Trucking/telematics_load_wat.py",
+           ("Watsontown Trucking/*/Charging & Telematics/*.csv",), ("veh_tel",)),
+    Loader("Watsontown Trucking", "Watsontown_Trucking/charging_load_wat.py",
+           ("Watsontown Trucking/*/Charging & Telematics/*.xlsx",), ("refuel_inf",)),
+    Loader("Wilsbach Distributors", "Wilsbach/telematics_load_wil.py",
+           ("Wilsbach Distributors/Telematics/*.xlsx",), ("veh_tel",)),
+    Loader("Wilsbach Distributors", "Wilsbach/daily_load_wil.py",
+           ("Wilsbach Distributors/Daily usage/*.xlsx",), ("veh_daily",)),
+    Loader("Wilsbach Distributors", "Wilsbach/charging_load_wil.py",
+           ("Wilsbach Distributors/Charging event/*.xlsx",), ("refuel_inf",)),
+    Loader("Wilsbach Distributors", "Wilsbach/maintenance_load_wil.py",
+           ("Wilsbach Distributors/maintenance/*.xlsx",), ("maintenance",)),
+    Loader("SQ Trucking", "SQTrucking/telematics_sq.py",
+           ("SQ Trucking/telematics/*.xlsx",), ("veh_tel",)),
+    Loader("SQ Trucking", "SQTrucking/veh_daily_sq.py",
+           ("SQ Trucking/daily usage/*.xlsx",), ("veh_daily",)),
+]
+
+
+def log(msg: str) -> None:
+    now = dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    print(f"[{now}] {msg}", flush=True)
+
+
+def parse_args() -> argparse.Namespace:
+    fleets = sorted({ld.fleet for ld in LOADERS})
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--fleet", action="append", choices=fleets,
+                        help="Limit to these fleets (repeatable). Default: all fleets.")
+    parser.add_argument("--all", action="store_true",
+                        help="Run every selected loader even if no source file changed.")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="List the loaders and files that would run, then exit.")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Fleets loaded in parallel (default: one per fleet).")
+    parser.add_argument("--skip-downstream", action="store_true",
+                        help="Only run loaders; skip veh_daily, rollups and cache invalidation.")
+    parser.add_argument("--report", action="store_true",
+                        help="Print latest dates and row counts per fleet at the end.")
+    parser.add_argument("--idle-threshold-minutes", type=float, default=None,
+                        help="Idle threshold passed to the veh_daily recompute.")
+    return parser.parse_args()
+
+
+# ---------- stage 1: discover ----------
+def source_files(loader: Loader) -> list[Path]:
+    files = set()
+    for pattern in loader.sources:
+        files.update(p for p in INCOMING_DATA_DIR.glob(pattern) if p.is_file() and not p.name.startswith("~$"))
+    return sorted(files)
+
+
+def _unread_entry(file_hash: str) -> dict:
+    return {"unread": file_hash}
+
+
+def mark_unread(file_path: Path, file_hash: str) -> None:
+    """Record a matched file its loader ran without reading (e.g. not the file its FILE_PATH names)."""
+    data = STATE.load()
+    data[STATE.key(file_path)] = _unread_entry(file_hash)
+    STATE.save(data)
+
+
+def discover(loaders: list[Loader], run_all: bool) -> dict[Loader, dict[Path, str]]:
+    """Loader -> {source file: md5} for the loaders that need to run."""
+    pending = {}
+    for loader in loaders:
+        changed = {}
+        for p in source_files(loader):
+            h = md5_file(p)
+            done = STATE.is_complete(p, h) or STATE.entry(p) == _unread_entry(h)
+            if run_all or not done:
+                changed[p] = h
+        if changed:
+            pending[loader] = changed
+    return pending
+
+
+# ---------- stage 2: load ----------
+def run_loader(loader: Loader) -> dict:
+    """Run one loader script; returns its outcome and the vehicle-days it reported."""
+    fd, manifest = tempfile.mkstemp(prefix=f"etl_{loader.name}_", suffix=".jsonl")
+    os.close(fd)
+    env = dict(os.environ, ZEV_ETL_MANIFEST=manifest)
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, str(Path(__file__).parent / loader.script)],
+        cwd=PROJECT_ROOT, env=env, capture_output=True, text=True,
+    )
+    seconds = time.perf_counter() - started
+
+    vehicle_days, consumed = set(), set()
+    with open(manifest, "r", encoding="utf-8") as f:
+        for line in f:
+            rec = json.loads(line)
+            if "source" in rec:
+                consumed.add(Path(rec["source"]))
+            else:
+                vehicle_days.add((int(rec["veh_id"]), dt.date.fromisoformat(rec["date"])))
+    os.remove(manifest)
+    return {"returncode": proc.returncode, "stdout": proc.stdout, "stderr": proc.stderr,
+            "seconds": seconds, "vehicle_days": vehicle_days, "consumed": consumed}
+
+
+def run_fleet(fleet: str, loaders: list[Loader], pending: dict) -> list[tuple[Loader, dict]]:
+    results = []
+    for loader in loaders:
+        result = run_loader(loader)
+        # Only files the loader reported reading are marked ingested; a matched file it did not
+        # read (e.g. a new drop next to the file its FILE_PATH names) is recorded as unread.
+        result["read"] = sorted(p for p in pending[loader] if p.resolve() in result["consumed"])
+        result["unread"] = sorted(p for p in pending[loader] if p.resolve() not in result["consumed"])
+        if result["returncode"] == 0:
+            with _STATE_LOCK:
+                for p in result["read"]:
+                    STATE.mark_complete(p, pending[loader][p])
+                for p in result["unread"]:
+                    mark_unread(p, pending[loader][p])
+        results.append((loader, result))
+        # Later loaders of a fleet may depend on this one (e.g. vehicles it creates).
+        if result["returncode"] != 0:
+            break
+    return results
+
+
+def load(pending: dict, workers: int | None) -> list[tuple[Loader, dict]]:
+    by_fleet: dict[str, list[Loader]] = {}
+    for loader in LOADERS:
+        if loader in pending:
+            by_fleet.setdefault(loader.fleet, []).append(loader)
+
+    results = []
+    with ThreadPoolExecutor(max_workers=workers or max(len(by_fleet), 1)) as pool:
+        futures = [pool.submit(run_fleet, fleet, loaders, pending) for fleet, loaders in by_fleet.items()]
+        for fut in futures:
+            for loader, result in fut.result():
+                status = "OK" if result["returncode"] == 0 else f"FAILED (exit {result['returncode']})"
+                log(f"{loader.fleet} / {loader.name}: {status} in {result['seconds']:.1f}s")
+                for line in result["stdout"].splitlines():
+                    print(f"    {line}")
+                if result["returncode"] != 0:
+                    for line in result["stderr"].splitlines():
+                        print(f"    ! {line}")
+                elif result["unread"]:
+                    log(f"{loader.fleet} / {loader.name}: {len(result['unread'])} file(s) not read by the loader "
+                        "(recorded as unread; rerun with --all after pointing the loader at them):")
+                    for p in result["unread"]:
+                        print(f"    {p.relative_to(INCOMING_DATA_DIR)}")
+                results.append((loader, result))
+    return results
+
+
+# ---------- stages 3-5: downstream ----------
+# DB imports are deferred so --dry-run works without DATABASE_URL.
+def ensure_future_partitions(months_ahead: int = 3) -> int:
+    """Create veh_tel partitions for the coming months (no-op before sql/partition_veh_tel.sql)."""
+    from data_update.common_data_update import get_conn
+
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT to_regprocedure('public.ensure_veh_tel_partitions(date, date)') IS NOT NULL")
+            if not cur.fetchone()[0]:
+                return 0
+            cur.execute(
+                "SELECT public.ensure_veh_tel_partitions(current_date, (current_date + %s * interval '1 month')::date)",
+                (months_ahead,),
+            )
+            created = int(cur.fetchone()[0] or 0)
+        conn.commit()
+    return created
+
+
+def recompute_veh_daily(vehicle_days: set, idle_threshold_minutes: float | None) -> int:
+    from data_update.common_data_update import get_conn
+    from data_update.compute_veh_daily import DEFAULT_IDLE_THRESHOLD_MINUTES, recompute_vehicle_days
+
+    with get_conn() as conn:
+        n = recompute_vehicle_days(
+            conn, vehicle_days,
+            idle_threshold_minutes=idle_threshold_minutes or DEFAULT_IDLE_THRESHOLD_MINUTES,
+        )
+        conn.commit()
+    return n
+
+
+def refresh_rollups(tables: set[str]) -> list[str]:
+    """REFRESH every materialized view in public that reads from one of the changed tables."""
+    from data_update.common_data_update import get_conn
+
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT DISTINCT m.matviewname
+                FROM pg_matviews m
+                JOIN pg_rewrite r ON r.ev_class = format('%%I.%%I', m.schemaname, m.matviewname)::regclass
+                JOIN pg_depend d ON d.objid = r.oid AND d.classid = 'pg_rewrite'::regclass
+                JOIN pg_class c ON c.oid = d.refobjid
+                WHERE m.schemaname = 'public'
+                  AND c.relname = ANY(%s)
+                ORDER BY m.matviewname
+            """, (sorted(tables),))
+            views = [r[0] for r in cur.fetchall()]
+            for view in views:
+                cur.execute(f'REFRESH MATERIALIZED VIEW public."{view}"')
+        conn.commit()
+    return views
+
+
+def bump_data_versions(tables: set[str]) -> None:
+    from data_update.common_data_update import get_conn
+
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                INSERT INTO public.etl_data_version (table_name, version, updated_at)
+                SELECT t, 1, now() FROM unnest(%s::text[]) AS t
+                ON CONFLICT (table_name) DO UPDATE
+                SET version = etl_data_version.version + 1,
+                    updated_at = EXCLUDED.updated_at
+            """, (sorted(tables),))
+        conn.commit()
+
+
+def export_snapshot(tables: set[str], vehicle_days: set) -> list[str]:
+    from data_update.export_snapshot import DIMENSIONS, FACTS, SNAPSHOT_DIR, export_snapshot, months_of
+
+    # Loaders can add vehicles / chargers, so the dimensions are always re-exported (they are small).
+    export = [*DIMENSIONS, *(t for t in FACTS if t in tables)]
+    tel_months = months_of(vehicle_days) if vehicle_days else None
+    export_snapshot(Path(SNAPSHOT_DIR), export, tel_months)
+    return export
+
+
+def run_report() -> None:
+    for script in ("check_latest_data.py", "count_data_points.py"):
+        subprocess.run([sys.executable, str(PROJECT_ROOT / "sql" / script)], cwd=PROJECT_ROOT, check=False)
+
+
+# ---------- driver ----------
+class StageTimer:
+    def __init__(self):
+        self.timings: dict[str, float] = {}
+
+    def run(self, stage: str, fn, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self.timings[stage] = round(time.perf_counter() - started, 3)
+            log(f"Stage {stage}: {self.timings[stage]:.1f}s")
+
+
+def main() -> int:
+    args = parse_args()
+    loaders = [ld for ld in LOADERS if not args.fleet or ld.fleet in args.fleet]
+    timer = StageTimer()
+    run_started = dt.datetime.now()
+
+    pending = timer.run("discover", discover, loaders, args.all)
+    if not pending:
+        log("No new source files. Nothing to do.")
+        return 0
+    for loader, files in pending.items():
+        log(f"{loader.fleet} / {loader.name}: {len(files)} new or changed file(s)")
+        for p in files:
+            print(f"    {p.relative_to(INCOMING_DATA_DIR)}")
+    if args.dry_run:
+        return 0
+
+    if any("veh_tel" in ld.tables for ld in pending):
+        created = timer.run("partitions", ensure_future_partitions)
+        log(f"veh_tel partitions created: {created}")
+
+    results = timer.run("load", load, pending, args.workers)
+    succeeded = [(ld, r) for ld, r in results if r["returncode"] == 0]
+    failed = [ld.name for ld, r in results if r["returncode"] != 0]
+    # A loader that read no new file and wrote no vehicle-days changed nothing downstream.
+    changed_tables = {t for ld, r in succeeded if r["read"] or r["vehicle_days"] for t in ld.tables}
+    vehicle_days = set().union(*(r["vehicle_days"] for _, r in succeeded)) if succeeded else set()
+
+    daily_rows = 0
+    views = []
+    if not args.skip_downstream and changed_tables:
+        if vehicle_days:
+            daily_rows = timer.run("veh_daily", recompute_veh_daily, vehicle_days, args.idle_threshold_minutes)
+            log(f"veh_daily: {daily_rows} rows recomputed for {len(vehicle_days)} touched vehicle-days.")
+            if daily_rows:
+                changed_tables.add("veh_daily")
+        views = timer.run("rollups", refresh_rollups, changed_tables)
+        log(f"Refreshed materialized views: {', '.join(views) or 'none'}")
+        timer.run("invalidate", bump_data_versions, changed_tables)
+        log(f"Bumped data version for: {', '.join(sorted(changed_tables))}")
+        if os.getenv("ZEV_SNAPSHOT_DIR"):
+            exported = timer.run("snapshot", export_snapshot, changed_tables, vehicle_days)
+            log(f"Snapshot refreshed: {', '.join(exported)}")
+
+    if args.report:
+        timer.run("report", run_report)
+
+    with open(RUNS_FILE, "a", encoding="utf-8") as f:
+        f.write(json.dumps({
+            "started": run_started.isoformat(timespec="seconds"),
+            "stages": timer.timings,
+            "loaders": {ld.script: round(r["seconds"], 3) for ld, r in results},
+            "failed": failed,
+            "unread": sorted(str(p.relative_to(INCOMING_DATA_DIR))
+                             for _, r in succeeded for p in r["unread"]),
+            "changed_tables": sorted(changed_tables),
+            "vehicle_days": len(vehicle_days),
+            "veh_daily_rows": daily_rows,
+            "refreshed_views": views,
+        }) + "\n")
+
+    if failed:
+        log(f"Failed loaders: {', '.join(failed)}")
+        return 1
+    log("ETL run completed.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""
+Shared helpers for the per-fleet telematics loaders (veh_tel).
+"""
+
+import io
+
+import pandas as pd
+
+STAGING_TABLE = "tmp_veh_tel_incoming"
+
+# Column -> decimal places used when deciding whether an overlapping row changed.
+COMPARE_ROUNDING = {
+    "elevation": 6,
+    "speed": 6,
+    "mileage": 6,
+    "soc": 6,
+    "key_on_time": 6,
+    "latitude": 8,
+    "longitude": 8,
+}
+
+
+def copy_to_staging(cur, df: pd.DataFrame, columns: list[str], table: str = STAGING_TABLE) -> int:
+    """
+    COPY the given veh_tel columns of df into a session temp table (dropped on commit).
+    Returns the number of rows staged.
+    """
+    value_cols = [c for c in columns if c not in ("veh_id", "timestamp")]
+    col_defs = ", ".join(f"{c} double precision" for c in value_cols)
+    cur.execute(f"DROP TABLE IF EXISTS {table}")
+    cur.execute(f"""
+        CREATE TEMP TABLE {table} (
+            veh_id integer,
+            "timestamp" timestamptz{", " + col_defs if col_defs else ""}
+        ) ON COMMIT DROP
+    """)
+
+    buf = io.StringIO()
+    df[["veh_id", "timestamp"] + value_cols].to_csv(buf, index=False, header=False)
+    buf.seek(0)
+    col_list = ", ".join(['veh_id', '"timestamp"'] + value_cols)
+    cur.copy_expert(f"COPY {table} ({col_list}) FROM STDIN WITH (FORMAT csv)", buf)
+    return len(df)
+
+
+def ensure_partitions(cur, df: pd.DataFrame) -> int:
+    """
+    Create any missing monthly veh_tel partitions for df's timestamp range (sql/partition_veh_tel.sql).
+    No-op on a database that has not been partitioned. Returns the number of partitions created.
+    """
+    ts = pd.to_datetime(df["timestamp"], utc=True, errors="coerce").dropna() if not df.empty else None
+    if ts is None or ts.empty:
+        return 0
+    cur.execute("SELECT to_regprocedure('public.ensure_veh_tel_partitions(date, date)') IS NOT NULL")
+    if not cur.fetchone()[0]:
+        return 0
+    cur.execute(
+        "SELECT public.ensure_veh_tel_partitions(%s, %s)",
+        (ts.min().date(), ts.max().date()),
+    )
+    return int(cur.fetchone()[0] or 0)
+
+
+def refresh_hourly(cur, df: pd.DataFrame) -> int:
+    """
+    Recompute veh_tel_hourly for the hours each vehicle in df spans (sql/setup_veh_tel_hourly.sql).
+    No-op if the rollup has not been set up. Returns the number of hourly rows written.
+    """
+    if df.empty:
+        return 0
+    cur.execute("SELECT to_regprocedure('public.refresh_veh_tel_hourly(integer, timestamptz, timestamptz)') IS NOT NULL")
+    if not cur.fetchone()[0]:
+        return 0
+    ts = pd.to_datetime(df["timestamp"], utc=True, errors="coerce")
+    spans = ts.groupby(df["veh_id"]).agg(["min", "max"]).dropna()
+    written = 0
+    for veh_id, (t0, t1) in spans.iterrows():
+        cur.execute(
+            "SELECT public.refresh_veh_tel_hourly(%s, %s, %s)",
+            (int(veh_id), t0.to_pydatetime(), t1.to_pydatetime()),
+        )
+        written += int(cur.fetchone()[0] or 0)
+    return written
+
+
+def overlap_report(cur, df: pd.DataFrame, columns: list[str]) -> dict[str, int]:
+    """
+    Compare incoming rows against veh_tel in Postgres and return only the counts.
+
+    columns: veh_tel value columns the loader writes (e.g. ["speed", "mileage", "latitude", "longitude"]).
+    """
+    report = {"overlap_existing": 0, "new_rows": 0, "changed_overlap": 0, "unchanged_overlap": 0}
+    if df.empty:
+        return report
+
+    copy_to_staging(cur, df, ["veh_id", "timestamp"] + columns)
+
+    changed = " OR ".join(
+        f"round(s.{c}::numeric, {COMPARE_ROUNDING.get(c, 6)}) IS DISTINCT FROM "
+        f"round(t.{c}::numeric, {COMPARE_ROUNDING.get(c, 6)})"
+        for c in columns
+    ) or "false"
+    cur.execute(f"""
+        SELECT
+            COUNT(*) FILTER (WHERE t.veh_id IS NOT NULL)                  AS overlap_existing,
+            COUNT(*) FILTER (WHERE t.veh_id IS NULL)                      AS new_rows,
+            COUNT(*) FILTER (WHERE t.veh_id IS NOT NULL AND ({changed}))  AS changed_overlap
+        FROM {STAGING_TABLE} s
+        LEFT JOIN public.veh_tel t
+          ON t.veh_id = s.veh_id
+         AND t."timestamp" = s."timestamp"
+    """)
+    overlap, new, changed_n = cur.fetchone()
+    report.update(
+        overlap_existing=int(overlap),
+        new_rows=int(new),
+        changed_overlap=int(changed_n),
+        unchanged_overlap=int(overlap) - int(changed_n),
+    )
+    cur.execute(f"DROP TABLE IF EXISTS {STAGING_TABLE}")
+    return report
+
+
+def print_overlap_report(report: dict[str, int], width: int = 28) -> None:
+    """Print the overlap counts aligned with the calling loader's summary block."""
+    labels = [
+        ("Overlap with existing:", "overlap_existing"),
+        ("New rows (no overlap):", "new_rows"),
+        ("Changed overlap rows:", "changed_overlap"),
+        ("Unchanged overlap rows:", "unchanged_overlap"),
+    ]
+    for label, key in labels:
+        print(f"{label:<{width}}{report[key]}")
@@ -0,0 +1,200 @@
+"""
+Page frames indexed for the filter callbacks.
+
+A DateIndexedFrame holds a page's cached DataFrame sorted by its date column (datetime64 at
+midnight, undated rows last) together with, for every filter column, the sorted row positions
+of each value (grouped from pd.factorize codes). A date range is two binary searches on the
+sorted dates; an equality filter looks up the value's positions and clips them to that range.
+Each filter costs O(log n + k) for k matching rows, and a date-only filter returns a slice of
+the cached frame rather than a boolean-masked copy.
+
+The cached frame is shared by every callback in the worker, so its column buffers are made
+read-only (protect()): callbacks filter and slice it without defensive copies, and an in-place
+write anywhere (df.loc[...] = x, fillna(inplace=True), ...) raises ValueError instead of
+silently changing what the next request sees. Code that needs to modify rows copies them first.
+
+Every gunicorn worker holds its own copy of each frame, so frames are stored compactly
+(compact()): the dataset's low-cardinality text columns as categoricals and its small integer
+and float columns downcast per SCHEMAS. A downcast only happens when it is lossless, so a
+column with missing values, fractions or out-of-range values keeps its dtype. Measures that the
+tables sum or average stay float64, because float32 sums would change the published figures.
+memory_report() (GET /health/frames) shows the bytes each dataset took before and after.
+"""
+
+import numpy as np
+import pandas as pd
+
+_NAT = np.datetime64("NaT", "ns")
+
+# Column dtypes of each cached dataset; columns a dataset does not have are skipped.
+SCHEMAS = {
+    "charging": {
+        "fleet_name": "category", "charger_type": "category",
+        "id": "int32", "charger_id": "int32", "veh_id": "int32",
+    },
+    "analysis": {"fleet_name": "category", "charger_type": "category"},
+    "daily_usage": {
+        "fleet": "category", "make": "category", "model": "category", "class": "category",
+        "fleet_vehicle_id": "category",
+        "id": "int32", "veh_id": "int32", "trip_num": "int16",
+        "peak_payload": "float32",   # only ever maxed
+    },
+    "maintenance": {
+        "fleet_name": "category", "maint_categ": "category", "maint_loc": "category",
+        "maint_loc_bucket": "category", "warranty_bucket": "category",
+        "id": "int32", "maint_ob": "int8", "maint_type": "int8",
+    },
+}
+_REPORT = {}   # dataset -> memory before / after compact()
+
+
+def _lossless(s: pd.Series, dtype: str) -> bool:
+    if not pd.api.types.is_numeric_dtype(s) or s.isna().any():
+        return False
+    values = s.to_numpy()
+    return bool(np.array_equal(values.astype(dtype).astype(values.dtype), values))
+
+
+def compact(df: pd.DataFrame, name: str) -> pd.DataFrame:
+    """df with SCHEMAS[name] applied; the bytes before and after are kept for memory_report()."""
+    before = int(df.memory_usage(deep=True).sum())
+    cast = {
+        col: dtype for col, dtype in SCHEMAS[name].items()
+        if col in df.columns and df[col].dtype != dtype
+        and (dtype == "category" or _lossless(df[col], dtype))
+    }
+    if cast:
+        df = df.astype(cast)
+    after = int(df.memory_usage(deep=True).sum())
+    _REPORT[name] = {
+        "rows": len(df),
+        "bytes_before": before,
+        "bytes": after,
+        "bytes_saved": before - after,
+        "columns_cast": sorted(cast),
+    }
+    return df
+
+
+def memory_report() -> dict:
+    """{dataset: rows, bytes before and after compact(), bytes saved} for the frames this process loaded."""
+    return {name: dict(entry) for name, entry in sorted(_REPORT.items())}
+
+
+def protect(df: pd.DataFrame) -> pd.DataFrame:
+    """Make df's column buffers read-only, in place; views and slices of it inherit the flag."""
+    for values in df._mgr.arrays:   # the block arrays every column view is taken from
+        # numpy columns, and the buffers behind datetime / categorical / nullable extension arrays
+        for arr in (values, getattr(values, "_ndarray", None), getattr(values, "_data", None),
+                    getattr(values, "_mask", None)):
+            if isinstance(arr, np.ndarray):
+                arr.flags.writeable = False
+    return df
+
+
+def to_day(value) -> np.datetime64 | None:
+    """Dash date input ('2024-05-01', an ISO datetime, a date) as datetime64[ns] at midnight; None if empty."""
+    if value is None or (isinstance(value, str) and not value):
+        return None
+    return pd.Timestamp(value).normalize().to_datetime64().astype("datetime64[ns]")
+
+
+def date_span(dates: np.ndarray, start_date=None, end_date=None) -> tuple[int, int]:
+    """
+    [lo, hi) row range of sorted datetime64 dates (NaT last) between start_date and end_date,
+    both inclusive. Undated rows are only included when neither bound is given.
+    """
+    start, end = to_day(start_date), to_day(end_date)
+    if start is None and end is None:
+        return 0, len(dates)
+    hi = int(np.searchsorted(dates, _NAT, side="left"))
+    lo = int(np.searchsorted(dates[:hi], start, side="left")) if start is not None else 0
+    if end is not None:
+        hi = int(np.searchsorted(dates[:hi], end, side="right"))
+    return lo, max(lo, hi)
+
+
+def latest_days(df: pd.DataFrame, days: int, date_col: str = "date") -> pd.DataFrame:
+    """
+    Rows of a date-sorted frame within `days` days of its latest date (the pages' default
+    "latest 30 days" view); the frame itself if it has no dates.
+    """
+    dates = df[date_col].to_numpy(dtype="datetime64[ns]")
+    n_dated = int(np.searchsorted(dates, _NAT, side="left"))
+    if n_dated == 0:
+        return df
+    latest = dates[n_dated - 1]
+    lo, hi = date_span(dates[:n_dated], latest - np.timedelta64(days - 1, "D"), latest)
+    return df.iloc[lo:hi]
+
+
+class DateIndexedFrame:
+    """
+    A read-only frame sorted by date_col, with row positions per value of each column in keys.
+    name: the dataset's entry in SCHEMAS, applied with compact().
+    add_group() registers further named row sets (e.g. "asset_type" -> {"vehicle": mask}).
+    """
+
+    def __init__(self, df: pd.DataFrame, keys=(), name: str | None = None, date_col: str = "date"):
+        if name is not None:
+            df = compact(df, name)
+        dates = pd.to_datetime(df[date_col], errors="coerce")
+        if dates.dt.tz is not None:   # timestamptz columns: the UTC calendar date
+            dates = dates.dt.tz_localize(None)
+        df = df.assign(**{date_col: dates.dt.normalize()})
+        self._df = protect(df.sort_values(date_col, kind="stable", na_position="last", ignore_index=True))
+        self.date_col = date_col
+        self._dates = self._df[date_col].to_numpy(dtype="datetime64[ns]")
+        self._positions = {}
+        for key in keys:
+            codes, uniques = pd.factorize(self._df[key])
+            order = np.argsort(codes, kind="stable")
+            bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+            self._positions[key] = {
+                value: order[bounds[i]:bounds[i + 1]] for i, value in enumerate(uniques)
+            }
+
+    @property
+    def df(self) -> pd.DataFrame:
+        """All rows: a view sharing the read-only buffers (adding a column to it leaves the cache alone)."""
+        return self._df.iloc[:]
+
+    def add_group(self, name: str, masks: dict) -> None:
+        """Filter `name` selects the rows where masks[value] (boolean arrays over self.df) is true."""
+        self._positions[name] = {value: np.flatnonzero(np.asarray(mask)) for value, mask in masks.items()}
+
+    def __len__(self) -> int:
+        return len(self._df)
+
+    def _matching(self, key: str, value, lo: int, hi: int) -> np.ndarray:
+        index = self._positions[key]
+        values = value if isinstance(value, (list, tuple, set)) else [value]
+        parts = []
+        for v in values:
+            pos = index.get(v)
+            if pos is not None:
+                parts.append(pos[np.searchsorted(pos, lo):np.searchsorted(pos, hi)])
+        if not parts:
+            return np.empty(0, dtype=np.intp)
+        return parts[0] if len(parts) == 1 else np.unique(np.concatenate(parts))
+
+    def select(self, filters: dict | None = None, start_date=None, end_date=None) -> pd.DataFrame:
+        """
+        Rows between start_date and end_date (inclusive) whose filter columns equal the given
+        values; a list value matches any of its items and an empty value (None, "", []) is no
+        filter. Rows keep date order.
+        """
+        lo, hi = date_span(self._dates, start_date, end_date)
+        rows = None
+        for key, value in (filters or {}).items():
+            if not value:
+                continue
+            pos = self._matching(key, value, lo, hi)
+            rows = pos if rows is None else np.intersect1d(rows, pos, assume_unique=True)
+        if rows is None:
+            return self._df.iloc[lo:hi]
+        return self._df.take(rows)
+
+    def latest(self, days: int) -> pd.DataFrame:
+        """The latest `days` days of data (see latest_days)."""
+        return latest_days(self._df, days, self.date_col)
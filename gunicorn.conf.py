@@ -0,0 +1,12 @@
+"""
+Gunicorn hooks, read from the project root by `gunicorn app:server` (command-line flags still
+set workers, threads and timeouts).
+"""
+
+
+def post_worker_init(worker):
+    """Warm the default page views in a background thread once the worker has loaded the app."""
+    import warmup
+
+    warmup.start()
+    worker.log.info("Default view warm-up started (ZEV_WARMUP=%s)", "on" if warmup.ENABLED else "off")
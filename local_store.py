@@ -0,0 +1,99 @@
+"""
+Read-only access to the Parquet snapshot written by data_update/export_snapshot.py.
+
+With ZEV_DATA_SOURCE=snapshot and ZEV_SNAPSHOT_DIR pointing at a snapshot, db.read_sql runs
+the page queries here with DuckDB instead of sending them to the production database.
+Each exported table is a view under its own name with its original columns, so the pages'
+SQL runs unchanged; <table>_wide also has the dimension columns and the fleet_id / month
+partition keys, and filters on those only read the matching files.
+"""
+
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = Path(os.environ["ZEV_SNAPSHOT_DIR"]) if os.getenv("ZEV_SNAPSHOT_DIR") else None
+MANIFEST_NAME = "_snapshot.json"
+
+_LOCK = threading.Lock()
+_STATE = {"mtime": None, "manifest": None, "con": None}
+
+
+def _manifest_path() -> Path | None:
+    return SNAPSHOT_DIR / MANIFEST_NAME if SNAPSHOT_DIR else None
+
+
+def available() -> bool:
+    """True if a snapshot has been exported and DuckDB is installed."""
+    path = _manifest_path()
+    if path is None or not path.exists():
+        return False
+    try:
+        import duckdb  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _create_views(con, manifest: dict) -> None:
+    for table, info in manifest["tables"].items():
+        if info.get("partitioned"):
+            source = (
+                f"read_parquet('{(SNAPSHOT_DIR / table).as_posix()}/*/*/*.parquet', "
+                f"hive_partitioning = true, union_by_name = true)"
+            )
+        else:
+            source = f"read_parquet('{(SNAPSHOT_DIR / f'{table}.parquet').as_posix()}')"
+        added = info.get("added") or []
+        con.execute(f'CREATE OR REPLACE VIEW "{table}_wide" AS SELECT * FROM {source}')
+        if added:
+            exclude = ", ".join(f'"{c}"' for c in added)
+            con.execute(f'CREATE OR REPLACE VIEW "{table}" AS SELECT * EXCLUDE ({exclude}) FROM "{table}_wide"')
+        else:
+            con.execute(f'CREATE OR REPLACE VIEW "{table}" AS SELECT * FROM "{table}_wide"')
+
+
+def _connection():
+    """DuckDB connection with the snapshot's views; rebuilt when the manifest changes."""
+    import duckdb
+
+    mtime = _manifest_path().stat().st_mtime
+    with _LOCK:
+        if _STATE["con"] is None or _STATE["mtime"] != mtime:
+            with open(_manifest_path(), "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            con = duckdb.connect(database=":memory:")
+            _create_views(con, manifest)
+            if _STATE["con"] is not None:
+                _STATE["con"].close()
+            _STATE.update(con=con, manifest=manifest, mtime=mtime)
+        # One cursor per query: DuckDB connections are not shared across threads.
+        return _STATE["con"].cursor()
+
+
+def query(sql: str) -> pd.DataFrame:
+    cur = _connection()
+    try:
+        return cur.execute(sql).df()
+    finally:
+        cur.close()
+
+
+def table_version(table: str) -> int:
+    """etl_data_version of the table when it was exported (0 if unknown)."""
+    path = _manifest_path()
+    if path is None or not path.exists():
+        return 0
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            info = json.load(f)["tables"].get(table) or {}
+    except (OSError, ValueError):
+        logger.debug("Could not read %s", path, exc_info=True)
+        return 0
+    return int(info.get("version", 0))
@@ -0,0 +1,236 @@
+"""
+Request and SQL instrumentation for the dashboard, exported in Prometheus text format.
+
+- Every Dash callback request (/_dash-update-component) is timed on app.server and labelled by
+  its output id, with the rows its SQL read, the response bytes and page-cache hits / misses.
+- SQL statements are timed through SQLAlchemy events (and read_copy) and grouped by a
+  normalized fingerprint (literals and placeholders replaced, whitespace collapsed).
+- GET /metrics serves the counters; callbacks and statements slower than the thresholds are
+  appended as JSON lines to a rotating slow log.
+
+Counters are per process: with several gunicorn workers, scrape each one or sum in Prometheus.
+"""
+
+import hashlib
+import json
+import logging
+import logging.handlers
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+
+SLOW_CALLBACK_MS = float(os.getenv("ZEV_SLOW_CALLBACK_MS", "1000"))
+SLOW_SQL_MS = float(os.getenv("ZEV_SLOW_SQL_MS", "500"))
+SLOW_LOG_FILE = os.getenv("ZEV_SLOW_LOG", os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs", "slow.log"))
+BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+_LOCK = threading.Lock()
+_REQUEST = threading.local()   # per-request accumulators (one request per thread at a time)
+
+
+class _Histogram:
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.count += 1
+        self.sum += seconds
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+
+
+_CALLBACK_SECONDS = defaultdict(_Histogram)
+_CALLBACK_ROWS = defaultdict(int)
+_CALLBACK_BYTES = defaultdict(int)
+_CALLBACK_ERRORS = defaultdict(int)
+_SQL_SECONDS = defaultdict(_Histogram)
+_SQL_ROWS = defaultdict(int)
+_SQL_TEXT = {}
+_CACHE = defaultdict(int)   # (cache, "hit" | "miss") -> count
+
+_slow_logger = None
+
+
+def _slow_log(record: dict) -> None:
+    global _slow_logger
+    if _slow_logger is None:
+        logger = logging.getLogger("zev.slow")
+        logger.propagate = False
+        try:
+            os.makedirs(os.path.dirname(SLOW_LOG_FILE), exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(SLOW_LOG_FILE, maxBytes=5_000_000, backupCount=5)
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+        except OSError:
+            logging.getLogger(__name__).warning("Slow log %s not writable", SLOW_LOG_FILE, exc_info=True)
+        logger.setLevel(logging.INFO)
+        _slow_logger = logger
+    record["ts"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+    _slow_logger.info(json.dumps(record, default=str))
+
+
+# ---------- SQL ----------
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PARAM = re.compile(r"%\(\w+\)s|%s|(?<!:):(?!:)\w+|\$\d+")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_SPACE = re.compile(r"\s+")
+
+
+def fingerprint(sql: str) -> str:
+    """SQL with literals and placeholders replaced by ?, so repeated queries share one series."""
+    s = _STRING.sub("?", str(sql))
+    s = _PARAM.sub("?", s)
+    s = _NUMBER.sub("?", s)
+    s = _IN_LIST.sub("(?)", s)
+    return _SPACE.sub(" ", s).strip().rstrip(";")
+
+
+def record_sql(sql: str, seconds: float, rows: int) -> None:
+    fp = fingerprint(sql)
+    key = hashlib.sha1(fp.encode()).hexdigest()[:10]
+    with _LOCK:
+        _SQL_TEXT[key] = fp
+        _SQL_SECONDS[key].observe(seconds)
+        _SQL_ROWS[key] += max(rows, 0)
+    acc = getattr(_REQUEST, "acc", None)
+    if acc is not None:
+        acc["rows"] += max(rows, 0)
+        acc["sql_seconds"] += seconds
+        acc["queries"] += 1
+    if seconds * 1000 >= SLOW_SQL_MS:
+        _slow_log({"kind": "sql", "query": key, "ms": round(seconds * 1000, 1), "rows": rows, "sql": fp[:2000]})
+
+
+def instrument_engine(engine) -> None:
+    """Time every statement the engine runs."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("zev_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["zev_query_start"].pop()
+        record_sql(statement, time.perf_counter() - started, cursor.rowcount)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        # A failed statement never reaches after_cursor_execute; drop its start time.
+        conn = exception_context.connection
+        if conn is not None and exception_context.statement is not None and conn.info.get("zev_query_start"):
+            conn.info["zev_query_start"].pop()
+
+
+# ---------- caches ----------
+def record_cache(name: str, hit: bool) -> None:
+    with _LOCK:
+        _CACHE[(name, "hit" if hit else "miss")] += 1
+    acc = getattr(_REQUEST, "acc", None)
+    if acc is not None:
+        acc["cache_hits" if hit else "cache_misses"] += 1
+
+
+# ---------- callbacks ----------
+def _callback_id(request) -> str:
+    try:
+        body = request.get_json(silent=True) or {}
+    except Exception:
+        body = {}
+    return str(body.get("output", "unknown"))
+
+
+def install(app, gauges=None) -> None:
+    """
+    Time Dash callback requests on app.server and add GET /metrics.
+    gauges: optional callable returning {name: number}, exported as zev_<name> (e.g. db.pool_stats).
+    """
+    from flask import Response, g, request
+
+    server = app.server
+
+    @server.before_request
+    def _start_timer():
+        if request.path.endswith("/_dash-update-component"):
+            g.zev_started = time.perf_counter()
+            _REQUEST.acc = {"rows": 0, "sql_seconds": 0.0, "queries": 0, "cache_hits": 0, "cache_misses": 0}
+
+    @server.after_request
+    def _record_response(response):
+        if "zev_started" in g:
+            g.zev_response = (response.calculate_content_length() or 0, response.status_code)
+        return response
+
+    # teardown_request also runs when the view raised, which after_request does not.
+    @server.teardown_request
+    def _stop_timer(exc):
+        started = g.pop("zev_started", None)
+        if started is None:
+            return
+        seconds = time.perf_counter() - started
+        acc = getattr(_REQUEST, "acc", None) or {}
+        _REQUEST.acc = None
+        output = _callback_id(request)
+        size, status = g.pop("zev_response", (0, 500))
+        with _LOCK:
+            _CALLBACK_SECONDS[output].observe(seconds)
+            _CALLBACK_ROWS[output] += acc.get("rows", 0)
+            _CALLBACK_BYTES[output] += size
+            if status >= 500:
+                _CALLBACK_ERRORS[output] += 1
+        if seconds * 1000 >= SLOW_CALLBACK_MS:
+            _slow_log({"kind": "callback", "output": output, "ms": round(seconds * 1000, 1),
+                       "bytes": size, "status": status, **acc})
+
+    @server.route("/metrics")
+    def _metrics():
+        return Response(render(gauges() if gauges else None), mimetype="text/plain; version=0.0.4")
+
+
+# ---------- exposition ----------
+def _label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", " ").replace('"', '\\"')
+
+
+def _histogram_lines(name: str, label: str, series: dict) -> list[str]:
+    lines = [f"# TYPE {name} histogram"]
+    for key, h in sorted(series.items()):
+        lab = f'{label}="{_label(key)}"'
+        for bound, n in zip(BUCKETS, h.buckets):
+            lines.append(f'{name}_bucket{{{lab},le="{bound}"}} {n}')
+        lines.append(f'{name}_bucket{{{lab},le="+Inf"}} {h.count}')
+        lines.append(f"{name}_sum{{{lab}}} {h.sum:.6f}")
+        lines.append(f"{name}_count{{{lab}}} {h.count}")
+    return lines
+
+
+def _counter_lines(name: str, label: str, series: dict) -> list[str]:
+    lines = [f"# TYPE {name} counter"]
+    lines += [f'{name}{{{label}="{_label(k)}"}} {v}' for k, v in sorted(series.items())]
+    return lines
+
+
+def render(gauges: dict | None = None) -> str:
+    with _LOCK:
+        lines = []
+        lines += _histogram_lines("zev_callback_duration_seconds", "output", _CALLBACK_SECONDS)
+        lines += _counter_lines("zev_callback_rows_read_total", "output", _CALLBACK_ROWS)
+        lines += _counter_lines("zev_callback_response_bytes_total", "output", _CALLBACK_BYTES)
+        lines += _counter_lines("zev_callback_errors_total", "output", _CALLBACK_ERRORS)
+        lines += _histogram_lines("zev_sql_duration_seconds", "query", _SQL_SECONDS)
+        lines += _counter_lines("zev_sql_rows_total", "query", _SQL_ROWS)
+        lines.append("# TYPE zev_sql_query_info gauge")
+        lines += [f'zev_sql_query_info{{query="{k}",sql="{_label(v[:300])}"}} 1' for k, v in sorted(_SQL_TEXT.items())]
+        lines.append("# TYPE zev_cache_requests_total counter")
+        lines += [f'zev_cache_requests_total{{cache="{_label(c)}",result="{r}"}} {n}'
+                  for (c, r), n in sorted(_CACHE.items())]
+    for name, value in (gauges or {}).items():
+        lines.append(f"# TYPE zev_{name} gauge")
+        lines.append(f"zev_{name} {value}")
+    return "\n".join(lines) + "\n"
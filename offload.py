@@ -0,0 +1,146 @@
+"""
+Run CPU-heavy callback bodies in a process pool so they do not hold a gunicorn worker's GIL.
+
+Functions decorated with @cpu_bound (compute.py) are sent to this worker's process pool when
+their DataFrame arguments have at least ZEV_OFFLOAD_MIN_ROWS rows, and run inline otherwise.
+The request thread only waits on a future, so when gunicorn runs the worker with several
+threads (GUNICORN_THREADS > 1), other users' callbacks on that worker keep running while one
+user's full-history heatmap is computed. A sync worker (one thread, the default of
+`gunicorn app:server`) serves nothing else while it waits, so there the pool is off by default.
+
+DataFrames go through shared memory: the arguments are pickled with protocol 5 and every
+contiguous array buffer is placed in its own SharedMemory block, which the pool process maps
+instead of copying. Results come back pickled (they are small: matrices, table rows, coordinates).
+
+    ZEV_OFFLOAD_PROCESSES   pool processes per gunicorn worker (default 2 with GUNICORN_THREADS > 1,
+                            else 0; 0 runs everything inline)
+    ZEV_OFFLOAD_MIN_ROWS    smallest input worth the round trip (default 20000 rows)
+
+Pool processes are started with "spawn" (safe from a threaded server) and import only the
+function's module, so @cpu_bound functions must live in modules without import-time side
+effects. Under `python app.py`, spawn also re-imports app.py in each pool process; leave
+ZEV_OFFLOAD_PROCESSES at 0 there.
+"""
+
+import functools
+import gc
+import importlib
+import logging
+import multiprocessing
+import os
+import pickle
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+logger = logging.getLogger(__name__)
+
+THREADED = int(os.getenv("GUNICORN_THREADS", "1")) > 1
+PROCESSES = int(os.getenv("ZEV_OFFLOAD_PROCESSES", "2" if THREADED else "0"))
+MIN_ROWS = int(os.getenv("ZEV_OFFLOAD_MIN_ROWS", "20000"))
+
+_REGISTRY = {}   # "module:qualname" -> undecorated function
+_LOCK = threading.Lock()
+_POOL = {"pid": None, "executor": None}
+_INLINE = False   # True inside pool processes and background callback jobs
+
+
+def run_inline() -> None:
+    """Run every @cpu_bound call in this process inline (pool processes, background callback jobs)."""
+    global _INLINE
+    _INLINE = True
+
+
+def _executor():
+    """This process's pool, created on first use (and again after a fork)."""
+    with _LOCK:
+        if _POOL["executor"] is None or _POOL["pid"] != os.getpid():
+            _POOL["executor"] = ProcessPoolExecutor(
+                max_workers=PROCESSES,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=run_inline,
+            )
+            _POOL["pid"] = os.getpid()
+        return _POOL["executor"]
+
+
+def _reset_pool() -> None:
+    with _LOCK:
+        executor, _POOL["executor"] = _POOL["executor"], None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _rows(args, kwargs) -> int:
+    return max((len(a) for a in (*args, *kwargs.values()) if hasattr(a, "columns")), default=0)
+
+
+# ---------- shared memory ----------
+def _pack(args, kwargs):
+    """Pickle (args, kwargs) with array buffers out of band, each copied into a SharedMemory block."""
+    buffers = []
+    payload = pickle.dumps((args, kwargs), protocol=5, buffer_callback=buffers.append)
+    blocks = []
+    try:
+        for buf in buffers:
+            raw = buf.raw()
+            shm = shared_memory.SharedMemory(create=True, size=max(raw.nbytes, 1))
+            shm.buf[:raw.nbytes] = raw
+            blocks.append((shm, raw.nbytes))
+    except Exception:
+        _release(blocks)
+        raise
+    return payload, blocks
+
+
+def _release(blocks) -> None:
+    for shm, _ in blocks:
+        shm.close()
+        shm.unlink()
+
+
+def _call_in_pool(key: str, payload: bytes, segments: list[tuple[str, int]]) -> bytes:
+    """Pool side: map the argument buffers, run the registered function, return its pickled result."""
+    importlib.import_module(key.split(":", 1)[0])   # registers the function
+    blocks = [shared_memory.SharedMemory(name=name) for name, _ in segments]
+    try:
+        args, kwargs = pickle.loads(payload, buffers=[shm.buf[:size] for shm, (_, size) in zip(blocks, segments)])
+        result = pickle.dumps(_REGISTRY[key](*args, **kwargs), protocol=5)
+        del args, kwargs
+        return result
+    finally:
+        gc.collect()
+        for shm in blocks:
+            try:
+                shm.close()
+            except BufferError:   # a view into the block is still referenced; freed with the process
+                pass
+
+
+def run(key: str, fn, args, kwargs):
+    """Run fn(*args, **kwargs) in the pool if it is enabled and the input is large enough."""
+    if PROCESSES <= 0 or _INLINE or _rows(args, kwargs) < MIN_ROWS:
+        return fn(*args, **kwargs)
+    payload, blocks = _pack(args, kwargs)
+    try:
+        future = _executor().submit(_call_in_pool, key, payload, [(shm.name, size) for shm, size in blocks])
+        return pickle.loads(future.result())
+    except BrokenProcessPool:
+        logger.warning("Offload pool broke while running %s; running inline", key, exc_info=True)
+        _reset_pool()
+        return fn(*args, **kwargs)
+    finally:
+        _release(blocks)
+
+
+def cpu_bound(fn):
+    """Register fn as a CPU-heavy body: calls go to the process pool for large inputs."""
+    key = f"{fn.__module__}:{fn.__qualname__}"
+    _REGISTRY[key] = fn
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        return run(key, fn, args, kwargs)
+
+    return wrapper
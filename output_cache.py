@@ -0,0 +1,149 @@
+"""
+Memoized callback outputs: figures and tables are rebuilt once per dataset version and
+filter combination, not once per page visit.
+
+@memoized(name, table, normalize) keys a callback's output on db.get_data_version(table) and
+its normalized inputs, e.g. the default "latest 30 days" view resolved to the dates it covers,
+so that view and the same dates picked by hand share one entry. Outputs are stored as Plotly
+JSON (what Dash would send) in an LRU bounded by entry count and bytes; a hit returns the
+parsed JSON, which Dash serializes back to the same response. An ETL load bumps the version
+and every entry built from the old data misses from then on; entries also expire after
+ZEV_OUTPUT_CACHE_TTL_SECONDS, so an output built while a load was failing does not stick.
+
+    ZEV_OUTPUT_CACHE_ENTRIES       most outputs kept per process (default 256)
+    ZEV_OUTPUT_CACHE_MB            most serialized bytes kept per process (default 64)
+    ZEV_OUTPUT_CACHE_TTL_SECONDS   entry lifetime (default 900)
+"""
+
+import datetime as dt
+import functools
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import pandas as pd
+from plotly.io.json import to_json_plotly
+
+from db import get_data_version
+from metrics import record_cache
+
+MAX_ENTRIES = int(os.getenv("ZEV_OUTPUT_CACHE_ENTRIES", "256"))
+MAX_BYTES = int(float(os.getenv("ZEV_OUTPUT_CACHE_MB", "64")) * 1024 * 1024)
+TTL_SECONDS = int(os.getenv("ZEV_OUTPUT_CACHE_TTL_SECONDS", "900"))
+DEFAULT_WINDOW_DAYS = 30
+
+_LOCK = threading.Lock()
+_ENTRIES = OrderedDict()   # key -> (stored_at, json)
+_STATE = {"bytes": 0, "evictions": 0}
+_WINDOWS = {}              # (name, version) -> (start, end) ISO dates of the default window
+_LOCAL = threading.local()   # .refresh: recompute and re-store instead of reading (warmup)
+
+
+def freeze(value):
+    """Hashable form of a callback input: lists become sorted tuples, empty values None."""
+    if isinstance(value, (list, tuple)):
+        return tuple(sorted(value, key=str)) if value else None
+    if value == "":
+        return None
+    return value
+
+
+def _get(key):
+    with _LOCK:
+        entry = _ENTRIES.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry[0] >= TTL_SECONDS:
+            _drop(key)
+            return None
+        _ENTRIES.move_to_end(key)
+        return entry[1]
+
+
+def _drop(key) -> None:
+    _, text = _ENTRIES.pop(key)
+    _STATE["bytes"] -= len(text)
+
+
+def _put(key, text: str) -> None:
+    if len(text) > MAX_BYTES:
+        return
+    with _LOCK:
+        if key in _ENTRIES:
+            _drop(key)
+        _ENTRIES[key] = (time.time(), text)
+        _STATE["bytes"] += len(text)
+        while len(_ENTRIES) > MAX_ENTRIES or _STATE["bytes"] > MAX_BYTES:
+            _drop(next(iter(_ENTRIES)))
+            _STATE["evictions"] += 1
+
+
+def clear() -> None:
+    with _LOCK:
+        _ENTRIES.clear()
+        _WINDOWS.clear()
+        _STATE["bytes"] = 0
+
+
+@contextmanager
+def refreshing():
+    """Within the block, memoized callbacks on this thread recompute and replace their entries."""
+    _LOCAL.refresh = True
+    try:
+        yield
+    finally:
+        _LOCAL.refresh = False
+
+
+def stats() -> dict:
+    with _LOCK:
+        return {"entries": len(_ENTRIES), "bytes": _STATE["bytes"], "evictions": _STATE["evictions"]}
+
+
+def memoized(name: str, table: str, normalize=None):
+    """
+    Cache a callback's output per (version of table, normalize(*args)).
+    normalize: inputs -> hashable key; defaults to freeze() of every argument. It must map two
+    inputs to the same key only if the callback returns the same output for both.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args):
+            inputs = normalize(*args) if normalize else tuple(freeze(a) for a in args)
+            key = (name, get_data_version(table), inputs)
+            if not getattr(_LOCAL, "refresh", False):
+                text = _get(key)
+                record_cache(f"output:{name}", text is not None)
+                if text is not None:
+                    return json.loads(text)
+            output = fn(*args)
+            _put(key, to_json_plotly(output))
+            return output
+
+        return wrapper
+
+    return decorator
+
+
+def default_window(name: str, table: str, load_dates) -> tuple[str | None, str | None]:
+    """
+    The pages' default "latest 30 days" window as ISO (start, end) dates, computed once per
+    dataset version. load_dates: () -> the page's date column (dates or datetimes).
+    """
+    version = get_data_version(table)
+    with _LOCK:
+        window = _WINDOWS.get((name, version))
+    if window is None:
+        latest = pd.to_datetime(load_dates(), errors="coerce").max()
+        if pd.isna(latest):
+            window = (None, None)
+        else:
+            latest = latest.normalize()
+            window = ((latest - dt.timedelta(days=DEFAULT_WINDOW_DAYS - 1)).date().isoformat(),
+                      latest.date().isoformat())
+        with _LOCK:
+            _WINDOWS[(name, version)] = window
+    return window
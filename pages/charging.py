@@ -3,7 +3,11 @@ import dash_bootstrap_components as dbc
 import pandas as pd
 import plotly.express as px
 import time
-from db import engine
+from db import get_data_version, read_copy
+from frames import DateIndexedFrame
+from metrics import record_cache
+from output_cache import DEFAULT_WINDOW_DAYS, default_window, freeze, memoized
+from profiling import profiled
 from utils import charger_type_map
 from styles import DROPDOWN_STYLE, DARK_BG, GRID_COLOR, TEXT_COLOR, empty_fig
 
@@ -12,14 +16,24 @@ register_page(__name__, path="/charging", name="Charging")
 LOCAL_TZ = "America/New_York"
 TIMESTAMP_COLS = ["connect_time", "disconnect_time", "refuel_start", "refuel_end"]
 CACHE_TTL_SECONDS = 300
-_CHARGING_CACHE = {"ts": 0.0, "df": None}
+FILTER_KEYS = ("fleet_name", "charger_type")
+_CHARGING_CACHE = {"ts": 0.0, "frame": None, "version": None}
 
 
-def load_charging_data():
+@profiled()
+def load_charging_frame():
+    """Charging sessions sorted by event date, indexed by FILTER_KEYS (frames.DateIndexedFrame)."""
     now = time.time()
-    cached_df = _CHARGING_CACHE["df"]
-    if cached_df is not None and now - _CHARGING_CACHE["ts"] < CACHE_TTL_SECONDS:
-        return cached_df.copy()
+    version = get_data_version("refuel_inf")
+    cached = _CHARGING_CACHE["frame"]
+    if (
+        cached is not None
+        and now - _CHARGING_CACHE["ts"] < CACHE_TTL_SECONDS
+        and _CHARGING_CACHE["version"] == version
+    ):
+        record_cache("charging", True)
+        return cached
+    record_cache("charging", False)
 
     query = """
         SELECT r.*, c.charger_type, f.fleet_name
@@ -27,7 +41,9 @@ def load_charging_data():
         JOIN charger c ON r.charger_id = c.id
         JOIN fleet f ON c.fleet_id = f.id
     """
-    df = pd.read_sql(query, engine)
+    df = read_copy(
+        query, dtypes={"charger_type": str, "fleet_name": str}, parse_dates=TIMESTAMP_COLS
+    )
 
     for col in TIMESTAMP_COLS:
         df[col] = pd.to_datetime(df[col], errors="coerce")
@@ -47,12 +63,13 @@ def load_charging_data():
     df["charger_type"] = df["charger_type"].map(charger_type_map).fillna(df["charger_type"])
 
     # Robust event date: charge_start_time fallback to charge_end_time.
-    date_series = df["charge_start_time"].copy().fillna(df["charge_end_time"])
-    df["date"] = date_series.dt.date
+    df["date"] = df["charge_start_time"].fillna(df["charge_end_time"])
 
-    _CHARGING_CACHE["df"] = df
+    frame = DateIndexedFrame(df, keys=FILTER_KEYS, name="charging")
+    _CHARGING_CACHE["frame"] = frame
     _CHARGING_CACHE["ts"] = now
-    return df.copy()
+    _CHARGING_CACHE["version"] = version
+    return frame
 
 
 def _daily_mean(df, col):
@@ -92,29 +109,18 @@ def _hourly_start_end_distribution(df):
     return pd.concat(out, ignore_index=True) if out else None
 
 
-def _apply_filters(df, fleet_val, charger_val, start_date, end_date):
-    if fleet_val:
-        df = df[df["fleet_name"] == fleet_val]
-    if charger_val:
-        df = df[df["charger_type"] == charger_val]
-    if start_date:
-        df = df[df["date"] >= pd.to_datetime(start_date).date()]
-    if end_date:
-        df = df[df["date"] <= pd.to_datetime(end_date).date()]
-    return df
-
-
-def _default_last_30_days(df):
-    if df.empty:
-        return df
+def _apply_filters(frame, fleet_val, charger_val, start_date, end_date):
+    """Sessions matching the filters; the latest 30 days when none is set."""
+    if not any([fleet_val, charger_val, start_date, end_date]):
+        return frame.latest(DEFAULT_WINDOW_DAYS)
+    return frame.select({"fleet_name": fleet_val, "charger_type": charger_val}, start_date, end_date)
 
-    date_as_dt = pd.to_datetime(df["date"], errors="coerce")
-    latest = date_as_dt.max()
-    if pd.isna(latest):
-        return df
 
-    earliest = latest - pd.Timedelta(days=29)
-    return df[(date_as_dt >= earliest) & (date_as_dt <= latest)]
+def _filter_key(fleet_val, charger_val, start_date, end_date):
+    """Memo key for the filter inputs; the default view is keyed by the window it shows."""
+    if not any([fleet_val, charger_val, start_date, end_date]):
+        start_date, end_date = default_window("charging", "refuel_inf", lambda: load_charging_frame().df["date"])
+    return freeze(fleet_val), freeze(charger_val), freeze(start_date), freeze(end_date)
 
 
 def _hourly_start_end_counts(hourly_dist):
@@ -196,17 +202,18 @@ layout = html.Div([
     Output("summary-table-charging", "children"),
     Input("summary-table-charging", "id"),
 )
+@memoized("charging_summary", "refuel_inf")
 def update_summary(_):
     header_style = {"padding": "0.3rem 0.45rem", "fontSize": "0.82rem", "whiteSpace": "nowrap"}
     cell_style = {"padding": "0.22rem 0.45rem", "fontSize": "0.82rem", "lineHeight": "1.15"}
 
-    df = load_charging_data()
+    df = load_charging_frame().df
     kpi1 = len(df)
     kpi2 = round(df["tot_energy"].mean(), 2) if not df.empty else 0
     kpi3 = round(df["charging_duration"].mean(), 2) if not df.empty else 0
     kpi4 = round(df["connecting_duration"].mean(), 2) if not df.empty else 0
 
-    summary = df.groupby(["fleet_name", "charger_type"]).agg(
+    summary = df.groupby(["fleet_name", "charger_type"], observed=True).agg(
         Events=("id", "count"),
         Energy_kWh=("tot_energy", "sum"),
         Avg_Charging_Min=("charging_duration", "mean"),
@@ -258,7 +265,7 @@ def _render_charging_summary_table(summary, col_name_map, header_style, cell_sty
     Input("fleet-filter", "id"),
 )
 def populate_fleet_options(_):
-    df = load_charging_data()
+    df = load_charging_frame().df
     fleets = sorted(df["fleet_name"].dropna().unique())
     return [{"label": f, "value": f} for f in fleets]
 
@@ -268,7 +275,7 @@ def populate_fleet_options(_):
     Input("charger-filter", "id"),
 )
 def populate_charger_options(_):
-    df = load_charging_data()
+    df = load_charging_frame().df
     types = sorted(df["charger_type"].dropna().unique())
     return [{"label": t, "value": t} for t in types]
 
@@ -280,6 +287,7 @@ def populate_charger_options(_):
     Input("date-range-picker", "start_date"),
     Input("date-range-picker", "end_date"),
 )
+@memoized("charging_filtered_summary", "refuel_inf", normalize=_filter_key)
 def update_filtered_summary(fleet_val, charger_val, start_date, end_date):
     header_style = {"padding": "0.3rem 0.45rem", "fontSize": "0.82rem", "whiteSpace": "nowrap"}
     cell_style = {"padding": "0.22rem 0.45rem", "fontSize": "0.82rem", "lineHeight": "1.15"}
@@ -294,12 +302,9 @@ def update_filtered_summary(fleet_val, charger_val, start_date, end_date):
         "Avg_SOC_Gain": "Avg SOC Gain (%)",
     }
 
-    df = load_charging_data()
-    if not any([fleet_val, charger_val, start_date, end_date]) and not df.empty:
-        df = _default_last_30_days(df)
-    df = _apply_filters(df, fleet_val, charger_val, start_date, end_date)
+    df = _apply_filters(load_charging_frame(), fleet_val, charger_val, start_date, end_date)
 
-    summary = df.groupby(["fleet_name", "charger_type"]).agg(
+    summary = df.groupby(["fleet_name", "charger_type"], observed=True).agg(
         Events=("id", "count"),
         Energy_kWh=("tot_energy", "sum"),
         Avg_Charging_Min=("charging_duration", "mean"),
@@ -331,14 +336,11 @@ def update_filtered_summary(fleet_val, charger_val, start_date, end_date):
     Input("date-range-picker", "start_date"),
     Input("date-range-picker", "end_date"),
 )
+@memoized("charging_figures", "refuel_inf", normalize=_filter_key)
+@profiled("charging.update_figures")
 def update_figures(fleet_val, charger_val, start_date, end_date):
-    df = load_charging_data()
-
     # Auto-limit to latest 30 days if nothing is selected.
-    if not any([fleet_val, charger_val, start_date, end_date]) and not df.empty:
-        df = _default_last_30_days(df)
-
-    df = _apply_filters(df, fleet_val, charger_val, start_date, end_date)
+    df = _apply_filters(load_charging_frame(), fleet_val, charger_val, start_date, end_date)
 
     figs = []
 
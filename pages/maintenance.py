@@ -4,12 +4,18 @@ import dash_bootstrap_components as dbc
 import pandas as pd
 import numpy as np
 import plotly.express as px
-from db import engine
+from compute import avg_miles_between_services, compute_fleet_table
+from db import read_copy
+from frames import DateIndexedFrame, latest_days
+from output_cache import DEFAULT_WINDOW_DAYS, freeze, memoized
+from profiling import profiled
 from styles import DROPDOWN_STYLE, DARK_BG, GRID_COLOR, TEXT_COLOR, empty_fig
 
 register_page(__name__, path="/maintenance", name="Maintenance")
+DEFAULT_ASSET_TYPE = "vehicle"
 
 # ---------- Data load ----------
+@profiled()
 def load_maintenance():
     query = """
         SELECT
@@ -26,7 +32,7 @@ def load_maintenance():
         LEFT JOIN charger c ON m.charger_id = c.id
         LEFT JOIN fleet   f2 ON c.fleet_id = f2.id
     """
-    df = pd.read_sql(query, engine)
+    df = read_copy(query, dtypes={"fleet_vehicle_id": str, "charger": str, "maint_categ": str})
 
     # Resolve fleet info (maintenance can come via vehicle or charger)
     df["fleet_id"] = df["v_fleet_id"].fillna(df["c_fleet_id"])
@@ -59,7 +65,7 @@ def load_maintenance():
     df["warranty_bucket"] = df["warranty"].map({True: "Yes", False: "No"}).fillna("No")
 
     # Category (stringify for safety)
-    df["maint_categ"] = df["maint_categ"].astype(str).replace({"None": np.nan}).fillna("Unspecified")
+    df["maint_categ"] = df["maint_categ"].astype(str).replace({"None": np.nan, "nan": np.nan}).fillna("Unspecified")
 
     # Odometer for KPI
     for col in ["enter_odo", "exit_odo"]:
@@ -68,30 +74,14 @@ def load_maintenance():
     return df
 
 
-_df = load_maintenance()
-
-# ---------- KPI helpers ----------
-def avg_miles_between_services(df_scope: pd.DataFrame) -> float:
-    """
-    Per-vehicle: sort by date, diff positive enter_odo; mean per vehicle; then global mean of those means.
-    """
-    if df_scope.empty:
-        return float("nan")
-    # Only rows with vehicle_id and enter_odo + date
-    d = df_scope.dropna(subset=["veh_id", "enter_odo", "date"]).copy()
-    if d.empty:
-        return float("nan")
-
-    def per_vehicle_avg(g):
-        g = g.sort_values("date")
-        deltas = g["enter_odo"].diff()
-        deltas = deltas[deltas > 0]
-        return deltas.mean() if len(deltas) else np.nan
-
-    per_veh = d.groupby("veh_id", dropna=True).apply(per_vehicle_avg)
-    per_veh = per_veh.dropna()
-    return float(per_veh.mean()) if len(per_veh) else float("nan")
-
+# Events sorted by date with row positions per fleet, asset id and asset type, for the filters.
+_frame = DateIndexedFrame(load_maintenance(), keys=("fleet_name", "veh_id", "charger_id"), name="maintenance")
+_df = _frame.df
+_frame.add_group("asset_type", {
+    "vehicle": _df["veh_id"].notna(),
+    # includes station-level charger rows tagged by maint_ob == 2
+    "charger": _df["charger_id"].notna() | (_df["maint_ob"] == 2),
+})
 
 # ---------- Block 1 (GLOBAL, not filter-aware) ----------
 def kpi_block_global(df_all: pd.DataFrame):
@@ -127,64 +117,6 @@ def kpi_block_global(df_all: pd.DataFrame):
 
 
 # ---------- Block 2 (Fleet table – filter-aware) ----------
-def compute_fleet_table(df_scope: pd.DataFrame) -> pd.DataFrame:
-    if df_scope.empty:
-        return pd.DataFrame(columns=[
-            "Fleet", "Asset type", "Events",
-            "Total cost", "Avg total cost", "Avg parts cost", "Avg labor cost", "Avg added cost",
-            "Avg miles between services"
-        ])
-
-    # Cost-valid subset: all three costs present
-    valid_cost_mask = df_scope[["parts_cost", "labor_cost", "add_cost"]].notna().all(axis=1)
-    df_cost = df_scope[valid_cost_mask].copy()
-    df_cost["total_cost"] = df_cost["parts_cost"] + df_cost["labor_cost"] + df_cost["add_cost"]
-
-    # Avg miles between services per fleet
-    def fleet_avg_miles(g):
-        return avg_miles_between_services(g)
-
-    grp = df_scope.groupby("fleet_name", dropna=False)
-
-    rows = []
-    for fleet, g in grp:
-        fleet_name = fleet if pd.notna(fleet) else "Unspecified"
-        # Vehicle row
-        g_vehicle = g[g["veh_id"].notna()]
-        g_vehicle_cost = df_cost[(df_cost["fleet_name"] == fleet) & (df_cost["veh_id"].notna())]
-        rows.append({
-            "Fleet": fleet_name,
-            "Asset type": "Vehicle",
-            "Events": len(g_vehicle),
-            "Total cost": float(g_vehicle_cost["total_cost"].sum()) if not g_vehicle_cost.empty else np.nan,
-            "Avg total cost": float(g_vehicle_cost["total_cost"].mean()) if not g_vehicle_cost.empty else np.nan,
-            "Avg parts cost": float(g_vehicle_cost["parts_cost"].mean()) if not g_vehicle_cost.empty else np.nan,
-            "Avg labor cost": float(g_vehicle_cost["labor_cost"].mean()) if not g_vehicle_cost.empty else np.nan,
-            "Avg added cost": float(g_vehicle_cost["add_cost"].mean()) if not g_vehicle_cost.empty else np.nan,
-            "Avg miles between services": fleet_avg_miles(g_vehicle),
-        })
-
-        # Charger row (includes station-level charger rows tagged by maint_ob == 2)
-        g_charger = g[(g["charger_id"].notna()) | (g["maint_ob"] == 2)]
-        g_charger_cost = df_cost[(df_cost["fleet_name"] == fleet) & ((df_cost["charger_id"].notna()) | (df_cost["maint_ob"] == 2))]
-        rows.append({
-            "Fleet": fleet_name,
-            "Asset type": "Charger",
-            "Events": len(g_charger),
-            "Total cost": float(g_charger_cost["total_cost"].sum()) if not g_charger_cost.empty else np.nan,
-            "Avg total cost": float(g_charger_cost["total_cost"].mean()) if not g_charger_cost.empty else np.nan,
-            "Avg parts cost": float(g_charger_cost["parts_cost"].mean()) if not g_charger_cost.empty else np.nan,
-            "Avg labor cost": float(g_charger_cost["labor_cost"].mean()) if not g_charger_cost.empty else np.nan,
-            "Avg added cost": float(g_charger_cost["add_cost"].mean()) if not g_charger_cost.empty else np.nan,
-            "Avg miles between services": np.nan,
-        })
-
-    out = pd.DataFrame(rows)
-    out["asset_order"] = out["Asset type"].map({"Vehicle": 0, "Charger": 1}).fillna(99)
-    out = out.sort_values(["Fleet", "asset_order"], na_position="last").drop(columns=["asset_order"])
-    return out
-
-
 def _fmt_int(val):
     return "n/a" if pd.isna(val) else f"{int(round(float(val))):,}"
 
@@ -265,9 +197,14 @@ def render_fleet_table(tbl: pd.DataFrame):
     )
 
 
-def fleet_table_component(component_id, df_scope):
-    initial_tbl = compute_fleet_table(df_scope)
-    return html.Div(id=component_id, children=render_fleet_table(initial_tbl))
+@memoized("maintenance_layout", "maintenance")
+def layout_blocks():
+    """Block 1 KPIs, the all-data fleet table and the initial filtered table; the same for every visit."""
+    return [
+        kpi_block_global(_df),
+        render_fleet_table(compute_fleet_table(_df)),
+        render_fleet_table(compute_fleet_table(latest_days(_df, DEFAULT_WINDOW_DAYS))),
+    ]
 
 
 # ---------- Block 3 (Pies + Filters) ----------
@@ -310,13 +247,15 @@ def layout():
         _df[["fleet_name"]].dropna().drop_duplicates().sort_values("fleet_name")["fleet_name"].tolist()
     )
 
+    kpi_block, fleet_table_all, fleet_table_latest = layout_blocks()
+
     return dbc.Container([
         # html.H2("Maintenance"),
-        html.Div(kpi_block_global(_df), className="mb-4"),
+        html.Div(kpi_block, className="mb-4"),
 
         # Block 2A: Fleet table (all data)
         html.H4("Maintenance Summary by Fleet and Asset Type"),
-        fleet_table_component("maint-fleet-table-all", _df),
+        html.Div(id="maint-fleet-table-all", children=fleet_table_all),
         html.Hr(),
 
         # Filters
@@ -340,7 +279,7 @@ def layout():
                         id="maint-filter-asset-type",
                         options=[{"label": "Vehicle", "value": "vehicle"},
                                 {"label": "Charger", "value": "charger"}],
-                        value="vehicle",
+                        value=DEFAULT_ASSET_TYPE,
                         labelStyle={"display": "block", "margin-bottom": "4px"}  # vertical layout with spacing
                     )
                 ], md=2),
@@ -378,7 +317,7 @@ def layout():
         # Block 2B: Fleet table (filtered)
         html.H4("Filtered Maintenance Summary"),
         html.P("Applies current filters. Default view (no fleet/asset/date filter selected) shows the latest 30 days.", style={"color": TEXT_COLOR}),
-        fleet_table_component("maint-fleet-table-filtered", _latest_30_days_scope(_df)),
+        html.Div(id="maint-fleet-table-filtered", children=fleet_table_latest),
         html.Hr(),
         
         # Block 3: Pies
@@ -398,13 +337,8 @@ def layout():
     Input("maint-filter-fleet", "value"),
 )
 def populate_asset_ids(asset_type, fleets_sel):
-    df = _df
     # Filter to selected fleets (optional). If empty/None, show ALL IDs across fleets (per spec).
-    if fleets_sel:
-        if isinstance(fleets_sel, list):
-            df = df[df["fleet_name"].isin(fleets_sel)]
-        else:
-            df = df[df["fleet_name"] == fleets_sel]
+    df = _frame.select({"fleet_name": fleets_sel})
 
     if asset_type == "vehicle":
         opts = (
@@ -424,45 +358,21 @@ def populate_asset_ids(asset_type, fleets_sel):
     return opts
 
 
-def apply_filters(df, fleets_sel, asset_type, asset_ids, start_date, end_date):
-    d = df.copy()
-
-    # Fleet filter (optional)
-    if fleets_sel:
-        if isinstance(fleets_sel, list):
-            d = d[d["fleet_name"].isin(fleets_sel)]
-        else:
-            d = d[d["fleet_name"] == fleets_sel]
-
-    # Asset type + IDs (optional)
+def apply_filters(frame, fleets_sel, asset_type, asset_ids, start_date, end_date):
+    # Fleet filter (optional); asset type + IDs (optional); date range (uses m.date)
+    filters = {"fleet_name": fleets_sel}
     if asset_type == "vehicle":
-        d = d[d["veh_id"].notna()]
-        if asset_ids:
-            d = d[d["veh_id"].isin(asset_ids)]
+        filters.update(asset_type=asset_type, veh_id=asset_ids)
     elif asset_type == "charger":
-        d = d[(d["charger_id"].notna()) | (d["maint_ob"] == 2)]
-        if asset_ids:
-            d = d[d["charger_id"].isin(asset_ids)]
+        filters.update(asset_type=asset_type, charger_id=asset_ids)
+    return frame.select(filters, start_date, end_date)
 
-    # Date range (uses m.date)
-    if start_date:
-        d = d[d["date"] >= pd.to_datetime(start_date)]
-    if end_date:
-        d = d[d["date"] <= pd.to_datetime(end_date)]
 
-    return d
-
-
-def _latest_30_days_scope(df):
-    if df.empty:
-        return df
-    latest = pd.to_datetime(df["date"], errors="coerce").max()
-    if pd.isna(latest):
-        return df
-    earliest = latest - pd.Timedelta(days=29)
-    d = df.copy()
-    date_dt = pd.to_datetime(d["date"], errors="coerce")
-    return d[(date_dt >= earliest) & (date_dt <= latest)]
+def _filter_key(fleets_sel, asset_type, asset_ids, start_date, end_date):
+    """Memo key for the filter inputs: a single asset id and a one-item list are the same filter."""
+    if asset_ids and not isinstance(asset_ids, list):
+        asset_ids = [asset_ids]
+    return tuple(freeze(v) for v in (fleets_sel, asset_type, asset_ids, start_date, end_date))
 
 
 @callback(
@@ -476,15 +386,17 @@ def _latest_30_days_scope(df):
     Input("maint-filter-daterange", "start_date"),
     Input("maint-filter-daterange", "end_date"),
 )
+@memoized("maintenance_blocks", "maintenance", normalize=_filter_key)
+@profiled()
 def update_block2_block3(fleets_sel, asset_type, asset_ids, start_date, end_date):
     # Normalize asset_ids to list
     if asset_ids and not isinstance(asset_ids, list):
         asset_ids = [asset_ids]
 
-    d = apply_filters(_df, fleets_sel, asset_type, asset_ids, start_date, end_date)
+    d = apply_filters(_frame, fleets_sel, asset_type, asset_ids, start_date, end_date)
     d_table = d
     if not any([fleets_sel, asset_ids, start_date, end_date]):
-        d_table = _latest_30_days_scope(d_table)
+        d_table = latest_days(d_table, DEFAULT_WINDOW_DAYS)
 
     # ---- Block 2: Fleet table ----
     tbl = compute_fleet_table(d_table)
@@ -496,16 +408,16 @@ def update_block2_block3(fleets_sel, asset_type, asset_ids, start_date, end_date
 
     # ---- Block 3: Pies ----
     # Category
-    cat_counts = d.groupby("maint_categ", dropna=False).size().reset_index(name="count").rename(columns={"maint_categ": "label"})
+    cat_counts = d.groupby("maint_categ", dropna=False, observed=True).size().reset_index(name="count").rename(columns={"maint_categ": "label"})
     cat_counts = group_small_slices(cat_counts, "label", "count", threshold=0.01)
     fig_cat = make_pie("By Category", labels=cat_counts["label"], values=cat_counts["count"]) if not cat_counts.empty else empty_fig("By Category")
 
     # Warranty
-    war_counts = d.groupby("warranty_bucket", dropna=False).size().reset_index(name="count").rename(columns={"warranty_bucket": "label"})
+    war_counts = d.groupby("warranty_bucket", dropna=False, observed=True).size().reset_index(name="count").rename(columns={"warranty_bucket": "label"})
     fig_war = make_pie("By Warranty", labels=war_counts["label"], values=war_counts["count"]) if not war_counts.empty else empty_fig("By Warranty")
 
     # Maintenance location
-    loc_counts = d.groupby("maint_loc_bucket", dropna=False).size().reset_index(name="count").rename(columns={"maint_loc_bucket": "label"})
+    loc_counts = d.groupby("maint_loc_bucket", dropna=False, observed=True).size().reset_index(name="count").rename(columns={"maint_loc_bucket": "label"})
     fig_loc = make_pie("By Maintenance Location", labels=loc_counts["label"], values=loc_counts["count"]) if not loc_counts.empty else empty_fig("By Maintenance Location")
 
     return fleet_table_ui, fig_cat, fig_war, fig_loc
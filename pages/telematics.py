@@ -1,8 +1,12 @@
-from dash import register_page, html, dcc, callback, Input, Output
+from dash import register_page, html, dcc, callback, Input, Output, set_props
+from dash.exceptions import PreventUpdate
 import dash_leaflet as dl
 import dash_bootstrap_components as dbc
 import pandas as pd
-from db import engine
+import background
+from compute import trajectory_coords
+from db import engine, read_copy, read_sql
+from profiling import profiled
 from sqlalchemy import text
 from styles import DROPDOWN_STYLE, DARK_BG, TEXT_COLOR
 import json
@@ -49,6 +53,19 @@ def latest_month_bounds(engine):
 
 start_d, end_d = latest_month_bounds(engine)
 
+
+def telematics_source(engine):
+    """veh_tel_all (raw + downsampled archive, sql/setup_veh_tel_archive.sql) if present, else veh_tel."""
+    try:
+        df = pd.read_sql("SELECT to_regclass('public.veh_tel_all') IS NOT NULL AS has_archive", engine)
+        return "veh_tel_all" if bool(df.iloc[0]["has_archive"]) else "veh_tel"
+    except Exception as e:
+        print(f"Error checking telematics archive: {e}")
+        return "veh_tel"
+
+
+TEL_SOURCE = telematics_source(engine)
+
 # ---------- Load Map Layers ----------
 # Load PA boundary
 with open("assets/pa_boundary.geojson") as f:
@@ -119,6 +136,9 @@ layout = html.Div([
             
             html.Div(style={"height": "25px"}),
             
+            dbc.Progress(id="telematics-progress", value=0, striped=True, animated=True,
+                         style={"visibility": "hidden"}),
+
             html.H5("Filtered Summary", style={"color": TEXT_COLOR}),
             html.P("Applies current filters and date range. Default view shows the latest 30 days.", style={"color": TEXT_COLOR, "marginBottom": "8px"}),
             html.Div(
@@ -166,7 +186,7 @@ layout = html.Div([
 def populate_fleet_dropdown(_):
     """Load all fleet names for the dropdown."""
     try:
-        df = pd.read_sql("SELECT fleet_name FROM fleet ORDER BY fleet_name", engine)
+        df = read_sql("SELECT fleet_name FROM fleet ORDER BY fleet_name", query_class="kpi")
         return [{"label": f, "value": f} for f in df["fleet_name"]]
     except Exception as e:
         print(f"Error loading fleets: {e}")
@@ -191,7 +211,7 @@ def populate_vehicle_dropdown(fleet_name):
             WHERE f.fleet_name = %s
             ORDER BY v.fleet_vehicle_id
         """
-        df = pd.read_sql(query, engine, params=(fleet_name,))
+        df = read_sql(query, params=(fleet_name,), query_class="kpi")
         options = [{"label": vid, "value": vid} for vid in df["fleet_vehicle_id"]]
         return options, None  # Reset vehicle selection
     except Exception as e:
@@ -199,6 +219,15 @@ def populate_vehicle_dropdown(fleet_name):
         return [], None
 
 
+KPI_ROLLUP_SQL = """
+    SELECT sum(avg_speed * n_speed) / NULLIF(sum(n_speed), 0) AS avg_speed,
+           max(max_speed) AS max_speed,
+           sum(n_points) AS points
+    FROM veh_tel_hourly
+"""
+KPI_RAW_SQL = f"SELECT avg(speed) AS avg_speed, max(speed) AS max_speed, count(*) AS points FROM {TEL_SOURCE}"
+
+
 @callback(
     Output("kpi-avg-speed", "children"),
     Output("kpi-max-speed", "children"),
@@ -208,60 +237,128 @@ def populate_vehicle_dropdown(fleet_name):
 def update_kpis(_):
     """Update KPIs based on ALL telematics data (not filtered)."""
     try:
-        df = pd.read_sql("SELECT speed FROM veh_tel", engine)
-        if df.empty:
+        try:
+            df = read_sql(KPI_ROLLUP_SQL, query_class="kpi")
+        except Exception:
+            # Rollup not set up (sql/setup_veh_tel_hourly.sql); fall back to raw points, a full
+            # scan that needs the export timeout rather than the 5 s KPI one.
+            df = read_sql(KPI_RAW_SQL, query_class="export")
+        r = df.iloc[0]
+        if not r.points:
             return "0", "0", "0"
-        
-        avg_speed = round(df["speed"].mean(), 2)
-        max_speed = round(df["speed"].max(), 2)
-        points = len(df)
-        return f"{avg_speed:,.2f}", f"{max_speed:,.2f}", f"{points:,}"
+
+        avg_speed = f"{float(r.avg_speed):,.2f}" if pd.notna(r.avg_speed) else "n/a"
+        max_speed = f"{float(r.max_speed):,.2f}" if pd.notna(r.max_speed) else "n/a"
+        return avg_speed, max_speed, f"{int(r.points):,}"
     except Exception as e:
         print(f"Error updating KPIs: {e}")
         return "Error", "Error", "Error"
 
 
-@callback(
-    Output("traj-layer", "children"),
-    Output("summary-table-telematics", "children"),
+def _timestamp_bounds(start_date, end_date):
+    """Date-picker strings -> UTC [start, end) datetimes; the end date is included in full."""
+    start = pd.Timestamp(start_date, tz="UTC").to_pydatetime() if start_date else None
+    end = (pd.Timestamp(end_date, tz="UTC") + pd.Timedelta(days=1)).to_pydatetime() if end_date else None
+    return start, end
+
+
+def _filter_sql(fleet_name, vehicle_id, start_date, end_date, time_col):
+    """
+    WHERE clause with only the filters that are set. Time bounds are timestamptz
+    literals so the planner prunes veh_tel's monthly partitions.
+    """
+    conditions = ["TRUE"]
+    params = {}
+    if fleet_name:
+        conditions.append("f.fleet_name = %(fleet_name)s")
+        params["fleet_name"] = fleet_name
+    if vehicle_id:
+        conditions.append("v.fleet_vehicle_id = %(vehicle_id)s")
+        params["vehicle_id"] = vehicle_id
+    start_ts, end_ts = _timestamp_bounds(start_date, end_date)
+    if start_ts is not None:
+        conditions.append(f"{time_col} >= %(start)s")
+        params["start"] = start_ts
+    if end_ts is not None:
+        conditions.append(f"{time_col} < %(end)s")
+        params["end"] = end_ts
+    return " AND ".join(conditions), params
+
+
+def _rollup_summary(fleet_name, vehicle_id, start_date, end_date):
+    """Moving hours and odometer distance for the filters, from veh_tel_hourly (None if unavailable)."""
+    where, params = _filter_sql(fleet_name, vehicle_id, start_date, end_date, "h.hour")
+    query = f"""
+        WITH per_vehicle AS (
+            SELECT h.veh_id,
+                   sum(h.moving_seconds) AS moving_seconds,
+                   max(h.last_mileage) - min(h.first_mileage) AS distance
+            FROM veh_tel_hourly h
+            JOIN vehicle v ON h.veh_id = v.id
+            JOIN fleet f ON v.fleet_id = f.id
+            WHERE {where}
+            GROUP BY h.veh_id
+        )
+        SELECT sum(moving_seconds) / 3600.0 AS moving_hours, sum(distance) AS distance
+        FROM per_vehicle;
+    """
+    try:
+        r = read_sql(
+            query, params=params, query_class="kpi"
+        ).iloc[0]
+    except Exception:
+        return None, None
+    return r.moving_hours, r.distance
+
+
+MAP_INPUTS = [
     Input("fleet-dropdown-telematics", "value"),
     Input("vehicle-dropdown-telematics", "value"),
     Input("date-picker-telematics", "start_date"),
     Input("date-picker-telematics", "end_date"),
+]
+
+
+@callback(
+    Output("traj-layer", "children"),
+    Output("summary-table-telematics", "children"),
+    *MAP_INPUTS,
+    **background.options(MAP_INPUTS, progress_bar="telematics-progress"),
 )
-def update_map_and_summary(fleet_name, vehicle_id, start_date, end_date):
+@background.job
+@profiled()
+def update_map_and_summary(set_progress, fleet_name, vehicle_id, start_date, end_date):
     """
     Update map trajectories and summary table based on filters.
     Default: show all fleets for latest one month.
     Each fleet uses its pre-assigned color from FLEET_COLOR_MAP.
+    Runs as a background callback (background.py): all fleets over a wide range takes a while.
     """
+    set_progress((10, "Querying telematics"))
     
-    # Build query with filters
-    query = """
+    where, params = _filter_sql(fleet_name, vehicle_id, start_date, end_date, "t.timestamp")
+    query = f"""
         SELECT t.timestamp, t.latitude, t.longitude, t.speed,
                f.fleet_name, v.fleet_vehicle_id
-        FROM veh_tel t
+        FROM {TEL_SOURCE} t
         JOIN vehicle v ON t.veh_id = v.id
         JOIN fleet f ON v.fleet_id = f.id
-        WHERE (%(fleet_name)s IS NULL OR f.fleet_name = %(fleet_name)s)
-            AND (%(vehicle_id)s IS NULL OR v.fleet_vehicle_id = %(vehicle_id)s)
-            AND (%(start)s IS NULL OR t.timestamp >= %(start)s)
-            AND (%(end)s   IS NULL OR t.timestamp <= %(end)s)
+        WHERE {where}
         ORDER BY v.fleet_id, v.id, t.timestamp;
     """
-    params = dict(
-        fleet_name=fleet_name,
-        vehicle_id=vehicle_id,
-        start=start_date,
-        end=end_date,
-    )
 
     try:
-        df = pd.read_sql(query, engine, params=params)
+        df = read_copy(
+            query, params=params,
+            dtypes={"fleet_name": str, "fleet_vehicle_id": str}, parse_dates=["timestamp"],
+            query_class="background",
+        )
     except Exception as e:
+        # Shown through set_props and not returned, so the error is not cached as this view's output.
         print(f"Error querying telematics data: {e}")
-        error_msg = html.Div(f"Error loading data: {str(e)}", style={"color": "red"})
-        return [], error_msg
+        set_props("summary-table-telematics",
+                  {"children": html.Div(f"Error loading data: {str(e)}", style={"color": "red"})})
+        raise PreventUpdate
 
     if df.empty:
         no_data_msg = html.Div(
@@ -280,6 +377,7 @@ def update_map_and_summary(fleet_name, vehicle_id, start_date, end_date):
         return [], no_data_msg
 
     df["timestamp"] = pd.to_datetime(df["timestamp"])
+    set_progress((60, f"Summarizing {len(df):,} points"))
     
     # Build summary table
     def _na(v):
@@ -297,6 +395,11 @@ def update_map_and_summary(fleet_name, vehicle_id, start_date, end_date):
         ["Avg Speed (mph)", _na(f"{df['speed'].mean():.2f}" if pd.notna(df['speed'].mean()) else None)],
         ["Max Speed (mph)", _na(f"{df['speed'].max():.2f}" if pd.notna(df['speed'].max()) else None)],
     ]
+    moving_hours, distance = _rollup_summary(fleet_name, vehicle_id, start_date, end_date)
+    if moving_hours is not None and pd.notna(moving_hours):
+        summary_data.append(["Moving Time (h)", f"{float(moving_hours):,.1f}"])
+    if distance is not None and pd.notna(distance):
+        summary_data.append(["Odometer Distance (mi)", f"{float(distance):,.1f}"])
     label_style = {"padding": "0.22rem 0.45rem", "fontSize": "0.82rem", "fontWeight": "600", "whiteSpace": "nowrap"}
     value_style = {"padding": "0.22rem 0.45rem", "fontSize": "0.82rem", "lineHeight": "1.15"}
     summary_table = dbc.Table(
@@ -314,13 +417,9 @@ def update_map_and_summary(fleet_name, vehicle_id, start_date, end_date):
     )
     
     # Build trajectory polylines - group by fleet and vehicle
+    set_progress((80, "Drawing trajectories"))
     polylines = []
-    for (fleet, vehicle), group_df in df.groupby(["fleet_name", "fleet_vehicle_id"], sort=False):
-        group_df = group_df.sort_values("timestamp")
-        if len(group_df) < 2:
-            continue
-
-        coords = list(zip(group_df["latitude"], group_df["longitude"]))
+    for fleet, vehicle, coords in trajectory_coords(df):
         fleet_color = FLEET_COLOR_MAP.get(fleet, "#808080")
 
         tooltip_text = f"{fleet} | {vehicle}"
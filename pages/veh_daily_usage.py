@@ -4,14 +4,19 @@ import pandas as pd
 import plotly.express as px
 import time
 import logging
-from db import engine
+from compute import fleet_usage_summary, resolve_efficiency_rows
+from db import get_data_version, read_copy
+from frames import DateIndexedFrame
+from metrics import record_cache
+from output_cache import DEFAULT_WINDOW_DAYS, default_window, freeze, memoized
+from profiling import profiled
 from styles import DROPDOWN_STYLE, DARK_BG, GRID_COLOR, TEXT_COLOR, empty_fig
 
 register_page(__name__, path="/veh_daily_usage", name="Vehicle Daily Usage")
 logger = logging.getLogger(__name__)
 CACHE_TTL_SECONDS = 300
-_DAILY_USAGE_CACHE = {"ts": 0.0, "df": None, "error": None}
-TEXT_COLS = ["fleet", "make", "model", "class", "fleet_vehicle_id"]
+_DAILY_USAGE_CACHE = {"ts": 0.0, "frame": None, "error": None, "version": None}
+TEXT_COLS = ["fleet", "make", "model", "class", "fleet_vehicle_id"]   # also the filter columns
 NUMERIC_COLS = [
     "tot_dist",
     "tot_energy",
@@ -35,12 +40,22 @@ metric_options = [
     {'label': 'Peak Payload (lbs)', 'value': 'peak_payload'},
     {'label': 'Energy Efficiency (kWh/mi)', 'value': 'efficiency'},
 ]
+DEFAULT_METRIC = 'tot_dist'
 
-def load_daily_usage_data():
+@profiled()
+def load_daily_usage_frame():
+    """Daily usage rows sorted by date, indexed by TEXT_COLS (frames.DateIndexedFrame)."""
     now = time.time()
-    cached_df = _DAILY_USAGE_CACHE["df"]
-    if cached_df is not None and now - _DAILY_USAGE_CACHE["ts"] < CACHE_TTL_SECONDS:
-        return cached_df.copy()
+    version = get_data_version("veh_daily")
+    cached = _DAILY_USAGE_CACHE["frame"]
+    if (
+        cached is not None
+        and now - _DAILY_USAGE_CACHE["ts"] < CACHE_TTL_SECONDS
+        and _DAILY_USAGE_CACHE["version"] == version
+    ):
+        record_cache("daily_usage", True)
+        return cached
+    record_cache("daily_usage", False)
 
     query = """
         SELECT f.fleet_name AS fleet, v.make, v.model, v.class, v.fleet_vehicle_id, vd.*
@@ -49,13 +64,16 @@ def load_daily_usage_data():
         LEFT JOIN fleet f ON v.fleet_id = f.id
     """
     try:
-        df = pd.read_sql(query, engine)
+        df = read_copy(query, dtypes={"fleet": str, "make": str, "model": str, "fleet_vehicle_id": str})
     except Exception as exc:
         logger.exception("Error loading daily usage data")
-        _DAILY_USAGE_CACHE["df"] = pd.DataFrame(columns=DAILY_COLUMNS)
+        _DAILY_USAGE_CACHE["frame"] = DateIndexedFrame(
+            resolve_efficiency_rows(pd.DataFrame(columns=DAILY_COLUMNS)), keys=TEXT_COLS, name="daily_usage"
+        )
         _DAILY_USAGE_CACHE["ts"] = now
+        _DAILY_USAGE_CACHE["version"] = version
         _DAILY_USAGE_CACHE["error"] = str(exc)
-        return _DAILY_USAGE_CACHE["df"].copy()
+        return _DAILY_USAGE_CACHE["frame"]
 
     for col in DAILY_COLUMNS:
         if col not in df.columns:
@@ -68,18 +86,22 @@ def load_daily_usage_data():
     for col in NUMERIC_COLS:
         df[col] = pd.to_numeric(df[col], errors="coerce")
 
-    df["date"] = pd.to_datetime(df["date"], errors="coerce").dt.date
+    df["date"] = pd.to_datetime(df["date"], errors="coerce")
     df = df.dropna(subset=["date"])
     df["tot_soc_used"] = df["tot_soc_used"] * 100
+    # Resolved once here; the efficiency chart and the fleet summary read these columns.
+    df = resolve_efficiency_rows(df)
 
-    _DAILY_USAGE_CACHE["df"] = df
+    frame = DateIndexedFrame(df, keys=TEXT_COLS, name="daily_usage")
+    _DAILY_USAGE_CACHE["frame"] = frame
     _DAILY_USAGE_CACHE["ts"] = now
+    _DAILY_USAGE_CACHE["version"] = version
     _DAILY_USAGE_CACHE["error"] = None
-    return df.copy()
+    return frame
 
 
 def daily_usage_status():
-    df = load_daily_usage_data()
+    df = load_daily_usage_frame().df
     error = _DAILY_USAGE_CACHE.get("error")
     if error:
         return f"Daily usage data could not be loaded: {error}"
@@ -113,7 +135,7 @@ layout = html.Div([
         dcc.Dropdown(id='vehicle-class-dropdown', placeholder='Select Vehicle Class', style=DROPDOWN_STYLE),
         dcc.Dropdown(id='fleet-veh-id-dropdown', placeholder='Select Fleet Vehicle ID', style=DROPDOWN_STYLE),
         dcc.DatePickerRange(id='date-range-picker'),
-        dcc.Dropdown(id='metric-dropdown', options=metric_options, value='tot_dist',
+        dcc.Dropdown(id='metric-dropdown', options=metric_options, value=DEFAULT_METRIC,
                      placeholder='Select Metric', style=DROPDOWN_STYLE)
     ], style={'display': 'flex', 'flexWrap': 'wrap', 'gap': '10px', 'marginBottom': '20px'}),
 
@@ -138,7 +160,7 @@ def update_daily_usage_status(_):
 
 @callback(Output('fleet-dropdown', 'options'), Input('fleet-dropdown', 'id'))
 def load_fleet_options(_):
-    df = load_daily_usage_data()
+    df = load_daily_usage_frame().df
     if df.empty or "fleet" not in df.columns:
         return []
     fleets = sorted(df["fleet"].dropna().unique())
@@ -153,12 +175,11 @@ def load_fleet_options(_):
 )
 
 def update_filters(fleets):
-    df = load_daily_usage_data()
-    if df.empty:
+    frame = load_daily_usage_frame()
+    if not len(frame):
         return [], [], [], []
 
-    if fleets:
-        df = df[df["fleet"] == fleets]
+    df = frame.select({"fleet": fleets})
 
     return (
         [{'label': x, 'value': x} for x in sorted(df['make'].dropna().unique())],
@@ -168,69 +189,26 @@ def update_filters(fleets):
     )
 
 def _filter_daily(fleets, makes, models, classes, veh_ids, start_date, end_date):
-    df = load_daily_usage_data()
-    if df.empty:
-        return df
-    df["date"] = pd.to_datetime(df["date"]).dt.date
+    filters = dict(zip(TEXT_COLS, (fleets, makes, models, classes, veh_ids)))
+    return load_daily_usage_frame().select(filters, start_date, end_date)
 
-    if fleets: df = df[df["fleet"] == fleets]
-    if makes: df = df[df["make"] == makes]
-    if models: df = df[df["model"] == models]
-    if classes: df = df[df["class"] == classes]
-    if veh_ids: df = df[df["fleet_vehicle_id"] == veh_ids]
-    if start_date: df = df[df["date"] >= pd.to_datetime(start_date).date()]
-    if end_date: df = df[df["date"] <= pd.to_datetime(end_date).date()]
-    return df
 
-
-def _default_latest_30_days(df):
-    if df.empty:
-        return df
-    d = df.copy()
-    d["date"] = pd.to_datetime(d["date"], errors="coerce").dt.date
-    latest = pd.to_datetime(d["date"], errors="coerce").max()
-    if pd.isna(latest):
-        return d
-    earliest = (latest - pd.Timedelta(days=29)).date()
-    latest_date = latest.date()
-    return d[(d["date"] >= earliest) & (d["date"] <= latest_date)]
-
-
-def _resolve_efficiency_rows(df):
-    out = df.copy()
-    dist = pd.to_numeric(out.get("tot_dist"), errors="coerce")
-    energy = pd.to_numeric(out.get("tot_energy"), errors="coerce")
-    reported = (
-        pd.to_numeric(out["efficiency"], errors="coerce")
-        if "efficiency" in out.columns
-        else pd.Series(index=out.index, dtype="float64")
-    )
-    # Reference rule: apply distance filter first for all efficiency paths.
-    # Only rows with tot_dist >= 10 are eligible for efficiency.
-    dist_ok = dist >= 10
-    computed = pd.Series(index=out.index, dtype="float64")
-    # Fallback rule: compute efficiency only when not reported and inputs are valid.
-    # efficiency = tot_energy / tot_dist, requiring positive energy and valid distance.
-    compute_mask = dist_ok & (energy > 0) & pd.notna(energy) & pd.notna(dist)
-    computed.loc[compute_mask] = energy.loc[compute_mask] / dist.loc[compute_mask]
-    # Preferred source rule: use reported efficiency when present; else use computed.
-    out["efficiency_resolved"] = reported.where(dist_ok & pd.notna(reported), computed)
-    out["tot_dist_num"] = dist
-    # Shared validity flag used by daily chart and fleet summary table.
-    out["efficiency_valid"] = dist_ok & pd.notna(out["efficiency_resolved"])
-    return out
+def _summary_filter_key(fleets, makes, models, classes, veh_ids, start_date, end_date):
+    """Memo key for the filtered summary; the default view is keyed by the window it shows."""
+    if not any([fleets, makes, models, classes, veh_ids, start_date, end_date]):
+        start_date, end_date = default_window("daily_usage", "veh_daily", lambda: load_daily_usage_frame().df["date"])
+    return tuple(freeze(v) for v in (fleets, makes, models, classes, veh_ids, start_date, end_date))
 
 
 def _build_daily_efficiency(df):
-    eff_rows = _resolve_efficiency_rows(df)
-    eff_rows = eff_rows[eff_rows["efficiency_valid"]].copy()
+    eff_rows = df.loc[df["efficiency_valid"].astype(bool), ["date", "efficiency_resolved", "tot_dist_num"]]
     if eff_rows.empty:
         return pd.DataFrame(columns=["date", "efficiency"])
 
     # Aggregate rule: distance-weighted daily efficiency.
-    eff_rows["weighted_eff_num"] = eff_rows["efficiency_resolved"] * eff_rows["tot_dist_num"]
     eff_df = (
-        eff_rows.groupby("date", as_index=False)
+        eff_rows.assign(weighted_eff_num=eff_rows["efficiency_resolved"] * eff_rows["tot_dist_num"])
+        .groupby("date", as_index=False)
         .agg({"weighted_eff_num": "sum", "tot_dist_num": "sum"})
     )
     eff_df["efficiency"] = eff_df["weighted_eff_num"] / eff_df["tot_dist_num"]
@@ -261,18 +239,6 @@ def _build_daily_metric(df, metric):
     return d.groupby("date", as_index=False)[metric].agg(agg_func)
 
 
-def _safe_eff(group):
-    eff_rows = _resolve_efficiency_rows(group)
-    eff_rows = eff_rows[eff_rows["efficiency_valid"]]
-    if eff_rows.empty:
-        return None
-    dist_sum = eff_rows["tot_dist_num"].sum(skipna=True)
-    if dist_sum and dist_sum > 0:
-        # Same aggregation rule as daily efficiency chart (distance-weighted).
-        return (eff_rows["efficiency_resolved"] * eff_rows["tot_dist_num"]).sum(skipna=True) / dist_sum
-    return None
-
-
 def _build_fleet_summary_table(df, header_style, cell_style):
     if df.empty:
         return pd.DataFrame(), dbc.Table(
@@ -284,27 +250,7 @@ def _build_fleet_summary_table(df, header_style, cell_style):
             size="sm",
         )
 
-    def safe_mean(series):
-        s = series.dropna()
-        return s.mean() if not s.empty else None
-
-    summary = []
-    for fleet_name, group in df.groupby("fleet"):
-        dist_positive = group[group["tot_dist"] > 0]["tot_dist"]
-        energy_positive = group[group["tot_energy"] > 0]["tot_energy"]
-        dura_positive = group[group["tot_dura"] > 0]["tot_dura"]
-        summary.append({
-            "Fleet": fleet_name,
-            "Total Distance (mi)": round(group["tot_dist"].sum(), 2),
-            "Daily Distance (mi)": safe_mean(dist_positive),
-            "Daily Energy (kWh)": safe_mean(energy_positive),
-            "Energy Efficiency (kWh/mi)": _safe_eff(group),
-            "Daily SOC Used (%)": safe_mean(group[group["tot_soc_used"] > 0]["tot_soc_used"]),
-            "Daily Driving Time (hr)": safe_mean(dura_positive),
-            "Daily Idle Time (hr)": safe_mean(group["idle_time"]),
-        })
-
-    df_summary = pd.DataFrame(summary)
+    df_summary = fleet_usage_summary(df)
 
     def fmt(val, digits=2):
         if val is None or (isinstance(val, float) and pd.isna(val)):
@@ -323,8 +269,8 @@ def _build_fleet_summary_table(df, header_style, cell_style):
 
     header = html.Thead(html.Tr([html.Th(col, style=header_style) for col in table_df.columns]))
     body = html.Tbody([
-        html.Tr([html.Td(row[col], style=cell_style) for col in table_df.columns])
-        for _, row in table_df.iterrows()
+        html.Tr([html.Td(value, style=cell_style) for value in row])
+        for row in table_df.itertuples(index=False, name=None)
     ])
     table_ui = dbc.Table(
         [header, body],
@@ -349,6 +295,8 @@ def _build_fleet_summary_table(df, header_style, cell_style):
     Input('date-range-picker', 'end_date'),
     Input('metric-dropdown', 'value')
 )
+@memoized("daily_usage_figures", "veh_daily")
+@profiled("daily_usage.update_figures")
 def update_figures(fleets, makes, models, classes, veh_ids, start_date, end_date, metric):
     df = _filter_daily(fleets, makes, models, classes, veh_ids, start_date, end_date)
 
@@ -404,11 +352,11 @@ def update_figures(fleets, makes, models, classes, veh_ids, start_date, end_date
     Output("fleet-summary-table", "children"),
     Input("fleet-summary-table", "id")
 )
-
+@memoized("daily_usage_kpis", "veh_daily")
 def update_kpis_and_table(_):
     header_style = {"padding": "0.3rem 0.45rem", "fontSize": "0.82rem", "whiteSpace": "nowrap"}
     cell_style = {"padding": "0.22rem 0.45rem", "fontSize": "0.82rem", "lineHeight": "1.15"}
-    df = load_daily_usage_data()
+    df = load_daily_usage_frame().df
     df_summary, table_ui = _build_fleet_summary_table(df, header_style, cell_style)
     if df_summary.empty:
         return "0", "0", "0", "0", "0", table_ui
@@ -434,11 +382,13 @@ def update_kpis_and_table(_):
     Input('date-range-picker', 'start_date'),
     Input('date-range-picker', 'end_date')
 )
+@memoized("daily_usage_filtered_summary", "veh_daily", normalize=_summary_filter_key)
 def update_filtered_summary_table(fleets, makes, models, classes, veh_ids, start_date, end_date):
     header_style = {"padding": "0.3rem 0.45rem", "fontSize": "0.82rem", "whiteSpace": "nowrap"}
     cell_style = {"padding": "0.22rem 0.45rem", "fontSize": "0.82rem", "lineHeight": "1.15"}
-    d = _filter_daily(fleets, makes, models, classes, veh_ids, start_date, end_date)
     if not any([fleets, makes, models, classes, veh_ids, start_date, end_date]):
-        d = _default_latest_30_days(d)
+        d = load_daily_usage_frame().latest(DEFAULT_WINDOW_DAYS)
+    else:
+        d = _filter_daily(fleets, makes, models, classes, veh_ids, start_date, end_date)
     _, table_ui = _build_fleet_summary_table(d, header_style, cell_style)
     return table_ui
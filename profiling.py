@@ -0,0 +1,153 @@
+"""
+Opt-in profiling of individual callbacks and loaders.
+
+Off by default: unless ZEV_PROFILE or ZEV_PROFILE_ALLOW_HEADER is set when the app starts,
+@profiled returns the function unchanged.
+
+    ZEV_PROFILE="update_map_and_summary:5,load_charging_frame"
+        profile the next 5 calls of update_map_and_summary and the next call of load_charging_frame
+    ZEV_PROFILE_ALLOW_HEADER=1
+        a request with "X-Zev-Profile: charging.update_figures:3" arms the next 3 calls in that worker
+    ZEV_PROFILER=pyinstrument
+        statistical profile with an HTML flame view (needs pyinstrument); default is cProfile
+
+A profile is armed by the function's name, or by the name passed to @profiled("...") where
+two pages share a function name (charging.update_figures, daily_usage.update_figures).
+A background callback (background.py) is counted in the worker when its job is started, and
+the job process profiles the callback only if that took an armed call; profiled functions it
+calls are part of the callback's profile.
+
+Each profiled call writes to ZEV_PROFILE_DIR (default logs/profiles):
+    <name>_<timestamp>.pstats  (cProfile; open with snakeviz or pstats)  or  .html (pyinstrument)
+    <name>_<timestamp>.json    the call's inputs and wall time
+"""
+
+import cProfile
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+PROFILE_SPEC = os.getenv("ZEV_PROFILE", "")
+ALLOW_HEADER = os.getenv("ZEV_PROFILE_ALLOW_HEADER", "") == "1"
+PROFILER = os.getenv("ZEV_PROFILER", "cprofile").lower()
+PROFILE_DIR = Path(os.getenv("ZEV_PROFILE_DIR", Path(__file__).resolve().parent / "logs" / "profiles"))
+HEADER = "X-Zev-Profile"
+ENABLED = bool(PROFILE_SPEC) or ALLOW_HEADER
+
+_LOCK = threading.Lock()
+_ARMED: dict[str, int] = {}   # function name -> calls left to profile
+
+
+def arm(spec: str) -> None:
+    """Arm profiling from "name[:n],name[:n]"."""
+    with _LOCK:
+        for item in filter(None, (s.strip() for s in spec.split(","))):
+            name, _, n = item.partition(":")
+            _ARMED[name] = _ARMED.get(name, 0) + (int(n) if n else 1)
+
+
+def _take(name: str) -> bool:
+    with _LOCK:
+        left = _ARMED.get(name, 0)
+        if left <= 0:
+            return False
+        _ARMED[name] = left - 1
+        return True
+
+
+def take_for_job(fn) -> bool:
+    """In the worker, before starting a background job for fn: take one armed call of it."""
+    label = getattr(fn, "profile_label", None)
+    return bool(label) and _take(label)
+
+
+def start_job(fn, armed: bool) -> None:
+    """
+    In a background job process: profile fn only if the worker took an armed call for it.
+    The job's copy of the counters is dropped so it never decrements them for the worker.
+    """
+    with _LOCK:
+        _ARMED.clear()
+        label = getattr(fn, "profile_label", None)
+        if armed and label:
+            _ARMED[label] = 1
+
+
+def _write(name: str, profiler, args, kwargs, seconds: float) -> None:
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    stem = PROFILE_DIR / f"{name}_{time.strftime('%Y%m%d_%H%M%S')}_{time.perf_counter_ns() % 1_000_000:06d}"
+    if PROFILER == "pyinstrument":
+        stem.with_suffix(".html").write_text(profiler.output_html(), encoding="utf-8")
+    else:
+        profiler.dump_stats(str(stem.with_suffix(".pstats")))
+    meta = {"function": name, "seconds": round(seconds, 4), "args": [repr(a) for a in args],
+            "kwargs": {k: repr(v) for k, v in kwargs.items()}}
+    stem.with_suffix(".json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    logger.info("Profiled %s in %.2fs -> %s", name, seconds, stem)
+
+
+def _start_profiler():
+    if PROFILER == "pyinstrument":
+        from pyinstrument import Profiler
+
+        profiler = Profiler()
+        profiler.start()
+        return profiler, profiler.stop
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler, profiler.disable
+
+
+def profiled(name: str | None = None):
+    """Decorator: profile the function when armed. Identity when profiling is disabled."""
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _take(label):
+                return fn(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                profiler, stop = _start_profiler()
+            except ValueError:
+                # Another profile is running (nested armed call, or another thread on 3.12+).
+                return fn(*args, **kwargs)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                stop()
+                try:
+                    _write(label, profiler, args, kwargs, time.perf_counter() - started)
+                except Exception:
+                    logger.warning("Could not write profile for %s", label, exc_info=True)
+
+        wrapper.profile_label = label
+        return wrapper
+
+    return decorate
+
+
+if PROFILE_SPEC:
+    arm(PROFILE_SPEC)
+
+
+def install(app) -> None:
+    """With ZEV_PROFILE_ALLOW_HEADER=1, arm from the X-Zev-Profile request header."""
+    if not ALLOW_HEADER:
+        return
+    from flask import request
+
+    @app.server.before_request
+    def _arm_from_header():
+        spec = request.headers.get(HEADER)
+        if spec:
+            arm(spec)
@@ -0,0 +1,21 @@
+/* ========================================
+   MAINTENANCE ROW HASH
+   ----------------------------------------
+   Content hash used by data_update/Freight_Equipment_Leasing/maintenance_load_fel.py
+   to find new rows with an indexed lookup instead of pulling the whole table.
+
+   Existing rows are left NULL here; the loader hashes them on its next run
+   (same normalization as incoming rows), so this script stays cheap.
+   ======================================== */
+
+ALTER TABLE public.maintenance
+  ADD COLUMN IF NOT EXISTS row_hash char(32);
+
+-- Lookup path: WHERE row_hash = ANY(...)
+CREATE INDEX IF NOT EXISTS idx_maintenance_row_hash
+  ON public.maintenance (row_hash);
+
+-- Backfill path: WHERE row_hash IS NULL (rows loaded by other scripts)
+CREATE INDEX IF NOT EXISTS idx_maintenance_row_hash_missing
+  ON public.maintenance (id)
+  WHERE row_hash IS NULL;
@@ -0,0 +1,69 @@
+"""
+Compare pd.read_sql with db.read_copy (COPY ... TO STDOUT) on a large telematics pull.
+
+Pulls the same columns the telematics map reads, limited to --rows (default 5M), and reports
+the best wall time of --repeat runs plus the resulting frame's memory for each reader.
+
+Usage:
+    python sql/benchmark_reads.py
+    python sql/benchmark_reads.py --rows 1000000 --repeat 5
+"""
+
+import argparse
+import gc
+import os
+import sys
+import time
+
+import pandas as pd
+
+# Ensure project root (one level up from /sql) is on the import path so db is found
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from db import engine, read_copy  # noqa: E402
+
+QUERY = """
+    SELECT t."timestamp", t.latitude, t.longitude, t.speed, f.fleet_name, v.fleet_vehicle_id
+    FROM veh_tel t
+    JOIN vehicle v ON t.veh_id = v.id
+    JOIN fleet f ON v.fleet_id = f.id
+    LIMIT {rows}
+"""
+
+
+def _time(fn, repeat: int) -> tuple[float, pd.DataFrame]:
+    best, df = float("inf"), None
+    for _ in range(repeat):
+        df = None
+        gc.collect()
+        started = time.perf_counter()
+        df = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, df
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    query = QUERY.format(rows=int(args.rows))
+
+    results = []
+    t, df = _time(lambda: pd.read_sql(query, engine), args.repeat)
+    results.append(("pd.read_sql", t, df))
+    t, df = _time(
+        lambda: read_copy(query, dtypes={"fleet_name": str, "fleet_vehicle_id": str}, parse_dates=["timestamp"]),
+        args.repeat,
+    )
+    results.append(("read_copy (COPY csv)", t, df))
+
+    baseline = results[0][1]
+    print(f"{len(results[0][2]):,} rows, best of {args.repeat}")
+    print(f"{'reader':<22}{'seconds':>10}{'rows/s':>14}{'MB':>10}{'speedup':>10}")
+    for name, t, df in results:
+        mb = df.memory_usage(deep=True).sum() / 1e6
+        print(f"{name:<22}{t:>10.2f}{len(df) / t:>14,.0f}{mb:>10.1f}{baseline / t:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
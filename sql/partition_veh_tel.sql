@@ -0,0 +1,152 @@
+/* ========================================
+   PARTITION veh_tel BY MONTH
+   ----------------------------------------
+   Rebuilds public.veh_tel as a table range-partitioned on "timestamp"
+   (one partition per UTC month, named veh_tel_YYYY_MM).
+
+   - Dashboard and compute_veh_daily queries filter by timestamp, so the
+     planner only scans the months they touch.
+   - Loaders upsert into the latest weeks; each month's indexes stay small.
+   - Per-month VACUUM / archiving is a partition-level operation.
+
+   The old table is kept as public.veh_tel_unpartitioned until you drop it.
+   Safe to rerun: every step checks whether it already ran.
+   ======================================== */
+
+
+/* ========================================
+   SAFETY CHECKS
+   ======================================== */
+
+-- Partition key cannot be NULL
+DO $$
+DECLARE missing_count bigint;
+BEGIN
+  IF to_regclass('public.veh_tel_unpartitioned') IS NULL THEN
+    SELECT COUNT(*) INTO missing_count
+    FROM public.veh_tel
+    WHERE "timestamp" IS NULL;
+
+    IF missing_count > 0 THEN
+      RAISE EXCEPTION 'veh_tel has % rows without timestamp. Delete or fix them before partitioning.', missing_count;
+    END IF;
+  END IF;
+END$$;
+
+
+/* ========================================
+   PARTITION MAINTENANCE FUNCTION
+   ----------------------------------------
+   Creates any missing monthly partitions covering [p_from, p_to].
+   Called by the telematics loaders before each insert and by
+   data_update/run_etl.py for the months ahead.
+   ======================================== */
+CREATE OR REPLACE FUNCTION public.ensure_veh_tel_partitions(p_from date, p_to date)
+RETURNS integer
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  m       date := date_trunc('month', p_from)::date;
+  part    text;
+  created integer := 0;
+BEGIN
+  WHILE m <= p_to LOOP
+    part := format('veh_tel_%s', to_char(m, 'YYYY_MM'));
+    IF to_regclass(format('public.%I', part)) IS NULL THEN
+      EXECUTE format(
+        'CREATE TABLE public.%I PARTITION OF public.veh_tel FOR VALUES FROM (%L) TO (%L)',
+        part,
+        m::timestamp AT TIME ZONE 'UTC',
+        (m + interval '1 month')::timestamp AT TIME ZONE 'UTC'
+      );
+      created := created + 1;
+    END IF;
+    m := (m + interval '1 month')::date;
+  END LOOP;
+  RETURN created;
+END$$;
+
+
+/* ========================================
+   MIGRATION (only if veh_tel is still a plain table)
+   ======================================== */
+DO $$
+DECLARE
+  min_ts timestamptz;
+  max_ts timestamptz;
+BEGIN
+  IF EXISTS (
+    SELECT 1 FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE n.nspname = 'public' AND c.relname = 'veh_tel' AND c.relkind = 'r'
+  ) THEN
+    RAISE NOTICE 'Partitioning veh_tel by month...';
+
+    ALTER TABLE public.veh_tel RENAME TO veh_tel_unpartitioned;
+    ALTER TABLE public.veh_tel_unpartitioned DROP CONSTRAINT IF EXISTS fk_telematic_veh_id;
+    ALTER TABLE public.veh_tel_unpartitioned DROP CONSTRAINT IF EXISTS fk_telematic_veh_id_int;
+
+    CREATE TABLE public.veh_tel (
+      id          integer NOT NULL DEFAULT nextval('public.veh_tel_id_seq'::regclass),
+      veh_id      integer NOT NULL,
+      "timestamp" timestamp with time zone NOT NULL,
+      elevation   numeric(8,3) DEFAULT NULL::numeric,
+      speed       integer,
+      mileage     integer,
+      soc         numeric(5,2) DEFAULT NULL::numeric,
+      key_on_time numeric(5,2) DEFAULT NULL::numeric,
+      latitude    double precision,
+      longitude   double precision,
+      location    public.geography(Point,4326)
+    ) PARTITION BY RANGE ("timestamp");
+
+    -- Unique keys on a partitioned table must include the partition key;
+    -- (veh_id, "timestamp") is also the loaders' ON CONFLICT target.
+    ALTER TABLE public.veh_tel
+      ADD CONSTRAINT veh_tel_vehid_ts_key UNIQUE (veh_id, "timestamp");
+    ALTER TABLE public.veh_tel
+      ADD CONSTRAINT fk_telematic_veh_id
+      FOREIGN KEY (veh_id) REFERENCES public.vehicle(id) ON UPDATE RESTRICT ON DELETE RESTRICT;
+    ALTER SEQUENCE public.veh_tel_id_seq OWNED BY public.veh_tel.id;
+
+    SELECT min("timestamp"), max("timestamp") INTO min_ts, max_ts
+    FROM public.veh_tel_unpartitioned;
+
+    PERFORM public.ensure_veh_tel_partitions(
+      COALESCE((min_ts AT TIME ZONE 'UTC')::date, current_date),
+      (GREATEST(COALESCE(max_ts, now()), now()) AT TIME ZONE 'UTC')::date + 93
+    );
+
+    INSERT INTO public.veh_tel
+      (id, veh_id, "timestamp", elevation, speed, mileage, soc, key_on_time, latitude, longitude, location)
+    SELECT id, veh_id, "timestamp", elevation, speed, mileage, soc, key_on_time, latitude, longitude, location
+    FROM public.veh_tel_unpartitioned
+    ON CONFLICT (veh_id, "timestamp") DO NOTHING;
+
+    RAISE NOTICE 'veh_tel partitioned. Verify counts, then: DROP TABLE public.veh_tel_unpartitioned;';
+  ELSE
+    RAISE NOTICE 'veh_tel is already partitioned. Skipping.';
+  END IF;
+END$$;
+
+
+/* ========================================
+   FUTURE PARTITIONS
+   ----------------------------------------
+   Keep three months ahead. With pg_cron installed this is scheduled
+   monthly; otherwise run_etl.py calls it on every run.
+   ======================================== */
+SELECT public.ensure_veh_tel_partitions(current_date, (current_date + interval '3 months')::date);
+
+DO $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_cron') THEN
+    PERFORM cron.schedule(
+      'veh_tel_partitions',
+      '0 3 1 * *',
+      $cron$SELECT public.ensure_veh_tel_partitions(current_date, (current_date + interval '3 months')::date)$cron$
+    );
+  END IF;
+END$$;
+
+ANALYZE public.veh_tel;
@@ -0,0 +1,17 @@
+/* ========================================
+   DATASET VERSIONS
+   ----------------------------------------
+   One row per source table. data_update/run_etl.py bumps the version of every
+   table a run wrote to; the dashboard (db.get_data_version) drops its cached
+   frames for that table when the version changes.
+   ======================================== */
+
+CREATE TABLE IF NOT EXISTS public.etl_data_version (
+  table_name  text PRIMARY KEY,
+  version     bigint NOT NULL DEFAULT 0,
+  updated_at  timestamptz NOT NULL DEFAULT now()
+);
+
+INSERT INTO public.etl_data_version (table_name)
+VALUES ('veh_tel'), ('veh_daily'), ('refuel_inf'), ('maintenance')
+ON CONFLICT (table_name) DO NOTHING;
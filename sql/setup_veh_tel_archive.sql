@@ -0,0 +1,35 @@
+/* ========================================
+   TELEMATICS COLD TIER
+   ----------------------------------------
+   veh_tel keeps full-resolution points for the retention window;
+   data_update/archive_veh_tel.py moves older months into
+   veh_tel_archive as a shape-preserving subset (first/last point of each
+   vehicle-day, stop/start transitions, turn points, fixed-interval samples).
+
+   veh_tel_all spans both tiers. Filters on veh_id / "timestamp" are pushed
+   into each branch, so partition pruning on veh_tel still applies.
+   ======================================== */
+
+CREATE TABLE IF NOT EXISTS public.veh_tel_archive (
+  veh_id      integer NOT NULL REFERENCES public.vehicle(id),
+  "timestamp" timestamp with time zone NOT NULL,
+  elevation   numeric(8,3),
+  speed       integer,
+  mileage     integer,
+  soc         numeric(5,2),
+  key_on_time numeric(5,2),
+  latitude    double precision,
+  longitude   double precision,
+  location    public.geography(Point,4326),
+  PRIMARY KEY (veh_id, "timestamp")
+);
+
+CREATE INDEX IF NOT EXISTS idx_veh_tel_archive_ts_brin
+  ON public.veh_tel_archive USING brin ("timestamp");
+
+CREATE OR REPLACE VIEW public.veh_tel_all AS
+SELECT veh_id, "timestamp", elevation, speed, mileage, soc, key_on_time, latitude, longitude, location
+FROM public.veh_tel
+UNION ALL
+SELECT veh_id, "timestamp", elevation, speed, mileage, soc, key_on_time, latitude, longitude, location
+FROM public.veh_tel_archive;
@@ -0,0 +1,152 @@
+/* ========================================
+   HOURLY TELEMATICS ROLLUP
+   ----------------------------------------
+   public.veh_tel_hourly holds one row per vehicle per UTC hour with the
+   summaries the dashboard needs, so KPIs and date-range summaries read
+   thousands of rows instead of millions of raw veh_tel points.
+
+   The telematics loaders keep it current by calling
+   refresh_veh_tel_hourly(veh_id, from, to) for the span they loaded
+   (data_update/telematics_common.refresh_hourly). This script creates
+   the table and function and backfills every vehicle once. After the
+   function changes, TRUNCATE public.veh_tel_hourly and run the script
+   again to rebuild the existing rows.
+   ======================================== */
+
+CREATE TABLE IF NOT EXISTS public.veh_tel_hourly (
+  veh_id          integer     NOT NULL REFERENCES public.vehicle(id),
+  hour            timestamptz NOT NULL,
+  n_points        integer     NOT NULL,
+  n_speed         integer     NOT NULL,   -- points with a speed (weight for avg_speed)
+  min_speed       double precision,
+  max_speed       double precision,
+  avg_speed       double precision,
+  first_mileage   double precision,
+  last_mileage    double precision,
+  first_soc       double precision,
+  last_soc        double precision,
+  moving_seconds  double precision NOT NULL DEFAULT 0,
+  min_lat         double precision,
+  max_lat         double precision,
+  min_lon         double precision,
+  max_lon         double precision,
+  PRIMARY KEY (veh_id, hour)
+);
+
+CREATE INDEX IF NOT EXISTS idx_veh_tel_hourly_hour
+  ON public.veh_tel_hourly USING brin (hour);
+
+
+/* ----------------------------------------
+   Recompute the hours of one vehicle on the UTC days that overlap
+   [p_from, p_to]. Moving seconds follow compute_veh_daily: time from a
+   point with speed > 0 to the next point of the same UTC day, up to the
+   day's last moving point. An interval that crosses an hour boundary is
+   split across the hours it spans, so the hours of a day add up to its
+   veh_daily drive time; an hour without points of its own can still get
+   moving time. Whole days are recomputed because a new point changes the
+   interval of the point before it.
+   ---------------------------------------- */
+CREATE OR REPLACE FUNCTION public.refresh_veh_tel_hourly(p_veh_id integer, p_from timestamptz, p_to timestamptz)
+RETURNS integer
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  h_from timestamptz := date_trunc('day', p_from, 'UTC');
+  h_to   timestamptz := date_trunc('day', p_to, 'UTC') + interval '1 day';
+  n      integer;
+BEGIN
+  DELETE FROM public.veh_tel_hourly
+  WHERE veh_id = p_veh_id AND hour >= h_from AND hour < h_to;
+
+  WITH pts AS (
+    SELECT
+      t."timestamp" AS ts,
+      date_trunc('hour', t."timestamp", 'UTC') AS hour,
+      lead(t."timestamp") OVER (
+        PARTITION BY date_trunc('day', t."timestamp", 'UTC') ORDER BY t."timestamp"
+      ) AS next_ts,
+      max(t."timestamp") FILTER (WHERE t.speed > 0) OVER (
+        PARTITION BY date_trunc('day', t."timestamp", 'UTC')
+      ) AS last_moving_ts,
+      t.speed::double precision AS speed,
+      t.mileage::double precision AS mileage,
+      t.soc::double precision AS soc,
+      t.latitude,
+      t.longitude
+    FROM public.veh_tel t
+    WHERE t.veh_id = p_veh_id
+      AND t."timestamp" >= h_from
+      AND t."timestamp" < h_to
+  ),
+  per_hour AS (
+    SELECT
+      hour,
+      count(*) AS n_points,
+      count(speed) AS n_speed,
+      min(speed) AS min_speed,
+      max(speed) AS max_speed,
+      avg(speed) AS avg_speed,
+      (array_agg(mileage ORDER BY ts) FILTER (WHERE mileage IS NOT NULL))[1] AS first_mileage,
+      (array_agg(mileage ORDER BY ts DESC) FILTER (WHERE mileage IS NOT NULL))[1] AS last_mileage,
+      (array_agg(soc ORDER BY ts) FILTER (WHERE soc IS NOT NULL))[1] AS first_soc,
+      (array_agg(soc ORDER BY ts DESC) FILTER (WHERE soc IS NOT NULL))[1] AS last_soc,
+      min(latitude) AS min_lat, max(latitude) AS max_lat,
+      min(longitude) AS min_lon, max(longitude) AS max_lon
+    FROM pts
+    GROUP BY hour
+  ),
+  moving AS (
+    -- each moving interval [ts, next_ts) split over the hours it overlaps
+    SELECT
+      h.hour,
+      sum(EXTRACT(EPOCH FROM LEAST(p.next_ts, h.hour + interval '1 hour') - GREATEST(p.ts, h.hour))) AS seconds
+    FROM pts p
+    CROSS JOIN LATERAL generate_series(p.hour, p.next_ts, interval '1 hour') AS h(hour)
+    WHERE p.speed > 0 AND p.ts < p.last_moving_ts AND p.next_ts > p.ts AND h.hour < p.next_ts
+    GROUP BY h.hour
+  )
+  INSERT INTO public.veh_tel_hourly (
+    veh_id, hour, n_points, n_speed, min_speed, max_speed, avg_speed,
+    first_mileage, last_mileage, first_soc, last_soc, moving_seconds,
+    min_lat, max_lat, min_lon, max_lon
+  )
+  SELECT
+    p_veh_id,
+    COALESCE(a.hour, m.hour),
+    COALESCE(a.n_points, 0),
+    COALESCE(a.n_speed, 0),
+    a.min_speed, a.max_speed, a.avg_speed,
+    a.first_mileage, a.last_mileage, a.first_soc, a.last_soc,
+    COALESCE(m.seconds, 0),
+    a.min_lat, a.max_lat, a.min_lon, a.max_lon
+  FROM per_hour a
+  FULL JOIN moving m ON m.hour = a.hour;
+
+  GET DIAGNOSTICS n = ROW_COUNT;
+  RETURN n;
+END$$;
+
+
+/* ----------------------------------------
+   Initial backfill (one call per vehicle with telematics)
+   ---------------------------------------- */
+DO $$
+DECLARE r record;
+BEGIN
+  IF NOT EXISTS (SELECT 1 FROM public.veh_tel_hourly) THEN
+    FOR r IN
+      SELECT veh_id, min("timestamp") AS t0, max("timestamp") AS t1
+      FROM public.veh_tel
+      WHERE "timestamp" IS NOT NULL
+      GROUP BY veh_id
+    LOOP
+      PERFORM public.refresh_veh_tel_hourly(r.veh_id, r.t0, r.t1);
+    END LOOP;
+    RAISE NOTICE 'veh_tel_hourly backfilled.';
+  ELSE
+    RAISE NOTICE 'veh_tel_hourly already populated. Skipping backfill.';
+  END IF;
+END$$;
+
+ANALYZE public.veh_tel_hourly;
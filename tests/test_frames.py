@@ -0,0 +1,89 @@
+"""
+The cached page frames are shared by every callback in a worker: writes through frame.df,
+select() or latest() must raise, and nothing a callback does to its rows may change the cache.
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from frames import DateIndexedFrame  # noqa: E402
+
+
+@pytest.fixture
+def frame():
+    df = pd.DataFrame({
+        "date": pd.to_datetime(["2024-01-03", "2024-01-01", None, "2024-01-02"]),
+        "fleet_name": ["A", "B", "B", "A"],
+        "parts_cost": [1.0, np.nan, 4.0, 3.0],
+        "maint_ob": [1, 2, 2, 1],
+    })
+    return DateIndexedFrame(df, keys=("fleet_name",), name="maintenance")
+
+
+def _snapshot(frame) -> pd.DataFrame:
+    return frame.df.copy(deep=True)
+
+
+SHARED_VIEWS = {
+    "df": lambda f: f.df,
+    "select_dates": lambda f: f.select(start_date="2024-01-01", end_date="2024-01-03"),
+    "select_all": lambda f: f.select(),
+    "latest": lambda f: f.latest(2),
+}
+
+
+def _loc(d):
+    d.loc[d.index[0], "parts_cost"] = 99.0
+
+
+def _loc_int(d):
+    d.loc[d.index[0], "maint_ob"] = 9
+
+
+def _iloc(d):
+    d.iloc[0, d.columns.get_loc("parts_cost")] = 99.0
+
+
+def _fillna_inplace(d):
+    costs = d["parts_cost"]
+    costs.fillna(0.0, inplace=True)
+
+
+WRITES = {f.__name__.lstrip("_"): f for f in (_loc, _loc_int, _iloc, _fillna_inplace)}
+
+
+@pytest.mark.parametrize("view", SHARED_VIEWS)
+@pytest.mark.parametrize("write", WRITES)
+@pytest.mark.filterwarnings("ignore::FutureWarning", "ignore::pandas.errors.SettingWithCopyWarning")
+def test_writes_to_shared_rows_raise(frame, view, write):
+    before = _snapshot(frame)
+    rows = SHARED_VIEWS[view](frame)
+    with pytest.raises(ValueError, match="read-only"):
+        WRITES[write](rows)
+    pd.testing.assert_frame_equal(frame.df, before)
+
+
+@pytest.mark.filterwarnings("ignore::FutureWarning")
+def test_adding_a_column_leaves_the_cache_alone(frame):
+    before = _snapshot(frame)
+    rows = frame.df
+    rows["total_cost"] = rows["parts_cost"] * 2
+    # These replace whole columns of this view rather than writing into the shared buffers.
+    rows.fillna({"parts_cost": 0.0}, inplace=True)
+    rows["maint_ob"] = 0
+    assert "total_cost" not in frame.df.columns
+    pd.testing.assert_frame_equal(frame.df, before)
+
+
+def test_filtered_rows_are_the_callers_copy(frame):
+    before = _snapshot(frame)
+    rows = frame.select({"fleet_name": "A"})
+    rows.loc[rows.index[0], "parts_cost"] = 99.0
+    rows.fillna({"parts_cost": 0.0}, inplace=True)
+    pd.testing.assert_frame_equal(frame.df, before)
+    assert frame.select({"fleet_name": "A"})["parts_cost"].tolist() == [3.0, 1.0]
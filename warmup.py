@@ -0,0 +1,128 @@
+"""
+Pre-compute every page's default view ("latest 30 days, all fleets") so the first visitor after
+a restart, an ETL load or a cache expiry does not pay for the cold queries.
+
+warm() calls each page's callbacks with the inputs its layout starts with. That loads the
+page's frame cache and recomputes the outputs into output_cache. The telematics map and the
+analysis heatmap are background callbacks; their outputs are written to the background disk
+cache (shared by the workers) under the key Dash looks up.
+
+start() runs warm() in a daemon thread of each gunicorn worker (gunicorn.conf.py), then again
+whenever one of the data versions changes (run_etl.py bumps etl_data_version) or the warmed
+outputs are about to expire. The worker serves requests while it warms.
+
+    ZEV_WARMUP                    0 disables warming (default 1)
+    ZEV_WARMUP_INTERVAL_SECONDS   re-warm at least this often (default 600; keep it below
+                                  ZEV_OUTPUT_CACHE_TTL_SECONDS)
+"""
+
+import importlib
+import logging
+import os
+import threading
+import time
+
+import background
+import output_cache
+from db import DATA_VERSION_POLL_SECONDS, get_data_version
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("ZEV_WARMUP", "1") != "0"
+INTERVAL_SECONDS = int(os.getenv("ZEV_WARMUP_INTERVAL_SECONDS", "600"))
+TABLES = ("refuel_inf", "veh_daily", "maintenance", "veh_tel")
+
+_LOCK = threading.Lock()
+_STATE = {"thread": None, "versions": None, "warmed_at": 0.0, "last": {}}
+
+
+def _page(name: str):
+    return importlib.import_module(f"pages.{name}")
+
+
+def _charging():
+    page = _page("charging")
+    page.update_summary("summary-table-charging")
+    page.update_filtered_summary(None, None, None, None)
+    page.update_figures(None, None, None, None)
+
+
+def _daily_usage():
+    page = _page("veh_daily_usage")
+    page.update_kpis_and_table("fleet-summary-table")
+    page.update_filtered_summary_table(None, None, None, None, None, None, None)
+    page.update_figures(None, None, None, None, None, None, None, page.DEFAULT_METRIC)
+
+
+def _maintenance():
+    page = _page("maintenance")
+    page.layout_blocks()
+    page.update_block2_block3(None, page.DEFAULT_ASSET_TYPE, None, None, None)
+
+
+def _telematics():
+    page = _page("telematics")
+    if page.end_d is None:   # no telematics yet: the layout has no default range either
+        return
+    background.warm(page.update_map_and_summary, [None, None, page.start_d, page.end_d])
+
+
+def _analysis():
+    page = _page("analysis")
+    page.populate_analysis_fleet_options("analysis-fleet-filter")
+    background.warm(page.update_analysis_heatmap, [None, None, None, None])
+
+
+VIEWS = {
+    "charging": _charging,
+    "daily_usage": _daily_usage,
+    "maintenance": _maintenance,
+    "telematics": _telematics,
+    "analysis": _analysis,
+}
+
+
+def warm() -> dict:
+    """Compute every page's default view; {view: seconds, or the error}. One failing page does not stop the rest."""
+    timings = {}
+    for name, fn in VIEWS.items():
+        started = time.perf_counter()
+        try:
+            with output_cache.refreshing():
+                fn()
+            timings[name] = round(time.perf_counter() - started, 2)
+        except Exception as exc:
+            logger.warning("Warming %s failed", name, exc_info=True)
+            timings[name] = f"error: {exc}"
+    logger.info("Warmed default views: %s", timings)
+    return timings
+
+
+def _versions() -> tuple:
+    return tuple(get_data_version(table) for table in TABLES)
+
+
+def _loop() -> None:
+    while True:
+        versions = _versions()
+        if versions != _STATE["versions"] or time.time() - _STATE["warmed_at"] >= INTERVAL_SECONDS:
+            _STATE["last"] = warm()
+            _STATE["versions"] = versions
+            _STATE["warmed_at"] = time.time()
+        time.sleep(DATA_VERSION_POLL_SECONDS)
+
+
+def start() -> None:
+    """Start this process's warming thread (once); no-op with ZEV_WARMUP=0."""
+    if not ENABLED:
+        return
+    with _LOCK:
+        if _STATE["thread"] is not None:
+            return
+        _STATE["thread"] = threading.Thread(target=_loop, name="zev-warmup", daemon=True)
+        _STATE["thread"].start()
+
+
+def status() -> dict:
+    """Last warm-up timings and when it ran, for /health."""
+    return {"enabled": ENABLED, "warmed_at": _STATE["warmed_at"], "views": _STATE["last"]}